@@ -0,0 +1,56 @@
+"""Annotation file parsing rate
+
+Compares the full pyparsing grammar against the fast path used by
+ann_parser.parse_ann for typical annotation lines, and whole-file parsing
+serially against a process pool.
+
+Usage: python -m benchmarks.ann_parse [lines] [jobs]
+"""
+import io
+import os
+import random
+import sys
+
+from benchmarks import common
+from charybdis.ann import ann_parser
+
+TYPES = ["", ", u8", ", u16", ", [16]u8", ", [0x20]*u16", ", *u8"]
+
+
+def synthetic_ann_lines(count: int, seed: int = 0) -> list[str]:
+    """Deterministic annotation lines with unique labels"""
+    rng = random.Random(seed)
+    return [
+        f"{rng.randrange(0x100):02x}:{rng.randrange(0x10000):04x} Label_{i}"
+        + rng.choice(TYPES)
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    lines = synthetic_ann_lines(count)
+    grammar = common.measure(
+        lambda: [
+            ann_parser.get_grammar().parse_string(line, parse_all=True)
+            for line in lines
+        ]
+    )
+    fast = common.measure(lambda: [ann_parser.parse_ann(line) for line in lines])
+    text = "\n".join(lines)
+    serial = common.measure(lambda: ann_parser.parse_ann_file(io.StringIO(text)))
+    parallel = common.measure(
+        lambda: ann_parser.parse_ann_file(io.StringIO(text), jobs)
+    )
+    for label, elapsed in [
+        ("grammar", grammar),
+        ("parse_ann", fast),
+        ("parse_ann_file", serial),
+        (f"parse_ann_file (jobs={jobs})", parallel),
+    ]:
+        print(f"{label}: {count / elapsed:,.0f} lines/s ({count} lines)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import gc
+import pathlib
+import random
+import time
+import tracemalloc
+from typing import Callable
+
+from charybdis import io
+from charybdis.ann import types as ann_types
+
+KIB = 1024
+
+
+def synthetic_rom(size: int, seed: int = 0) -> bytes:
+    """Deterministic pseudo-random ROM contents of the given size"""
+    return random.Random(seed).randbytes(size)
+
+
+# Opcodes followed by an 8-bit and a 16-bit immediate respectively. These are
+# listed here rather than derived from the decoder so that generated ROMs
+# don't change as the decoder gains opcodes.
+SM83_U8_OPCODES = frozenset(
+    [0x06, 0x0E, 0x10, 0x16, 0x18, 0x1E, 0x20, 0x26, 0x28, 0x2E, 0x30, 0x36]
+    + [0x38, 0x3E, 0xC6, 0xCB, 0xCE, 0xD6, 0xDE, 0xE0, 0xE6, 0xE8, 0xEE, 0xF0]
+    + [0xF6, 0xF8, 0xFE]
+)
+SM83_U16_OPCODES = frozenset(
+    [0x01, 0x08, 0x11, 0x21, 0x31, 0xC2, 0xC3, 0xC4, 0xCA, 0xCC, 0xCD, 0xD2]
+    + [0xD4, 0xDA, 0xDC, 0xEA, 0xFA]
+)
+SM83_INVALID_OPCODES = frozenset(
+    [0xD3, 0xDB, 0xDD, 0xE3, 0xE4, 0xEB, 0xEC, 0xED, 0xF4, 0xFC, 0xFD]
+)
+
+
+def get_opcode_weight(opcode: int) -> int:
+    """Rough relative frequency of an opcode in commercial Game Boy code"""
+    if opcode in SM83_INVALID_OPCODES or opcode in (0x10, 0x76):
+        return 0
+    if 0x40 <= opcode < 0x80 or opcode in (0x3E, 0xE0, 0xEA, 0xF0, 0xFA):
+        return 12  # Loads
+    if opcode in (0x18, 0x20, 0x28, 0x30, 0x38, 0xC3, 0xC9, 0xCD):
+        return 10  # Jumps, branches, calls and returns
+    if 0x80 <= opcode < 0xC0 or opcode in (0xCB, 0xE6, 0xFE):
+        return 4  # ALU and bit operations
+    return 2
+
+
+SM83_OPCODE_WEIGHTS = [get_opcode_weight(opcode) for opcode in range(0x100)]
+
+
+def realistic_rom(size: int, seed: int = 0) -> bytes:
+    """Deterministic ROM with a realistic mix of code, data and padding
+
+    Code is drawn from a weighted opcode distribution. It is interleaved with
+    random data such as graphics and with runs of padding bytes. The header
+    declares the ROM's size, which must be a power of two of at least 32 KiB.
+    """
+    rng = random.Random(seed)
+    opcodes = range(0x100)
+    rom = bytearray()
+    while len(rom) < size:
+        kind = rng.random()
+        if kind < 0.6:
+            count = rng.randrange(8, 256)
+            for opcode in rng.choices(opcodes, SM83_OPCODE_WEIGHTS, k=count):
+                rom.append(opcode)
+                if opcode in SM83_U8_OPCODES:
+                    rom.append(rng.randrange(0x100))
+                elif opcode in SM83_U16_OPCODES:
+                    rom.extend(rng.randbytes(2))
+        elif kind < 0.9:
+            rom.extend(rng.randbytes(rng.randrange(16, 1024)))
+        else:
+            rom.extend(rng.choice([b"\x00", b"\xff"]) * rng.randrange(16, 4096))
+    del rom[size:]
+    rom[io.OFFSET_ROM_SIZE] = (size // (32 * KIB)).bit_length() - 1
+    return bytes(rom)
+
+
+def measure(f: Callable[[], object], repeat: int = 3) -> float:
+    """Best wall-clock time in seconds over several runs
+
+    Like timeit, garbage collection is paused while timing so that collections
+    triggered by earlier allocations don't add noise.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            f()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+
+def peak_memory(f: Callable[[], object]) -> int:
+    """Peak traced allocation in bytes while running f"""
+    tracemalloc.start()
+    try:
+        f()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def synthetic_state(
+    size: int, output_directory_path: pathlib.Path, seed: int = 0
+) -> io.DisassemblerState:
+    """Disassembler state for a synthetic ROM that exists only in memory"""
+    return io.DisassemblerState(
+        anns=ann_types.AnnMapping(),
+        is_gbc=False,
+        output_directory_path=output_directory_path,
+        overwrite=True,
+        rom_banks=size // io.ROM_BANK_SIZE,
+        rom_data=synthetic_rom(size, seed),
+        rom_file_path=pathlib.Path("synthetic.gb"),
+        rom_md5="",
+    )
@@ -0,0 +1,32 @@
+"""Linear-sweep decoder throughput
+
+Usage: python -m benchmarks.decode [size_kib]
+"""
+import sys
+from typing import Optional
+
+from benchmarks import common
+from charybdis import disasm
+
+
+def sweep(rom: bytes) -> list[Optional[disasm.DecodedInsn]]:
+    decoded = []
+    index = 0
+    while index < len(rom):
+        result = disasm.decode_insn(rom, index)
+        decoded.append(result)
+        index += result.size if result is not None else 1
+    return decoded
+
+
+def main() -> None:
+    size = int(sys.argv[1]) * common.KIB if len(sys.argv) > 1 else 1024 * common.KIB
+    rom = common.synthetic_rom(size)
+    elapsed = common.measure(lambda: sweep(rom))
+    peak = common.peak_memory(lambda: sweep(rom))
+    print(f"decode_insn: {size / elapsed:,.0f} bytes/s ({size} bytes)")
+    print(f"decode_insn: {peak / common.KIB:,.0f} KiB peak for retained results")
+
+
+if __name__ == "__main__":
+    main()
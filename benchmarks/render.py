@@ -0,0 +1,24 @@
+"""Instruction rendering throughput
+
+Compares rendering every decoded instruction from scratch with Insn.render
+against the per-opcode text cache used by DecodedInsn.render.
+
+Usage: python -m benchmarks.render [size_kib]
+"""
+import sys
+
+from benchmarks import common
+from benchmarks.decode import sweep
+
+
+def main() -> None:
+    size = int(sys.argv[1]) * common.KIB if len(sys.argv) > 1 else 1024 * common.KIB
+    decoded = [result for result in sweep(common.synthetic_rom(size)) if result]
+    uncached = common.measure(lambda: [result.insn.render() for result in decoded])
+    cached = common.measure(lambda: [result.render() for result in decoded])
+    for label, elapsed in [("Insn.render", uncached), ("DecodedInsn.render", cached)]:
+        print(f"{label}: {len(decoded) / elapsed:,.0f} insns/s ({len(decoded)} insns)")
+
+
+if __name__ == "__main__":
+    main()
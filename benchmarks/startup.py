@@ -0,0 +1,44 @@
+"""Startup time with and without the annotation cache
+
+Times initialize_state for a 32 KiB ROM with a large annotation file, first
+parsing the annotations from text and then loading them from the cache.
+
+Usage: python -m benchmarks.startup [lines]
+"""
+import pathlib
+import sys
+import tempfile
+
+from benchmarks import ann_parse, common
+from charybdis import io
+from charybdis.ann import cache
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as d:
+        rom_file_path = pathlib.Path(d) / "rom.gb"
+        rom = bytearray(common.synthetic_rom(32 * common.KIB))
+        rom[io.OFFSET_ROM_SIZE] = 0
+        rom_file_path.write_bytes(rom)
+        ann_file_path = rom_file_path.with_suffix(".ann")
+        ann_file_path.write_text("\n".join(ann_parse.synthetic_ann_lines(count)))
+        options = io.DisassemblerOptions(
+            output_directory_path=pathlib.Path(d) / "output",
+            rom_file_path=rom_file_path,
+            overwrite=True,
+        )
+        uncached = common.measure(
+            lambda: io.initialize_state(
+                io.DisassemblerOptions(**{**vars(options), "ann_cache": False})
+            )
+        )
+        io.initialize_state(options)
+        cached = common.measure(lambda: io.initialize_state(options))
+        cache_size = cache.get_cache_path(ann_file_path).stat().st_size
+    print(f"parsed: {uncached * 1000:.0f} ms ({count} annotations)")
+    print(f"cached: {cached * 1000:.0f} ms ({cache_size / common.KIB:.0f} KiB cache)")
+
+
+if __name__ == "__main__":
+    main()
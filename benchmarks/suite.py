@@ -0,0 +1,144 @@
+"""Benchmark suite with stored baselines
+
+Measures decoder, renderer and annotation parser throughput and end-to-end
+disassembly for realistic synthetic ROMs of several sizes, then compares each
+result against the baseline stored in baselines.json. Results are rates, so
+higher is better, and the run fails if any falls more than the threshold
+below its baseline.
+
+Baselines depend on the machine, so record your own before comparing:
+
+    python -m benchmarks.suite --save
+    python -m benchmarks.suite [--threshold 0.15] [--sizes 32,1024]
+"""
+import argparse
+import functools
+import io as python_io
+import json
+import pathlib
+import sys
+import tempfile
+from typing import Callable
+
+from benchmarks import ann_parse, common
+from benchmarks.decode import sweep
+from charybdis import io
+from charybdis.ann import ann_parser
+
+BASELINES_PATH = pathlib.Path(__file__).parent / "baselines.json"
+DEFAULT_SIZES_KIB = [32, 1024, 8192]
+DEFAULT_THRESHOLD = 0.15
+ANN_LINES = 20000
+
+Benchmark = Callable[[], float]
+
+
+def get_benchmarks(sizes: list[int]) -> dict[str, Benchmark]:
+    """Benchmarks keyed on name, each returning a rate"""
+    benchmarks = {"parse_ann_file (lines/s)": bench_parse_ann_file}
+    for size in sizes:
+        label = f"{size // common.KIB} KiB"
+        benchmarks[f"decode_insn {label} (bytes/s)"] = functools.partial(
+            bench_decode, size
+        )
+        benchmarks[f"Insn.render {label} (insns/s)"] = functools.partial(
+            bench_render, size
+        )
+        benchmarks[f"disassemble {label} (bytes/s)"] = functools.partial(
+            bench_disassemble, size
+        )
+    return benchmarks
+
+
+def get_repeat(size: int) -> int:
+    """Runs to take the best of, more for small ROMs whose runs are noisier"""
+    if size <= 256 * common.KIB:
+        return 10
+    if size <= 1024 * common.KIB:
+        return 5
+    return 2
+
+
+def bench_parse_ann_file() -> float:
+    text = "\n".join(ann_parse.synthetic_ann_lines(ANN_LINES))
+    elapsed = common.measure(
+        lambda: ann_parser.parse_ann_file(python_io.StringIO(text)), repeat=5
+    )
+    return ANN_LINES / elapsed
+
+
+def bench_decode(size: int) -> float:
+    rom = common.realistic_rom(size)
+    return size / common.measure(lambda: sweep(rom), get_repeat(size))
+
+
+def bench_render(size: int) -> float:
+    decoded = [result for result in sweep(common.realistic_rom(size)) if result]
+    elapsed = common.measure(
+        lambda: [result.insn.render() for result in decoded], get_repeat(size)
+    )
+    return len(decoded) / elapsed
+
+
+def bench_disassemble(size: int) -> float:
+    with tempfile.TemporaryDirectory() as dir:
+        rom_file_path = pathlib.Path(dir) / "rom.gb"
+        rom_file_path.write_bytes(common.realistic_rom(size))
+        options = io.DisassemblerOptions(
+            output_directory_path=pathlib.Path(dir) / "output",
+            rom_file_path=rom_file_path,
+            overwrite=True,
+        )
+        return size / common.measure(lambda: io.disassemble(options), get_repeat(size))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="run the benchmark suite")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES_KIB),
+        metavar="KIB,...",
+        help="ROM sizes to benchmark in KiB, each a power of two of at least 32",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        metavar="FRACTION",
+        help=f"allowed slowdown against baselines (defaults to {DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help="store the results as the new baselines",
+    )
+    args = parser.parse_args()
+    sizes = [int(size) * common.KIB for size in args.sizes.split(",")]
+    baselines: dict[str, float] = {}
+    if BASELINES_PATH.exists():
+        baselines = json.loads(BASELINES_PATH.read_text())
+    results = {}
+    regressions = 0
+    for name, benchmark in get_benchmarks(sizes).items():
+        rate = benchmark()
+        results[name] = rate
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name}: {rate:,.0f} (no baseline)")
+            continue
+        change = rate / baseline - 1
+        status = ""
+        if change < -args.threshold:
+            regressions += 1
+            status = " REGRESSION"
+        print(f"{name}: {rate:,.0f} ({change:+.1%} vs {baseline:,.0f}){status}")
+    if args.save:
+        BASELINES_PATH.write_text(
+            json.dumps({**baselines, **results}, indent=2, sort_keys=True) + "\n"
+        )
+    elif regressions > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
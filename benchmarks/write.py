@@ -0,0 +1,73 @@
+"""Bank file writing throughput
+
+Compares writing each line to the file as it is rendered against rendering
+a whole bank and writing it at once, and writing banks inline against a
+writer thread. A per-bank latency can be added to the latter two to
+simulate a slow volume.
+
+Usage: python -m benchmarks.write [size_kib] [latency_ms]
+"""
+import dataclasses
+import pathlib
+import sys
+import tempfile
+import time
+
+from benchmarks import common
+from charybdis import disasm, io
+
+
+def write_per_line(state: io.DisassemblerState) -> None:
+    for bank in range(state.rom_banks):
+        path = state.output_directory_path / f"bank_{bank:03x}.asm"
+        with open(path, "w") as f:
+            f.write(io.get_bank_header(bank))
+            f.write("\n\n")
+            offset = 0
+            while offset < io.ROM_BANK_SIZE:
+                index = io.ROM_BANK_SIZE * bank + offset
+                result = disasm.decode_insn(state.rom_data, index)
+                if result is not None and offset + result.size <= io.ROM_BANK_SIZE:
+                    size = result.size
+                    line = result.render()
+                else:
+                    size = 1
+                    line = f"DB ${state.rom_data[index]:02x}"
+                f.write(line)
+                f.write("\n")
+                offset += size
+
+
+def add_latency(seconds: float) -> None:
+    """Delays every bank file write, as if the output volume were remote"""
+    save_rendered_bank = io.save_rendered_bank
+
+    def slow_save_rendered_bank(
+        state: io.DisassemblerState, bank: int, rendered: io.RenderedBank
+    ) -> None:
+        time.sleep(seconds)
+        save_rendered_bank(state, bank, rendered)
+
+    io.save_rendered_bank = slow_save_rendered_bank
+
+
+def main() -> None:
+    size = int(sys.argv[1]) * common.KIB if len(sys.argv) > 1 else 4096 * common.KIB
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+    with tempfile.TemporaryDirectory() as dir:
+        state = common.synthetic_state(size, pathlib.Path(dir))
+        inline_state = dataclasses.replace(state, write_queue_depth=0)
+        per_line = common.measure(lambda: write_per_line(state))
+        add_latency(latency)
+        batched = common.measure(lambda: io.write_assembly(inline_state))
+        pipelined = common.measure(lambda: io.write_assembly(state))
+    for label, elapsed in [
+        ("per line", per_line),
+        ("batched", batched),
+        ("pipelined", pipelined),
+    ]:
+        print(f"write_assembly ({label}): {size / elapsed:,.0f} bytes/s")
+
+
+if __name__ == "__main__":
+    main()
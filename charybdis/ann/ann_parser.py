@@ -1,10 +1,15 @@
+import concurrent.futures
+import functools
+import re
+import typing
 from typing import Any, Callable, IO, Optional
 
-import pyparsing as pp
+from charybdis.ann import chunks, types
 
-from charybdis.ann import types
+if typing.TYPE_CHECKING:
+    import pyparsing as pp
 
-ParseAction = Callable[[str, int, pp.ParseResults], Any]
+ParseAction = Callable[[str, int, "pp.ParseResults"], Any]
 
 BASE_PREFIXES = {
     2: "0b",
@@ -12,15 +17,15 @@ BASE_PREFIXES = {
 }
 
 
-def tokens(f: Callable[[pp.ParseResults], Any]) -> ParseAction:
-    def action(s: str, loc: int, tokens: pp.ParseResults) -> Any:
+def tokens(f: Callable[["pp.ParseResults"], Any]) -> ParseAction:
+    def action(s: str, loc: int, tokens: "pp.ParseResults") -> Any:
         return f(tokens)
 
     return action
 
 
 def parse_int(base: int) -> ParseAction:
-    def action(tokens: pp.ParseResults) -> Optional[list[Any]]:
+    def action(tokens: "pp.ParseResults") -> Optional[list[Any]]:
         assert len(tokens) == 1
         assert isinstance(tokens[0], str)
         prefix = BASE_PREFIXES.get(base, "")
@@ -32,51 +37,124 @@ def parse_int(base: int) -> ParseAction:
     return tokens(action)
 
 
-pp.ParserElement.set_default_whitespace_chars("")
+# NB: Built on first use, as most lines never need the full grammar and
+# importing pyparsing dominates startup
+@functools.cache
+def get_grammar() -> "pp.ParserElement":
+    """Full grammar for a single annotation line"""
+    import pyparsing as pp
 
-addr = pp.Word(pp.hexnums, exact=4).set_parse_action(parse_int(16))("addr")
-bank = pp.Word(pp.hexnums, exact=2).set_parse_action(parse_int(16))("bank")
-comment = pp.Combine(";" + pp.Opt(pp.CharsNotIn("\n")))
-integer = (
-    pp.Combine("0b" + pp.Word("01")).set_parse_action(parse_int(2))
-    | pp.Combine("0x" + pp.Word(pp.hexnums)).set_parse_action(parse_int(16))
-    | pp.Word(pp.nums).set_parse_action(parse_int(10))
-)
-label = pp.Combine(pp.Char(pp.identchars) + pp.Opt(pp.Word(pp.identbodychars)))("label")
-u8 = pp.Literal("u8").set_parse_action(tokens(lambda t: types.PrimitiveType.U8))
-u16 = pp.Literal("u16").set_parse_action(tokens(lambda t: types.PrimitiveType.U16))
+    pp.ParserElement.set_default_whitespace_chars("")
 
-bank_addr = pp.Group(bank + ":" + addr).set_parse_action(
-    tokens(lambda t: types.BankAddr(t[0].bank, t[0].addr))
-)("addr")
+    addr = pp.Word(pp.hexnums, exact=4).set_parse_action(parse_int(16))("addr")
+    bank = pp.Word(pp.hexnums, exact=2).set_parse_action(parse_int(16))("bank")
+    comment = pp.Combine(";" + pp.Opt(pp.CharsNotIn("\n")))
+    integer = (
+        pp.Combine("0b" + pp.Word("01")).set_parse_action(parse_int(2))
+        | pp.Combine("0x" + pp.Word(pp.hexnums)).set_parse_action(parse_int(16))
+        | pp.Word(pp.nums).set_parse_action(parse_int(10))
+    )
+    label = pp.Combine(pp.Char(pp.identchars) + pp.Opt(pp.Word(pp.identbodychars)))(
+        "label"
+    )
+    u8 = pp.Literal("u8").set_parse_action(tokens(lambda t: types.PrimitiveType.U8))
+    u16 = pp.Literal("u16").set_parse_action(tokens(lambda t: types.PrimitiveType.U16))
+
+    bank_addr = pp.Group(bank + ":" + addr).set_parse_action(
+        tokens(lambda t: types.BankAddr(t[0].bank, t[0].addr))
+    )("addr")
+
+    ann_type = pp.Forward()
+    array_type = pp.Group(
+        "[" + integer("size") + "]" + ann_type("type")
+    ).set_parse_action(
+        tokens(lambda t: types.ArrayType(type=t[0].type, size=t[0].size))
+    )
+    pointer_type = pp.Group("*" + ann_type("ty")).set_parse_action(
+        tokens(lambda t: types.PointerType(t[0].ty))
+    )
+    primitive_type = u8 | u16
+    ann_type <<= array_type | pointer_type | primitive_type
 
-ann_type = pp.Forward()
-array_type = pp.Group("[" + integer("size") + "]" + ann_type("type")).set_parse_action(
-    tokens(lambda t: types.ArrayType(type=t[0].type, size=t[0].size))
-)
-pointer_type = pp.Group("*" + ann_type("ty")).set_parse_action(
-    tokens(lambda t: types.PointerType(t[0].ty))
-)
-primitive_type = u8 | u16
-ann_type <<= array_type | pointer_type | primitive_type
+    opt_type = pp.Group("," + pp.Opt(pp.White()) + ann_type("type")).set_parse_action(
+        tokens(lambda t: t[0].type)
+    )
+    ann = pp.Group(
+        bank_addr + " " + label + pp.Opt(opt_type)("type") + pp.Opt(comment)
+    ).set_parse_action(
+        tokens(
+            lambda t: types.Ann(
+                t[0].addr, t[0].label, (t[0].type and t[0].type[0]) or None
+            )
+        )
+    )
+    return ann
 
 
-opt_type = pp.Group("," + pp.Opt(pp.White()) + ann_type("type")).set_parse_action(
-    tokens(lambda t: t[0].type)
-)
-ann = pp.Group(
-    bank_addr + " " + label + pp.Opt(opt_type)("type") + pp.Opt(comment)
-).set_parse_action(
-    tokens(
-        lambda t: types.Ann(t[0].addr, t[0].label, (t[0].type and t[0].type[0]) or None)
-    )
+# Common shape of annotation lines, restricted to ASCII so that anything this
+# accepts is parsed identically by the full grammar
+FAST_ANN = re.compile(
+    r"([0-9A-Fa-f]{2}):([0-9A-Fa-f]{4}) ([A-Za-z_][A-Za-z0-9_]*)"
+    r"(?:,[ \t]*([^;]+))?(?:;.*)?"
 )
+FAST_INTEGER = re.compile(r"0b([01]+)|0x([0-9A-Fa-f]+)|([0-9]+)")
 
 
 def parse_ann(line: str) -> types.Ann:
-    return ann.parse_string(line, parse_all=True)[0]  # type: ignore
-
-
-def parse_ann_file(f: IO[str]) -> types.AnnMapping:
-    anns = [parse_ann(line.strip()) for line in f]
-    return types.AnnMapping(anns)
+    result = parse_ann_fast(line)
+    if result is not None:
+        return result
+    return get_grammar().parse_string(line, parse_all=True)[0]  # type: ignore
+
+
+def parse_ann_fast(line: str) -> Optional[types.Ann]:
+    """Parses common annotation lines without pyparsing
+
+    Returns None for lines which need the full grammar, including invalid ones.
+    """
+    match = FAST_ANN.fullmatch(line)
+    if match is None:
+        return None
+    bank, addr, label, type_str = match.groups()
+    ty = None
+    if type_str is not None:
+        result = parse_type_fast(type_str, 0)
+        if result is None or result[1] != len(type_str):
+            return None
+        ty = result[0]
+    return types.Ann(types.BankAddr(int(bank, 16), int(addr, 16)), label, ty)
+
+
+def parse_type_fast(s: str, pos: int) -> Optional[tuple[types.AnnType, int]]:
+    """Parses a type starting at pos, returning it and the position after it"""
+    if s.startswith("u8", pos):
+        return types.PrimitiveType.U8, pos + 2
+    if s.startswith("u16", pos):
+        return types.PrimitiveType.U16, pos + 3
+    if s.startswith("*", pos):
+        result = parse_type_fast(s, pos + 1)
+        if result is None:
+            return None
+        return types.PointerType(result[0]), result[1]
+    if s.startswith("[", pos):
+        match = FAST_INTEGER.match(s, pos + 1)
+        if match is None or not s.startswith("]", match.end()):
+            return None
+        binary, hexadecimal, decimal = match.groups()
+        if binary is not None:
+            size = int(binary, 2)
+        elif hexadecimal is not None:
+            size = int(hexadecimal, 16)
+        else:
+            size = int(decimal, 10)
+        result = parse_type_fast(s, match.end() + 1)
+        if result is None:
+            return None
+        return types.ArrayType(type=result[0], size=size), result[1]
+    return None
+
+
+def parse_ann_file(
+    f: IO[str], jobs: int = 1, executor: Optional[concurrent.futures.Executor] = None
+) -> types.AnnMapping:
+    return chunks.parse_file(f, parse_ann, jobs, executor)
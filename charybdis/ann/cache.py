@@ -0,0 +1,146 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import pathlib
+from typing import Any, Callable, IO, Optional
+
+from charybdis import files
+from charybdis.ann import ann_parser, types
+
+CACHE_SUFFIX = ".cache"
+# NB: Bump whenever the annotation types change shape
+CACHE_VERSION = 2
+
+FileParser = Callable[
+    [IO[str], int, Optional[concurrent.futures.Executor]], types.AnnMapping
+]
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_path(ann_file_path: pathlib.Path) -> pathlib.Path:
+    return ann_file_path.with_name(ann_file_path.name + CACHE_SUFFIX)
+
+
+def get_source_key(ann_file_path: pathlib.Path) -> dict[str, Any]:
+    """Identifies the contents of an annotation file"""
+    stat = ann_file_path.stat()
+    with open(ann_file_path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha1").hexdigest()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest}
+
+
+def load_ann_file(
+    ann_file_path: pathlib.Path,
+    jobs: int = 1,
+    executor: Optional[concurrent.futures.Executor] = None,
+    parse_file: FileParser = ann_parser.parse_ann_file,
+) -> types.AnnMapping:
+    """Parses an annotation file, reusing the cached result if it's unchanged"""
+    cache_path = get_cache_path(ann_file_path)
+    key = get_source_key(ann_file_path)
+    anns = read_cache(cache_path, key)
+    if anns is not None:
+        logger.info("loaded annotations from %s", cache_path)
+        return anns
+    with open(ann_file_path, "r") as f:
+        anns = parse_file(f, jobs, executor)
+    write_cache(cache_path, key, anns)
+    return anns
+
+
+def read_cache(
+    cache_path: pathlib.Path, key: dict[str, Any]
+) -> Optional[types.AnnMapping]:
+    """Reads cached annotations, if present and written for the same source"""
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+        if cache["version"] != CACHE_VERSION or cache["key"] != key:
+            return None
+        ann_types = [
+            None if type is None else decode_type(type) for type in cache["types"]
+        ]
+        rows = cache["anns"]
+        # NB: Check each column in bulk, as matching every row is slower than
+        #     parsing the annotations
+        banks, addrs, labels, type_ids = zip(*rows) if len(rows) > 0 else ((),) * 4
+        if not (
+            all(type(row) is list and len(row) == 4 for row in rows)
+            and all(type(bank) is int and 0 <= bank <= 0x1FF for bank in banks)
+            and all(type(addr) is int and 0 <= addr <= 0xFFFF for addr in addrs)
+            and all(type(label) is str for label in labels)
+            and all(type(type_id) is int for type_id in type_ids)
+        ):
+            raise ValueError("invalid annotation rows")
+        return types.AnnMapping(
+            types.Ann(types.BankAddr(bank, addr), label, ann_types[type_id])
+            for bank, addr, label, type_id in rows
+        )
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning("ignoring invalid annotation cache %s", cache_path)
+        return None
+
+
+def write_cache(
+    cache_path: pathlib.Path, key: dict[str, Any], anns: types.AnnMapping
+) -> None:
+    # NB: Store flat rows with each distinct type stored once, as most
+    #     annotations share a handful of types
+    type_ids: dict[Optional[types.AnnType], int] = {}
+    rows = [
+        (
+            ann.addr.bank,
+            ann.addr.addr,
+            ann.label,
+            type_ids.setdefault(ann.type, len(type_ids)),
+        )
+        for addr_anns in anns.anns_at_address.values()
+        for ann in addr_anns
+    ]
+    cache = {
+        "version": CACHE_VERSION,
+        "key": key,
+        "types": [None if type is None else encode_type(type) for type in type_ids],
+        "anns": rows,
+    }
+    try:
+        files.write_text_atomic(cache_path, json.dumps(cache, separators=(",", ":")))
+    except OSError as e:
+        logger.warning("couldn't write annotation cache %s: %s", cache_path, e)
+
+
+def encode_type(type: types.AnnType) -> Any:
+    """Converts a type to JSON, tagged with its kind"""
+    match type:
+        case types.PrimitiveType():
+            return [type.value]
+        case types.ArrayType(element, size):
+            return ["array", encode_type(element), size]
+        case types.PointerType(element):
+            return ["pointer", encode_type(element)]
+        case types.CodeType(size):
+            return ["code", size]
+        case types.ImageType(size, width):
+            return ["image", size, width]
+
+
+def decode_type(data: Any) -> types.AnnType:
+    """Converts a type back from JSON, rejecting anything malformed"""
+    match data:
+        case [types.PrimitiveType.U8.value]:
+            return types.PrimitiveType.U8
+        case [types.PrimitiveType.U16.value]:
+            return types.PrimitiveType.U16
+        case ["array", element, int(size)]:
+            return types.ArrayType(decode_type(element), size)
+        case ["pointer", element]:
+            return types.PointerType(decode_type(element))
+        case ["code", int(size)]:
+            return types.CodeType(size)
+        case ["image", int(size), None | int() as width]:
+            return types.ImageType(size, width)
+    raise ValueError(f"invalid type {data!r}")
@@ -0,0 +1,116 @@
+import collections
+import concurrent.futures
+import functools
+import itertools
+import os
+from typing import Callable, IO, Iterable, Iterator, Optional
+
+from charybdis.ann import types
+
+LineParser = Callable[[str], Optional[types.Ann]]
+Chunk = tuple[int, list[str]]
+
+# NB: Large enough that pickling a chunk and its results is cheap relative to
+# parsing it
+CHUNK_LINES = 0x4000
+# NB: Files shorter than this many chunks aren't worth the cost of workers
+PARALLEL_MIN_CHUNKS = 4
+# Chunks submitted to workers but not yet merged, per worker
+CHUNKS_IN_FLIGHT = 2
+
+
+def parse_file(
+    f: IO[str],
+    parse_line: LineParser,
+    jobs: int = 1,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> types.AnnMapping:
+    """Parses a line-oriented annotation file, optionally in worker processes
+
+    Serially the file is parsed one line at a time. In parallel it is split
+    into line-aligned chunks which are parsed independently and merged in
+    order, so errors report the same line number either way. A pool may be
+    passed in to share it with other work.
+    """
+    anns = types.AnnMapping()
+    jobs = min(jobs, get_cpu_count())
+    if jobs > 1:
+        chunks = iter_chunks(f, CHUNK_LINES)
+        head = list(itertools.islice(chunks, PARALLEL_MIN_CHUNKS))
+        if len(head) < PARALLEL_MIN_CHUNKS:
+            for chunk in head:
+                merge_chunk(anns, parse_chunk(parse_line, chunk))
+            return anns
+        parse = functools.partial(parse_chunk, parse_line)
+        remaining = itertools.chain(head, chunks)
+        if executor is None:
+            with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+                merge_parallel(anns, remaining, parse, executor, jobs)
+        else:
+            merge_parallel(anns, remaining, parse, executor, jobs)
+        return anns
+    merge_chunk(anns, iter_anns(f, parse_line))
+    return anns
+
+
+def get_cpu_count() -> int:
+    """CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def merge_parallel(
+    anns: types.AnnMapping,
+    chunks: Iterator[Chunk],
+    parse: Callable[[Chunk], list[tuple[int, types.Ann]]],
+    executor: concurrent.futures.Executor,
+    jobs: int,
+) -> None:
+    """Parses chunks in a pool, only reading ahead while workers are busy"""
+    pending: collections.deque[
+        concurrent.futures.Future[list[tuple[int, types.Ann]]]
+    ] = collections.deque()
+    for chunk in chunks:
+        if len(pending) >= CHUNKS_IN_FLIGHT * jobs:
+            merge_chunk(anns, pending.popleft().result())
+        pending.append(executor.submit(parse, chunk))
+    while len(pending) > 0:
+        merge_chunk(anns, pending.popleft().result())
+
+
+def iter_chunks(f: IO[str], size: int) -> Iterator[Chunk]:
+    """Splits a file into chunks of lines, each with its first line number"""
+    line_number = 1
+    while lines := list(itertools.islice(f, size)):
+        yield line_number, lines
+        line_number += len(lines)
+
+
+def iter_anns(
+    lines: Iterable[str], parse_line: LineParser, first_line_number: int = 1
+) -> Iterator[tuple[int, types.Ann]]:
+    """Lazily parses lines, yielding each annotation and its line number"""
+    for line_number, line in enumerate(lines, first_line_number):
+        try:
+            ann = parse_line(line.strip())
+        except Exception as e:
+            raise Exception(f"line {line_number}: {e}") from e
+        if ann is not None:
+            yield line_number, ann
+
+
+def parse_chunk(parse_line: LineParser, chunk: Chunk) -> list[tuple[int, types.Ann]]:
+    """Parses a chunk of lines, keeping the line number of each annotation"""
+    first_line_number, lines = chunk
+    return list(iter_anns(lines, parse_line, first_line_number))
+
+
+def merge_chunk(
+    anns: types.AnnMapping, parsed: Iterable[tuple[int, types.Ann]]
+) -> None:
+    for line_number, ann in parsed:
+        try:
+            anns.add(ann)
+        except Exception as e:
+            raise Exception(f"line {line_number}: {e}") from e
@@ -1,18 +1,16 @@
+import concurrent.futures
+import functools
 import string
-from typing import Any, IO, Optional
+import typing
+from typing import Any, IO, Iterator, Optional
 
-import pyparsing as pp
+from charybdis.ann import chunks, types
 
-from charybdis.ann import types
+if typing.TYPE_CHECKING:
+    import pyparsing as pp
 
 
-basic_symbol_type = pp.Literal("code") | pp.Literal("data")
-symbol_length = pp.Word(pp.hexnums, exact=4).set_parse_action(
-    lambda s, l, t: int(t[0], 16)
-)
-
-
-def parse_basic_symbol(s: str, l: int, t: pp.ParseResults) -> Any:
+def parse_basic_symbol(s: str, l: int, t: "pp.ParseResults") -> Any:
     ty: types.AnnType
     match t[0].type:
         case "code":
@@ -24,48 +22,78 @@ def parse_basic_symbol(s: str, l: int, t: pp.ParseResults) -> Any:
     return ty
 
 
-basic_symbol = pp.Group(
-    "." + basic_symbol_type("type") + ":" + symbol_length("size")
-).set_parse_action(parse_basic_symbol)
-image_width = pp.Group(":w" + pp.Word(pp.nums)("digits")).set_parse_action(
-    lambda s, l, t: int(t[0].digits, 10)
-)
-image_symbol = pp.Group(
-    ".image" + ":" + symbol_length("size") + pp.Opt(image_width)("width")
-).set_parse_action(
-    lambda s, l, t: types.ImageType(
-        size=t[0].size, width=(t[0].width and t[0].width[0]) or None
+# NB: Built on first use, so that loading the module doesn't import pyparsing
+@functools.cache
+def get_grammar() -> "pp.ParserElement":
+    """Grammar for a single symbol line"""
+    import pyparsing as pp
+
+    # NB: Whitespace is significant in symbol lines
+    pp.ParserElement.set_default_whitespace_chars("")
+
+    basic_symbol_type = pp.Literal("code") | pp.Literal("data")
+    symbol_length = pp.Word(pp.hexnums, exact=4).set_parse_action(
+        lambda s, l, t: int(t[0], 16)
     )
-)
-
-
-symbol = image_symbol | basic_symbol
-symbol_line = pp.Group(
-    pp.Word(pp.hexnums, exact=2)("bank")
-    + ":"
-    + pp.Word(pp.hexnums, exact=4)("addr")
-    + " "
-    + symbol("symbol")
-).set_parse_action(
-    lambda s, l, t: types.ann(
-        bank=int(t[0].bank, 16), addr=int(t[0].addr, 16), label="", type=t[0].symbol[0]
+    basic_symbol = pp.Group(
+        "." + basic_symbol_type("type") + ":" + symbol_length("size")
+    ).set_parse_action(parse_basic_symbol)
+    image_width = pp.Group(":w" + pp.Word(pp.nums)("digits")).set_parse_action(
+        lambda s, l, t: int(t[0].digits, 10)
+    )
+    image_symbol = pp.Group(
+        ".image" + ":" + symbol_length("size") + pp.Opt(image_width)("width")
+    ).set_parse_action(
+        lambda s, l, t: types.ImageType(
+            size=t[0].size, width=(t[0].width and t[0].width[0]) or None
+        )
     )
-)
-symbol_line_opt = (symbol_line | pp.Opt(pp.White())).set_parse_action(
-    lambda s, l, t: t[0] if len(t) == 1 and isinstance(t[0], types.Ann) else []
-)
 
-comment = pp.Combine(";" + pp.Opt(pp.Word(string.printable)))
-line = pp.Group(symbol_line_opt("opt_sym") + pp.Opt(comment)).set_parse_action(
-    lambda s, l, t: t[0].opt_sym if isinstance(t[0].opt_sym, types.Ann) else []
-)
+    symbol = image_symbol | basic_symbol
+    # NB: Plain labels as written by rgblink and emulators, including
+    #     qualified local labels such as Main.loop
+    label = pp.Combine(
+        pp.Char(pp.identchars) + pp.Opt(pp.Word(pp.identbodychars + ".@#$"))
+    )
+    symbol_line = pp.Group(
+        pp.Word(pp.hexnums, min=2, max=3)("bank")
+        + ":"
+        + pp.Word(pp.hexnums, exact=4)("addr")
+        + " "
+        + (symbol("symbol") | label("label"))
+    ).set_parse_action(
+        lambda s, l, t: types.ann(
+            bank=int(t[0].bank, 16),
+            addr=int(t[0].addr, 16),
+            label=t[0].label or "",
+            type=(t[0].symbol and t[0].symbol[0]) or None,
+        )
+    )
+    symbol_line_opt = (symbol_line | pp.Opt(pp.White())).set_parse_action(
+        lambda s, l, t: t[0] if len(t) == 1 and isinstance(t[0], types.Ann) else []
+    )
+
+    comment = pp.Combine(";" + pp.Opt(pp.Word(string.printable)))
+    return pp.Group(symbol_line_opt("opt_sym") + pp.Opt(comment)).set_parse_action(
+        lambda s, l, t: t[0].opt_sym if isinstance(t[0].opt_sym, types.Ann) else []
+    )
 
 
 def parse_sym_line(raw_line: str) -> Optional[types.Ann]:
-    result = line.parse_string(raw_line, parse_all=True)
+    result = get_grammar().parse_string(raw_line, parse_all=True)
     return result[0] if len(result) == 1 else None
 
 
-def parse_sym_file(f: IO[str]) -> types.AnnMapping:
-    anns = [parse_sym_line(line.strip()) for line in f]
-    return types.AnnMapping([ann for ann in anns if ann is not None])
+def iter_sym_file(f: IO[str]) -> Iterator[types.Ann]:
+    """Lazily parses annotations from a symbol file, one line at a time
+
+    Works with any text stream, including pipes such as stdin.
+    """
+    for _, ann in chunks.iter_anns(f, parse_sym_line):
+        yield ann
+
+
+def parse_sym_file(
+    f: IO[str], jobs: int = 1, executor: Optional[concurrent.futures.Executor] = None
+) -> types.AnnMapping:
+    return chunks.parse_file(f, parse_sym_line, jobs, executor)
@@ -1,7 +1,9 @@
+import array
+import bisect
 import collections
 import dataclasses
 import enum
-from typing import Optional, Union
+from typing import Iterable, Mapping, Optional, Sequence, Union
 
 
 @dataclasses.dataclass(frozen=True)
@@ -42,6 +44,17 @@ class PrimitiveType(enum.Enum):
     U16 = "U16"
 
 
+def get_type_size(type: AnnType) -> int:
+    """Bytes of memory covered by a value of a type"""
+    if isinstance(type, ArrayType):
+        return type.size * get_type_size(type.type)
+    if isinstance(type, (CodeType, ImageType)):
+        return type.size
+    if isinstance(type, PointerType) or type == PrimitiveType.U16:
+        return 2
+    return 1
+
+
 @dataclasses.dataclass(frozen=True)
 class Ann:
     """Optionally typed label at a specific address"""
@@ -51,17 +64,71 @@ class Ann:
     type: Optional[AnnType]
 
 
+class AnnIndex:
+    """Frozen per-bank view of annotations for fast lookups
+
+    Addresses within each bank are kept sorted so that range queries are
+    bisections rather than scans.
+    """
+
+    _anns: dict[int, dict[int, tuple[Ann, ...]]]
+    _addrs: dict[int, "array.array[int]"]
+
+    def __init__(self, anns_at_address: Mapping[BankAddr, Iterable[Ann]]) -> None:
+        self._anns = {}
+        for addr, anns in anns_at_address.items():
+            sorted_anns = tuple(anns)
+            if len(sorted_anns) == 0:
+                continue
+            # NB: Most addresses have a single annotation, which needs no sort
+            if len(sorted_anns) > 1:
+                sorted_anns = tuple(sorted(sorted_anns, key=repr))
+            self._anns.setdefault(addr.bank, {})[addr.addr] = sorted_anns
+        self._addrs = {
+            bank: array.array("H", sorted(bank_anns))
+            for bank, bank_anns in self._anns.items()
+        }
+
+    def banks(self) -> list[int]:
+        return sorted(self._anns)
+
+    def at(self, bank: int, addr: int) -> tuple[Ann, ...]:
+        """Annotations at an address, without modifying anything on a miss"""
+        bank_anns = self._anns.get(bank)
+        if bank_anns is None:
+            return ()
+        return bank_anns.get(addr, ())
+
+    def next_at_or_after(self, bank: int, addr: int) -> Optional[int]:
+        """First annotated address in a bank which is at least addr"""
+        addrs = self._addrs.get(bank)
+        if addrs is None:
+            return None
+        i = bisect.bisect_left(addrs, addr)
+        return addrs[i] if i < len(addrs) else None
+
+    def addresses_in(self, bank: int, start: int, end: int) -> Sequence[int]:
+        """Annotated addresses in a bank from start up to but excluding end"""
+        addrs = self._addrs.get(bank)
+        if addrs is None:
+            return ()
+        return addrs[bisect.bisect_left(addrs, start) : bisect.bisect_left(addrs, end)]
+
+
 class AnnMapping:
     anns_at_address: dict[BankAddr, set[Ann]]
     label_addresses: dict[str, BankAddr]
+    _index: Optional[AnnIndex]
 
-    def __init__(self, anns: list[Ann] = []) -> None:
+    def __init__(self, anns: Iterable[Ann] = ()) -> None:
         self.anns_at_address = collections.defaultdict(set)
         self.label_addresses = {}
+        self._index = None
         for ann in anns:
             self.add(ann)
 
     def add(self, ann: Ann) -> None:
+        self._index = None
         self.anns_at_address[ann.addr].add(ann)
         if ann.label == "":
             return
@@ -70,7 +137,13 @@ class AnnMapping:
         self.label_addresses[ann.label] = ann.addr
 
     def has(self, ann: Ann) -> bool:
-        return ann in self.anns_at_address[ann.addr]
+        return ann in self.anns_at_address.get(ann.addr, ())
+
+    def index(self) -> AnnIndex:
+        """Index of the current annotations, built on first use"""
+        if self._index is None:
+            self._index = AnnIndex(self.anns_at_address)
+        return self._index
 
     def get_label_address(self, label: str) -> Optional[BankAddr]:
         return self.label_addresses.get(label)
@@ -1,16 +1,23 @@
 import argparse
+import glob
+import json
+import os.path
 import pathlib
+import sys
+from typing import Callable, Optional, TypeVar
 
-from charybdis import io
+from charybdis import io, timing
+
+T = TypeVar("T")
+
+ROM_EXTENSIONS = {io.EXTENSION_GB, io.EXTENSION_GBC}
 
 
 def get_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser()
-    parser.add_argument(
-        "--overwrite",
-        action=argparse.BooleanOptionalAction,
-        help="do/don't overwrite output directory",
+    parser = argparse.ArgumentParser(
+        epilog="see `%(prog)s batch --help' to disassemble many ROMs at once"
     )
+    add_options(parser)
     parser.add_argument(
         "rom_file_path", metavar="rom.gb", help="DMG/GBC ROM to disassemble"
     )
@@ -24,16 +31,210 @@ def get_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def main() -> None:
-    parser = get_parser()
-    args = parser.parse_args()
-    io.disassemble(
-        io.DisassemblerOptions(
-            output_directory_path=pathlib.Path(args.output_directory_path),
-            overwrite=args.overwrite,
-            rom_file_path=pathlib.Path(args.rom_file_path),
-        )
+def get_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog=f"{os.path.basename(sys.argv[0])} batch",
+        description="disassemble many ROMs in a single process",
+    )
+    add_options(parser)
+    parser.add_argument(
+        "-o",
+        "--output",
+        dest="output_directory_path",
+        metavar="output_dir",
+        default="output",
+        help="where to generate a directory per ROM (defaults to `./output')",
+    )
+    parser.add_argument(
+        "rom_paths",
+        metavar="rom",
+        nargs="+",
+        help="DMG/GBC ROMs, directories of ROMs or glob patterns",
+    )
+    return parser
+
+
+def add_options(parser: argparse.ArgumentParser) -> None:
+    """Adds the options shared by single ROM and batch runs"""
+    parser.add_argument(
+        "--overwrite",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="do/don't overwrite output directory",
+    )
+    parser.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="do/don't only rewrite banks whose ROM data or annotations changed",
+    )
+    parser.add_argument(
+        "--trace",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="do/don't trace control flow to separate code from data",
+    )
+    parser.add_argument(
+        "--auto-labels",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="do/don't label jump, branch and call targets",
+    )
+    parser.add_argument(
+        "--ann-cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="do/don't cache parsed annotations next to the ROM",
     )
+    parser.add_argument(
+        "--db-width",
+        type=int,
+        default=io.DEFAULT_DB_WIDTH,
+        metavar="N",
+        help=f"bytes per DB line (defaults to {io.DEFAULT_DB_WIDTH})",
+    )
+    parser.add_argument(
+        "--incbin-threshold",
+        type=int,
+        default=0,
+        metavar="BYTES",
+        help="extract data runs of at least this size to INCBIN files",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="number of banks to disassemble in parallel (defaults to 1)",
+    )
+    parser.add_argument(
+        "--write-queue-depth",
+        type=int,
+        default=io.DEFAULT_WRITE_QUEUE_DEPTH,
+        metavar="N",
+        help="banks to render ahead of the writer thread, 0 writes inline "
+        f"(defaults to {io.DEFAULT_WRITE_QUEUE_DEPTH})",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=int,
+        default=io.DEFAULT_BUFFER_SIZE,
+        metavar="BYTES",
+        help=f"output file buffer size (defaults to {io.DEFAULT_BUFFER_SIZE})",
+    )
+    parser.add_argument(
+        "--timings",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="do/don't print time spent in each stage and counters to stderr",
+    )
+    parser.add_argument(
+        "--timings-json",
+        metavar="PATH",
+        help="save time spent in each stage and counters to PATH as JSON",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="save cProfile statistics of the main process to PATH",
+    )
+
+
+def get_options(
+    args: argparse.Namespace, rom_file_path: str = ""
+) -> io.DisassemblerOptions:
+    return io.DisassemblerOptions(
+        output_directory_path=pathlib.Path(args.output_directory_path),
+        overwrite=args.overwrite,
+        incremental=args.incremental,
+        trace=args.trace,
+        auto_labels=args.auto_labels,
+        ann_cache=args.ann_cache,
+        db_width=args.db_width,
+        incbin_threshold=args.incbin_threshold,
+        jobs=args.jobs,
+        buffer_size=args.buffer_size,
+        write_queue_depth=args.write_queue_depth,
+        rom_file_path=pathlib.Path(rom_file_path),
+    )
+
+
+def find_roms(rom_paths: list[str]) -> list[pathlib.Path]:
+    """Expands directories and glob patterns into ROM file paths"""
+    rom_file_paths = []
+    for rom_path in rom_paths:
+        # NB: Keep paths which match nothing so they are reported as failures
+        for match in sorted(glob.glob(rom_path)) or [rom_path]:
+            path = pathlib.Path(match)
+            if path.is_dir():
+                rom_file_paths.extend(
+                    sorted(
+                        child
+                        for child in path.iterdir()
+                        if child.suffix.lower() in ROM_EXTENSIONS
+                    )
+                )
+            else:
+                rom_file_paths.append(path)
+    return rom_file_paths
+
+
+def run_profiled(args: argparse.Namespace, f: Callable[[], T]) -> T:
+    """Runs f, saving cProfile statistics if requested"""
+    if args.profile is None:
+        return f()
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(f)
+    finally:
+        profiler.dump_stats(args.profile)
+
+
+def report_timings(args: argparse.Namespace, timings: timing.Timings) -> None:
+    if args.timings:
+        print(timings.format_table(), file=sys.stderr)
+    if args.timings_json is not None:
+        with open(args.timings_json, "w") as f:
+            json.dump(timings.to_json(), f, indent=2)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["batch"]:
+        main_batch(argv[1:])
+        return
+    args = get_parser().parse_args(argv)
+    options = get_options(args, args.rom_file_path)
+    timings = run_profiled(args, lambda: io.disassemble(options))
+    report_timings(args, timings)
+
+
+def main_batch(argv: list[str]) -> None:
+    args = get_batch_parser().parse_args(argv)
+    rom_file_paths = find_roms(args.rom_paths)
+    options = get_options(args)
+    results = run_profiled(args, lambda: io.disassemble_batch(options, rom_file_paths))
+    timings = timing.Timings()
+    failures = 0
+    for result in results:
+        if result.timings is not None:
+            timings.merge(result.timings)
+        if result.error is None:
+            print(f"{result.rom_file_path}: {result.seconds:.2f}s")
+        else:
+            failures += 1
+            print(
+                f"{result.rom_file_path}: failed after {result.seconds:.2f}s: "
+                f"{result.error}"
+            )
+    print(f"{len(results) - failures} of {len(results)} ROMs disassembled")
+    report_timings(args, timings)
+    if failures > 0:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,640 +1,560 @@
 import dataclasses
-from typing import Optional
+import enum
+import typing
+from typing import Callable, Optional, Union
 
 from charybdis import insn
 
+PREFIX_CB = 0xCB
+OPCODE_STOP = 0x10
 
-@dataclasses.dataclass
+ROM_BANK_SIZE = 0x4000  # 16 KiB
+ROMX_START = 0x4000
+ROMX_END = 0x8000
+
+# ROM contents, either read into memory or mapped from disk
+RomData = Union[bytes, memoryview]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class DecodedInsn:
     insn: insn.Insn
     size: int
+    opcode: Optional["Opcode"] = dataclasses.field(
+        default=None, compare=False, repr=False
+    )
 
+    def render(self) -> str:
+        """Render to RGBDS text, reusing the text precomputed for the opcode"""
+        op = self.opcode
+        if op is None:
+            return self.insn.render()
+        if op.decoded is not None:
+            return op.text
+        imm = self.insn.operands[len(op.imm_prefix)]
+        return op.text + insn.render_operand(imm) + op.text_suffix
 
-def decode_insn(rom: bytes, index: int) -> Optional[DecodedInsn]:
-    decoded = None
-    byte = rom[index]
-    size = 1
-    match byte:
-        # NOP
-        case 0x00:
-            decoded = insn.Insn(name=insn.InsnName.NOP)
-        # LD BC, nn
-        case 0x01:
-            size = 3
-            imm16 = load_u16(rom, index + 1)
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R16.BC, imm16])
-        # LD [BC], A
-        case 0x02:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD,
-                operands=[insn.IndirectR16(insn.R16.BC), insn.R8.A],
-            )
-        # LD B, n
-        case 0x06:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.B, insn.U8(imm)]
-            )
-        # RLCA
-        case 0x07:
-            decoded = insn.Insn(name=insn.InsnName.RLCA)
-        # LD [nn], SP
-        case 0x08:
-            size = 3
-            addr = load_u16(rom, index + 1)
-            decoded = insn.Insn(
-                name=insn.InsnName.LD,
-                operands=[insn.DirectU16(addr), insn.R16.SP],
-            )
-        # LD A, [BC]
-        case 0x0A:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD,
-                operands=[insn.R8.A, insn.IndirectR16(insn.R16.BC)],
-            )
-        # LD C, n
-        case 0x0E:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.C, insn.U8(imm)]
-            )
-        # RRCA
-        case 0x0F:
-            decoded = insn.Insn(name=insn.InsnName.RRCA)
-        # LD DE, nn
-        case 0x11:
-            size = 3
-            imm16 = load_u16(rom, index + 1)
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R16.DE, imm16])
-        # LD (DE), A
-        case 0x12:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD,
-                operands=[insn.IndirectR16(insn.R16.DE), insn.R8.A],
-            )
-        # LD D, n
-        case 0x16:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.D, insn.U8(imm)]
-            )
-        # RLA
-        case 0x17:
-            decoded = insn.Insn(name=insn.InsnName.RLA)
-        # LD A, (DE)
-        case 0x1A:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD,
-                operands=[insn.R8.A, insn.IndirectR16(insn.R16.DE)],
-            )
-        # LD E, n
-        case 0x1E:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.E, insn.U8(imm)]
-            )
-        # RRA
-        case 0x1F:
-            decoded = insn.Insn(name=insn.InsnName.RRA)
-        # LD HL, nn
-        case 0x21:
-            size = 3
-            imm16 = load_u16(rom, index + 1)
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R16.HL, imm16])
-        # LD [HL+], A
-        case 0x22:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.IndirectHLIncr(), insn.R8.A]
-            )
-        # LD H, n
-        case 0x26:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.H, insn.U8(imm)]
-            )
-        # DAA
-        case 0x27:
-            decoded = insn.Insn(name=insn.InsnName.DAA)
-        # LD A, [HL+]
-        case 0x2A:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.A, insn.IndirectHLIncr()]
-            )
-        # LD L, n
-        case 0x2E:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.L, insn.U8(imm)]
-            )
-        # CPL
-        case 0x2F:
-            decoded = insn.Insn(name=insn.InsnName.CPL)
-        # LD SP, nn
-        case 0x31:
-            size = 3
-            imm16 = load_u16(rom, index + 1)
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R16.SP, imm16])
-        # LD [HL-], A
-        case 0x32:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.IndirectHLDecr(), insn.R8.A]
-            )
-        # LD [HL], n
-        case 0x36:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.HL, insn.U8(imm)]
-            )
-        # SCF
-        case 0x37:
-            decoded = insn.Insn(name=insn.InsnName.SCF)
-        # LD A, [HL-]
-        case 0x3A:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.A, insn.IndirectHLDecr()]
-            )
-        # CCF
-        case 0x3F:
-            decoded = insn.Insn(name=insn.InsnName.CCF)
-        # LD A, n
-        case 0x3E:
-            size = 2
-            imm = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R8.A, insn.U8(imm)]
-            )
-        # LD B, B
-        case 0x40:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.B])
-        # LD B, C
-        case 0x41:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.C])
-        # LD B, D
-        case 0x42:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.D])
-        # LD B, E
-        case 0x43:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.E])
-        # LD B, H
-        case 0x44:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.H])
-        # LD B, L
-        case 0x45:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.L])
-        # LD B, [HL]
-        case 0x46:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.HL])
-        # LD B, A
-        case 0x47:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.B, insn.R8.A])
-        # LD C, B
-        case 0x48:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.B])
-        # LD C, C
-        case 0x49:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.C])
-        # LD C, D
-        case 0x4A:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.D])
-        # LD C, E
-        case 0x4B:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.E])
-        # LD C, H
-        case 0x4C:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.H])
-        # LD C, L
-        case 0x4D:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.L])
-        # LD C, [HL]
-        case 0x4E:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.HL])
-        # LD C, A
-        case 0x4F:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.C, insn.R8.A])
-        # LD D, B
-        case 0x50:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.B])
-        # LD D, C
-        case 0x51:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.C])
-        # LD D, D
-        case 0x52:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.D])
-        # LD D, E
-        case 0x53:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.E])
-        # LD D, H
-        case 0x54:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.H])
-        # LD D, L
-        case 0x55:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.L])
-        # LD D, [HL]
-        case 0x56:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.HL])
-        # LD D, A
-        case 0x57:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.D, insn.R8.A])
-        # LD E, B
-        case 0x58:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.B])
-        # LD E, C
-        case 0x59:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.C])
-        # LD E, D
-        case 0x5A:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.D])
-        # LD E, E
-        case 0x5B:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.E])
-        # LD E, H
-        case 0x5C:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.H])
-        # LD E, L
-        case 0x5D:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.L])
-        # LD E, [HL]
-        case 0x5E:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.HL])
-        # LD E, A
-        case 0x5F:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.E, insn.R8.A])
-        # LD H, B
-        case 0x60:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.B])
-        # LD H, C
-        case 0x61:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.C])
-        # LD H, D
-        case 0x62:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.D])
-        # LD H, E
-        case 0x63:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.E])
-        # LD H, H
-        case 0x64:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.H])
-        # LD H, L
-        case 0x65:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.L])
-        # LD H, [HL]
-        case 0x66:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.HL])
-        # LD H, A
-        case 0x67:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.H, insn.R8.A])
-        # LD L, B
-        case 0x68:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.B])
-        # LD L, C
-        case 0x69:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.C])
-        # LD L, D
-        case 0x6A:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.D])
-        # LD L, E
-        case 0x6B:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.E])
-        # LD L, H
-        case 0x6C:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.H])
-        # LD L, L
-        case 0x6D:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.L])
-        # LD L, [HL]
-        case 0x6E:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.HL])
-        # LD L, A
-        case 0x6F:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.L, insn.R8.A])
-        # LD [HL], B
-        case 0x70:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.HL, insn.R8.B])
-        # LD [HL], C
-        case 0x71:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.HL, insn.R8.C])
-        # LD [HL], D
-        case 0x72:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.HL, insn.R8.D])
-        # LD [HL], E
-        case 0x73:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.HL, insn.R8.E])
-        # LD [HL], H
-        case 0x74:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.HL, insn.R8.H])
-        # LD [HL], L
-        case 0x75:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.HL, insn.R8.L])
-        # HALT
-        case 0x76:
-            decoded = insn.Insn(name=insn.InsnName.HALT)
-        # LD [HL], A
-        case 0x77:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.HL, insn.R8.A])
-        # LD A, B
-        case 0x78:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.B])
-        # LD A, C
-        case 0x79:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.C])
-        # LD A, D
-        case 0x7A:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.D])
-        # LD A, E
-        case 0x7B:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.E])
-        # LD A, H
-        case 0x7C:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.H])
-        # LD A, L
-        case 0x7D:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.L])
-        # LD A, [HL]
-        case 0x7E:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.HL])
-        # LD A, A
-        case 0x7F:
-            decoded = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.A])
-        # ADD B
-        case 0x80:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.B])
-        # ADD C
-        case 0x81:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.C])
-        # ADD D
-        case 0x82:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.D])
-        # ADD E
-        case 0x83:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.E])
-        # ADD H
-        case 0x84:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.H])
-        # ADD L
-        case 0x85:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.L])
-        # ADD (HL)
-        case 0x86:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.HL])
-        # ADD A
-        case 0x87:
-            decoded = insn.Insn(name=insn.InsnName.ADD, operands=[insn.R8.A])
-        # ADC B
-        case 0x88:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.B])
-        # ADC C
-        case 0x89:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.C])
-        # ADC D
-        case 0x8A:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.D])
-        # ADC E
-        case 0x8B:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.E])
-        # ADC H
-        case 0x8C:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.H])
-        # ADC L
-        case 0x8D:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.L])
-        # ADC (HL)
-        case 0x8E:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.HL])
-        # ADC A
-        case 0x8F:
-            decoded = insn.Insn(name=insn.InsnName.ADC, operands=[insn.R8.A])
-        # SUB B
-        case 0x90:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.B])
-        # SUB C
-        case 0x91:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.C])
-        # SUB D
-        case 0x92:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.D])
-        # SUB E
-        case 0x93:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.E])
-        # SUB H
-        case 0x94:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.H])
-        # SUB L
-        case 0x95:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.L])
-        # SUB (HL)
-        case 0x96:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.HL])
-        # SUB A
-        case 0x97:
-            decoded = insn.Insn(name=insn.InsnName.SUB, operands=[insn.R8.A])
-        # SBC B
-        case 0x98:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.B])
-        # SBC C
-        case 0x99:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.C])
-        # SBC D
-        case 0x9A:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.D])
-        # SBC E
-        case 0x9B:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.E])
-        # SBC H
-        case 0x9C:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.H])
-        # SBC L
-        case 0x9D:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.L])
-        # SBC (HL)
-        case 0x9E:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.HL])
-        # SBC A
-        case 0x9F:
-            decoded = insn.Insn(name=insn.InsnName.SBC, operands=[insn.R8.A])
-        # AND B
-        case 0xA0:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.B])
-        # AND C
-        case 0xA1:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.C])
-        # AND D
-        case 0xA2:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.D])
-        # AND E
-        case 0xA3:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.E])
-        # AND H
-        case 0xA4:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.H])
-        # AND L
-        case 0xA5:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.L])
-        # AND (HL)
-        case 0xA6:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.HL])
-        # AND A
-        case 0xA7:
-            decoded = insn.Insn(name=insn.InsnName.AND, operands=[insn.R8.A])
-        # XOR B
-        case 0xA8:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.B])
-        # XOR C
-        case 0xA9:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.C])
-        # XOR D
-        case 0xAA:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.D])
-        # XOR E
-        case 0xAB:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.E])
-        # XOR H
-        case 0xAC:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.H])
-        # XOR L
-        case 0xAD:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.L])
-        # XOR (HL)
-        case 0xAE:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.HL])
-        # XOR A
-        case 0xAF:
-            decoded = insn.Insn(name=insn.InsnName.XOR, operands=[insn.R8.A])
-        # OR B
-        case 0xB0:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.B])
-        # OR C
-        case 0xB1:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.C])
-        # OR D
-        case 0xB2:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.D])
-        # OR E
-        case 0xB3:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.E])
-        # OR H
-        case 0xB4:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.H])
-        # OR L
-        case 0xB5:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.L])
-        # OR (HL)
-        case 0xB6:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.HL])
-        # OR A
-        case 0xB7:
-            decoded = insn.Insn(name=insn.InsnName.OR, operands=[insn.R8.A])
-        # CP B
-        case 0xB8:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.B])
-        # CP C
-        case 0xB9:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.C])
-        # CP D
-        case 0xBA:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.D])
-        # CP E
-        case 0xBB:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.E])
-        # CP H
-        case 0xBC:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.H])
-        # CP L
-        case 0xBD:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.L])
-        # CP (HL)
-        case 0xBE:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.HL])
-        # CP A
-        case 0xBF:
-            decoded = insn.Insn(name=insn.InsnName.CP, operands=[insn.R8.A])
-        # POP BC
-        case 0xC1:
-            decoded = insn.Insn(name=insn.InsnName.POP, operands=[insn.R16.BC])
-        # PUSH BC
-        case 0xC5:
-            decoded = insn.Insn(name=insn.InsnName.PUSH, operands=[insn.R16.BC])
-        # POP DE
-        case 0xD1:
-            decoded = insn.Insn(name=insn.InsnName.POP, operands=[insn.R16.DE])
-        # PUSH BC
-        case 0xD5:
-            decoded = insn.Insn(name=insn.InsnName.PUSH, operands=[insn.R16.DE])
-        # LDH [n], A
-        case 0xE0:
-            size = 2
-            offset = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LDH,
-                operands=[insn.DirectU16(insn.U16(0xFF00 + offset)), insn.R8.A],
-            )
-        # POP HL
-        case 0xE1:
-            decoded = insn.Insn(name=insn.InsnName.POP, operands=[insn.R16.HL])
-        # LDH (C), A
-        case 0xE2:
-            decoded = insn.Insn(
-                name=insn.InsnName.LDH, operands=[insn.IndirectHramC(), insn.R8.A]
-            )
-        # PUSH HL
-        case 0xE5:
-            decoded = insn.Insn(name=insn.InsnName.PUSH, operands=[insn.R16.HL])
-        # LD [nn], A
-        case 0xEA:
-            size = 3
-            addr = load_u16(rom, index + 1)
-            decoded = insn.Insn(
-                name=insn.InsnName.LD,
-                operands=[insn.DirectU16(addr), insn.R8.A],
-            )
-        # LDH A, [n]
-        case 0xF0:
-            size = 2
-            offset = rom[index + 1]
-            decoded = insn.Insn(
-                name=insn.InsnName.LDH,
-                operands=[insn.R8.A, insn.DirectU16(insn.U16(0xFF00 + offset))],
-            )
-        # POP AF
-        case 0xF1:
-            decoded = insn.Insn(name=insn.InsnName.POP, operands=[insn.R16.AF])
-        # LDH A, [C]
-        case 0xF2:
-            decoded = insn.Insn(
-                name=insn.InsnName.LDH, operands=[insn.R8.A, insn.IndirectHramC()]
-            )
-        # DI
-        case 0xF3:
-            decoded = insn.Insn(name=insn.InsnName.DI)
-        # PUSH AF
-        case 0xF5:
-            decoded = insn.Insn(name=insn.InsnName.PUSH, operands=[insn.R16.AF])
-        # LD SP, HL
-        case 0xF9:
-            decoded = insn.Insn(
-                name=insn.InsnName.LD, operands=[insn.R16.SP, insn.R16.HL]
-            )
-        # LD A, [nn]
-        case 0xFA:
-            size = 3
-            addr = load_u16(rom, index + 1)
-            decoded = insn.Insn(
-                name=insn.InsnName.LD,
-                operands=[insn.R8.A, insn.DirectU16(addr)],
-            )
-        # EI
-        case 0xFB:
-            decoded = insn.Insn(name=insn.InsnName.EI)
-
-    return DecodedInsn(insn=decoded, size=size) if decoded is not None else None
-
-
-def load_u16(rom: bytes, index: int) -> insn.U16:
+
+class Imm(enum.Enum):
+    """Operand read from the bytes following an opcode"""
+
+    U8 = "n"
+    U16 = "nn"
+    DIRECT_U16 = "[nn]"
+    DIRECT_HRAM = "[$ff00+n]"
+    RELATIVE = "e"
+    I8 = "i"
+    SP_RELATIVE = "sp+i"
+
+
+class Flow(enum.Enum):
+    """Effect of an instruction on control flow"""
+
+    # Continues with the following instruction
+    NEXT = "next"
+    # Continues at the target
+    JUMP = "jump"
+    # Continues at the target or with the following instruction
+    BRANCH = "branch"
+    # Calls the target, then continues with the following instruction
+    CALL = "call"
+    # Returns to the caller
+    RETURN = "return"
+    # Returns to the caller or continues with the following instruction
+    RETURN_COND = "return_cond"
+    # Continues at an address only known at runtime
+    JUMP_INDIRECT = "jump_indirect"
+
+
+FLOWS_WITH_TARGET = frozenset([Flow.JUMP, Flow.BRANCH, Flow.CALL])
+FLOWS_WITH_FALLTHROUGH = frozenset(
+    [Flow.NEXT, Flow.BRANCH, Flow.CALL, Flow.RETURN_COND]
+)
+
+# NB: Returns None for immediates which can't be represented
+ImmDecoder = Callable[[RomData, int], Optional[insn.InsnOperand]]
+OperandTemplate = Union[insn.InsnOperand, Imm]
+
+
+@dataclasses.dataclass(frozen=True)
+class Opcode:
+    """Static description of how to decode a single opcode"""
+
+    name: insn.InsnName
+    operands: tuple[OperandTemplate, ...]
+    size: int
+    # Machine cycles taken, and taken by a conditional instruction whose
+    # condition holds
+    cycles: int
+    cycles_taken: Optional[int] = None
+    flow: Flow = Flow.NEXT
+    # Followed by a byte which must be zero
+    padded: bool = False
+    imm_offset: int = 0
+    # Fixed operands either side of the immediate operand
+    imm_prefix: tuple[insn.InsnOperand, ...] = ()
+    imm_suffix: tuple[insn.InsnOperand, ...] = ()
+    imm_decoder: Optional[ImmDecoder] = None
+    # Shared result for opcodes without an immediate operand
+    decoded: Optional[DecodedInsn] = None
+    # Rendered text, split around the immediate operand if there is one
+    text: str = ""
+    text_suffix: str = ""
+
+
+def load_u16(rom: RomData, index: int) -> insn.U16:
     """Reads an unsigned 16-bit value in little endian order"""
     return insn.U16(rom[index] + (rom[index + 1] << 8))
+
+
+def rom_address(index: int) -> int:
+    """Address at which a ROM index is visible when its bank is mapped"""
+    if index < ROMX_START:
+        return index
+    return ROMX_START + index % ROM_BANK_SIZE
+
+
+def _decode_relative(rom: RomData, index: int) -> Optional[insn.InsnOperand]:
+    # NB: Offset is relative to the end of the instruction
+    offset = rom[index] - 0x100 if rom[index] >= 0x80 else rom[index]
+    target = rom_address(index + 1) + offset
+    return insn.U16(target) if target >= 0 else None
+
+
+def _decode_u8(rom: RomData, index: int) -> insn.InsnOperand:
+    return insn.u8(rom[index])
+
+
+def _decode_i8(rom: RomData, index: int) -> insn.InsnOperand:
+    return insn.i8(rom[index])
+
+
+def _decode_sp_relative(rom: RomData, index: int) -> insn.InsnOperand:
+    return insn.SPRelative(insn.i8(rom[index]))
+
+
+def _decode_direct_u16(rom: RomData, index: int) -> insn.InsnOperand:
+    return insn.DirectU16(load_u16(rom, index))
+
+
+def _decode_direct_hram(rom: RomData, index: int) -> insn.InsnOperand:
+    return insn.direct_hram(rom[index])
+
+
+IMM_SIZES = {
+    Imm.U8: 1,
+    Imm.U16: 2,
+    Imm.DIRECT_U16: 2,
+    Imm.DIRECT_HRAM: 1,
+    Imm.RELATIVE: 1,
+    Imm.I8: 1,
+    Imm.SP_RELATIVE: 1,
+}
+
+IMM_DECODERS: dict[Imm, ImmDecoder] = {
+    Imm.U8: _decode_u8,
+    Imm.U16: load_u16,
+    Imm.DIRECT_U16: _decode_direct_u16,
+    Imm.DIRECT_HRAM: _decode_direct_hram,
+    Imm.RELATIVE: _decode_relative,
+    Imm.I8: _decode_i8,
+    Imm.SP_RELATIVE: _decode_sp_relative,
+}
+
+
+def opcode(
+    name: insn.InsnName,
+    *operands: OperandTemplate,
+    cycles: int,
+    cycles_taken: Optional[int] = None,
+    prefixed: bool = False,
+    padded: bool = False,
+    flow: Flow = Flow.NEXT,
+) -> Opcode:
+    """Builds an opcode description, deriving its size from the operands"""
+    size = 2 if prefixed or padded else 1
+    imms = [i for i, operand in enumerate(operands) if isinstance(operand, Imm)]
+    # NB: SM83 instructions never take more than one immediate
+    assert len(imms) <= 1
+    if len(imms) == 0:
+        fixed = typing.cast(tuple[insn.InsnOperand, ...], operands)
+        op = Opcode(
+            name=name,
+            operands=operands,
+            size=size,
+            cycles=cycles,
+            cycles_taken=cycles_taken,
+            flow=flow,
+            padded=padded,
+            text=insn.Insn(name=name, operands=fixed).render(),
+        )
+        # NB: Circular reference so the shared result can render via the opcode
+        decoded = DecodedInsn(insn=insn.Insn(name=name, operands=fixed), size=size)
+        object.__setattr__(decoded, "opcode", op)
+        object.__setattr__(op, "decoded", decoded)
+        return op
+    i = imms[0]
+    imm = typing.cast(Imm, operands[i])
+    imm_prefix = typing.cast(tuple[insn.InsnOperand, ...], operands[:i])
+    imm_suffix = typing.cast(tuple[insn.InsnOperand, ...], operands[i + 1 :])
+    text = name.value.lower() + " "
+    text += "".join(insn.render_operand(operand) + ", " for operand in imm_prefix)
+    text_suffix = "".join(", " + insn.render_operand(operand) for operand in imm_suffix)
+    # NB: Only STOP is padded, and it has no immediate
+    assert not padded
+    return Opcode(
+        name=name,
+        operands=operands,
+        size=size + IMM_SIZES[imm],
+        cycles=cycles,
+        cycles_taken=cycles_taken,
+        flow=flow,
+        imm_offset=size,
+        imm_decoder=IMM_DECODERS[imm],
+        imm_prefix=imm_prefix,
+        imm_suffix=imm_suffix,
+        text=text,
+        text_suffix=text_suffix,
+    )
+
+
+R8_ORDER = (
+    insn.R8.B,
+    insn.R8.C,
+    insn.R8.D,
+    insn.R8.E,
+    insn.R8.H,
+    insn.R8.L,
+    insn.R8.HL,
+    insn.R8.A,
+)
+
+R16_ORDER = (
+    insn.R16.BC,
+    insn.R16.DE,
+    insn.R16.HL,
+    insn.R16.SP,
+)
+
+R16_STACK_ORDER = (
+    insn.R16.BC,
+    insn.R16.DE,
+    insn.R16.HL,
+    insn.R16.AF,
+)
+
+ALU_ORDER = (
+    insn.InsnName.ADD,
+    insn.InsnName.ADC,
+    insn.InsnName.SUB,
+    insn.InsnName.SBC,
+    insn.InsnName.AND,
+    insn.InsnName.XOR,
+    insn.InsnName.OR,
+    insn.InsnName.CP,
+)
+
+COND_ORDER = (
+    insn.Cond.NZ,
+    insn.Cond.Z,
+    insn.Cond.NC,
+    insn.Cond.C,
+)
+
+CB_R8_ORDER = (
+    insn.InsnName.RLC,
+    insn.InsnName.RRC,
+    insn.InsnName.RL,
+    insn.InsnName.RR,
+    insn.InsnName.SLA,
+    insn.InsnName.SRA,
+    insn.InsnName.SWAP,
+    insn.InsnName.SRL,
+)
+
+CB_U3_R8_ORDER = (
+    insn.InsnName.BIT,
+    insn.InsnName.RES,
+    insn.InsnName.SET,
+)
+
+
+def r8_cycles(r: insn.R8, cycles: int, hl_cycles: int) -> int:
+    """Cycles taken by an instruction, which takes longer when r is [hl]"""
+    return hl_cycles if r == insn.R8.HL else cycles
+
+
+OPCODE_SPECS: dict[int, Opcode] = {
+    # NOP
+    0x00: opcode(insn.InsnName.NOP, cycles=1),
+    # LD BC, nn
+    0x01: opcode(insn.InsnName.LD, insn.R16.BC, Imm.U16, cycles=3),
+    # LD [BC], A
+    0x02: opcode(insn.InsnName.LD, insn.INDIRECT_BC, insn.R8.A, cycles=2),
+    # RLCA
+    0x07: opcode(insn.InsnName.RLCA, cycles=1),
+    # LD [nn], SP
+    0x08: opcode(insn.InsnName.LD, Imm.DIRECT_U16, insn.R16.SP, cycles=5),
+    # LD A, [BC]
+    0x0A: opcode(insn.InsnName.LD, insn.R8.A, insn.INDIRECT_BC, cycles=2),
+    # RRCA
+    0x0F: opcode(insn.InsnName.RRCA, cycles=1),
+    # STOP (always followed by a zero byte)
+    OPCODE_STOP: opcode(insn.InsnName.STOP, cycles=1, padded=True),
+    # LD DE, nn
+    0x11: opcode(insn.InsnName.LD, insn.R16.DE, Imm.U16, cycles=3),
+    # LD [DE], A
+    0x12: opcode(insn.InsnName.LD, insn.INDIRECT_DE, insn.R8.A, cycles=2),
+    # RLA
+    0x17: opcode(insn.InsnName.RLA, cycles=1),
+    # JR e
+    0x18: opcode(insn.InsnName.JR, Imm.RELATIVE, cycles=3, flow=Flow.JUMP),
+    # LD A, [DE]
+    0x1A: opcode(insn.InsnName.LD, insn.R8.A, insn.INDIRECT_DE, cycles=2),
+    # RRA
+    0x1F: opcode(insn.InsnName.RRA, cycles=1),
+    # LD HL, nn
+    0x21: opcode(insn.InsnName.LD, insn.R16.HL, Imm.U16, cycles=3),
+    # LD [HL+], A
+    0x22: opcode(insn.InsnName.LD, insn.INDIRECT_HL_INCR, insn.R8.A, cycles=2),
+    # DAA
+    0x27: opcode(insn.InsnName.DAA, cycles=1),
+    # LD A, [HL+]
+    0x2A: opcode(insn.InsnName.LD, insn.R8.A, insn.INDIRECT_HL_INCR, cycles=2),
+    # CPL
+    0x2F: opcode(insn.InsnName.CPL, cycles=1),
+    # LD SP, nn
+    0x31: opcode(insn.InsnName.LD, insn.R16.SP, Imm.U16, cycles=3),
+    # LD [HL-], A
+    0x32: opcode(insn.InsnName.LD, insn.INDIRECT_HL_DECR, insn.R8.A, cycles=2),
+    # SCF
+    0x37: opcode(insn.InsnName.SCF, cycles=1),
+    # LD A, [HL-]
+    0x3A: opcode(insn.InsnName.LD, insn.R8.A, insn.INDIRECT_HL_DECR, cycles=2),
+    # CCF
+    0x3F: opcode(insn.InsnName.CCF, cycles=1),
+    # HALT
+    0x76: opcode(insn.InsnName.HALT, cycles=1),
+    # JP nn
+    0xC3: opcode(insn.InsnName.JP, Imm.U16, cycles=4, flow=Flow.JUMP),
+    # RET
+    0xC9: opcode(insn.InsnName.RET, cycles=4, flow=Flow.RETURN),
+    # CALL nn
+    0xCD: opcode(insn.InsnName.CALL, Imm.U16, cycles=6, flow=Flow.CALL),
+    # RETI
+    0xD9: opcode(insn.InsnName.RETI, cycles=4, flow=Flow.RETURN),
+    # LDH [n], A
+    0xE0: opcode(insn.InsnName.LDH, Imm.DIRECT_HRAM, insn.R8.A, cycles=3),
+    # LDH [C], A
+    0xE2: opcode(insn.InsnName.LDH, insn.INDIRECT_HRAM_C, insn.R8.A, cycles=2),
+    # ADD SP, e
+    0xE8: opcode(insn.InsnName.ADD, insn.R16.SP, Imm.I8, cycles=4),
+    # JP HL
+    0xE9: opcode(insn.InsnName.JP, insn.R16.HL, cycles=1, flow=Flow.JUMP_INDIRECT),
+    # LD [nn], A
+    0xEA: opcode(insn.InsnName.LD, Imm.DIRECT_U16, insn.R8.A, cycles=4),
+    # LDH A, [n]
+    0xF0: opcode(insn.InsnName.LDH, insn.R8.A, Imm.DIRECT_HRAM, cycles=3),
+    # LDH A, [C]
+    0xF2: opcode(insn.InsnName.LDH, insn.R8.A, insn.INDIRECT_HRAM_C, cycles=2),
+    # DI
+    0xF3: opcode(insn.InsnName.DI, cycles=1),
+    # LD HL, SP+e
+    0xF8: opcode(insn.InsnName.LD, insn.R16.HL, Imm.SP_RELATIVE, cycles=3),
+    # LD SP, HL
+    0xF9: opcode(insn.InsnName.LD, insn.R16.SP, insn.R16.HL, cycles=2),
+    # LD A, [nn]
+    0xFA: opcode(insn.InsnName.LD, insn.R8.A, Imm.DIRECT_U16, cycles=4),
+    # EI
+    0xFB: opcode(insn.InsnName.EI, cycles=1),
+    # LD r, n
+    **{
+        0x06 + 8 * y: opcode(insn.InsnName.LD, r, Imm.U8, cycles=r8_cycles(r, 2, 3))
+        for y, r in enumerate(R8_ORDER)
+    },
+    # INC r
+    **{
+        0x04 + 8 * y: opcode(insn.InsnName.INC, r, cycles=r8_cycles(r, 1, 3))
+        for y, r in enumerate(R8_ORDER)
+    },
+    # DEC r
+    **{
+        0x05 + 8 * y: opcode(insn.InsnName.DEC, r, cycles=r8_cycles(r, 1, 3))
+        for y, r in enumerate(R8_ORDER)
+    },
+    # LD r, r (LD [HL], [HL] is HALT)
+    **{
+        0x40
+        + 8 * y
+        + x: opcode(
+            insn.InsnName.LD, r1, r2, cycles=r8_cycles(r1, r8_cycles(r2, 1, 2), 2)
+        )
+        for y, r1 in enumerate(R8_ORDER)
+        for x, r2 in enumerate(R8_ORDER)
+        if not (r1 == insn.R8.HL and r2 == r1)
+    },
+    # INC rr
+    **{
+        0x03 + 0x10 * y: opcode(insn.InsnName.INC, rr, cycles=2)
+        for y, rr in enumerate(R16_ORDER)
+    },
+    # DEC rr
+    **{
+        0x0B + 0x10 * y: opcode(insn.InsnName.DEC, rr, cycles=2)
+        for y, rr in enumerate(R16_ORDER)
+    },
+    # ADD HL, rr
+    **{
+        0x09 + 0x10 * y: opcode(insn.InsnName.ADD, insn.R16.HL, rr, cycles=2)
+        for y, rr in enumerate(R16_ORDER)
+    },
+    # POP rr
+    **{
+        0xC1 + 0x10 * y: opcode(insn.InsnName.POP, rr, cycles=3)
+        for y, rr in enumerate(R16_STACK_ORDER)
+    },
+    # PUSH rr
+    **{
+        0xC5 + 0x10 * y: opcode(insn.InsnName.PUSH, rr, cycles=4)
+        for y, rr in enumerate(R16_STACK_ORDER)
+    },
+    # JR cc, e
+    **{
+        0x20
+        + 8
+        * y: opcode(
+            insn.InsnName.JR,
+            cond,
+            Imm.RELATIVE,
+            cycles=2,
+            cycles_taken=3,
+            flow=Flow.BRANCH,
+        )
+        for y, cond in enumerate(COND_ORDER)
+    },
+    # RET cc
+    **{
+        0xC0
+        + 8
+        * y: opcode(
+            insn.InsnName.RET, cond, cycles=2, cycles_taken=5, flow=Flow.RETURN_COND
+        )
+        for y, cond in enumerate(COND_ORDER)
+    },
+    # JP cc, nn
+    **{
+        0xC2
+        + 8
+        * y: opcode(
+            insn.InsnName.JP,
+            cond,
+            Imm.U16,
+            cycles=3,
+            cycles_taken=4,
+            flow=Flow.BRANCH,
+        )
+        for y, cond in enumerate(COND_ORDER)
+    },
+    # CALL cc, nn
+    **{
+        0xC4
+        + 8
+        * y: opcode(
+            insn.InsnName.CALL,
+            cond,
+            Imm.U16,
+            cycles=3,
+            cycles_taken=6,
+            flow=Flow.CALL,
+        )
+        for y, cond in enumerate(COND_ORDER)
+    },
+    # RST n
+    **{
+        0xC7
+        + 8 * y: opcode(insn.InsnName.RST, insn.u8(8 * y), cycles=4, flow=Flow.CALL)
+        for y in range(8)
+    },
+    # ALU r
+    **{
+        0x80 + 8 * y + x: opcode(name, r, cycles=r8_cycles(r, 1, 2))
+        for y, name in enumerate(ALU_ORDER)
+        for x, r in enumerate(R8_ORDER)
+    },
+    # ALU n
+    **{
+        0xC6 + 8 * y: opcode(name, Imm.U8, cycles=2) for y, name in enumerate(ALU_ORDER)
+    },
+}
+
+CB_OPCODE_SPECS: dict[int, Opcode] = {
+    # Rotates, shifts and SWAP r
+    **{
+        8 * y + x: opcode(name, r, cycles=r8_cycles(r, 2, 4), prefixed=True)
+        for y, name in enumerate(CB_R8_ORDER)
+        for x, r in enumerate(R8_ORDER)
+    },
+    # BIT u3, r
+    **{
+        0x40
+        + 8 * bit
+        + x: opcode(
+            insn.InsnName.BIT, insn.u3(bit), r, cycles=r8_cycles(r, 2, 3), prefixed=True
+        )
+        for bit in range(8)
+        for x, r in enumerate(R8_ORDER)
+    },
+    # RES/SET u3, r
+    **{
+        0x40 * y
+        + 0x80
+        + 8 * bit
+        + x: opcode(name, insn.u3(bit), r, cycles=r8_cycles(r, 2, 4), prefixed=True)
+        for y, name in enumerate(CB_U3_R8_ORDER[1:])
+        for bit in range(8)
+        for x, r in enumerate(R8_ORDER)
+    },
+}
+
+OPCODES: tuple[Optional[Opcode], ...] = tuple(
+    OPCODE_SPECS.get(byte) for byte in range(0x100)
+)
+CB_OPCODES: tuple[Optional[Opcode], ...] = tuple(
+    CB_OPCODE_SPECS.get(byte) for byte in range(0x100)
+)
+
+
+def decode_insn(rom: RomData, index: int) -> Optional[DecodedInsn]:
+    byte = rom[index]
+    if byte == PREFIX_CB:
+        if index + 1 >= len(rom):
+            return None
+        op = CB_OPCODES[rom[index + 1]]
+    else:
+        op = OPCODES[byte]
+    if op is None:
+        return None
+    if op.decoded is not None:
+        # NB: RGBDS always assembles STOP followed by a zero byte
+        if op.padded and (index + 1 >= len(rom) or rom[index + 1] != 0):
+            return None
+        return op.decoded
+    if index + op.size > len(rom):
+        return None
+    assert op.imm_decoder is not None
+    imm = op.imm_decoder(rom, index + op.imm_offset)
+    if imm is None:
+        return None
+    operands = op.imm_prefix + (imm,) + op.imm_suffix
+    return DecodedInsn(
+        insn=insn.Insn(name=op.name, operands=operands), size=op.size, opcode=op
+    )
+
+
+def get_target(decoded: DecodedInsn) -> Optional[int]:
+    """Address that a jump, branch or call transfers control to"""
+    if decoded.opcode is None or decoded.opcode.flow not in FLOWS_WITH_TARGET:
+        return None
+    target = decoded.insn.operands[-1]
+    assert isinstance(target, (insn.U8, insn.U16))
+    return target.value
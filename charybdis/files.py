@@ -0,0 +1,14 @@
+import os
+import pathlib
+
+
+def write_text_atomic(path: pathlib.Path, text: str) -> None:
+    """Writes a file by replacing it, so an interrupted run can't leave it partial"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,92 @@
+import struct
+import zlib
+
+TILE_SIZE = 8  # pixels
+TILE_BYTES = 16  # 2 bits per pixel
+DEFAULT_IMAGE_WIDTH = 128  # pixels, i.e. 16 tiles
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_BIT_DEPTH = 2
+PNG_COLOR_TYPE_GRAYSCALE = 0
+
+
+def get_tiles_per_row(tiles: int, width: int) -> int:
+    """Tiles in each row of an image which is at most width pixels wide
+
+    Rows are always filled so that converting the image back doesn't produce
+    extra blank tiles.
+    """
+    tiles_per_row = max(min(width // TILE_SIZE, tiles), 1)
+    while tiles % tiles_per_row != 0:
+        tiles_per_row -= 1
+    return tiles_per_row
+
+
+def decode_2bpp(data: bytes) -> bytes:
+    """Converts 2bpp tiles to 2-bit grayscale pixel rows, one tile row at a time
+
+    Each pair of bit planes becomes two bytes holding its eight pixels, most
+    significant first. Colour 0 is white and colour 3 is black.
+    """
+    # NB: Rather than looping over pixels, each plane byte is placed in a
+    #     16-bit lane of one large integer and all lanes have their bits
+    #     spread out at once
+    rows = len(data) // 2
+    lo = bytearray(2 * rows)
+    hi = bytearray(2 * rows)
+    lo[1::2] = data[0 : 2 * rows : 2]
+    hi[1::2] = data[1 : 2 * rows : 2]
+    pixels = (spread_bits(hi, rows) << 1) | spread_bits(lo, rows)
+    # NB: Invert so that higher colour indices are darker, as on hardware
+    pixels ^= (1 << (16 * rows)) - 1
+    return pixels.to_bytes(2 * rows, "big")
+
+
+def spread_bits(lanes: bytearray, rows: int) -> int:
+    """Moves bit n of every 16-bit lane to bit 2n"""
+    x = int.from_bytes(lanes, "big")
+    x = (x | (x << 4)) & int.from_bytes(b"\x0f" * (2 * rows), "big")
+    x = (x | (x << 2)) & int.from_bytes(b"\x33" * (2 * rows), "big")
+    x = (x | (x << 1)) & int.from_bytes(b"\x55" * (2 * rows), "big")
+    return x
+
+
+def tiles_to_png(data: bytes, width: int = DEFAULT_IMAGE_WIDTH) -> bytes:
+    """Encodes whole 2bpp tiles as a grayscale PNG laid out left to right"""
+    assert len(data) > 0 and len(data) % TILE_BYTES == 0
+    tiles = len(data) // TILE_BYTES
+    tiles_per_row = get_tiles_per_row(tiles, width)
+    rows = memoryview(decode_2bpp(data)).cast("H")
+    # NB: Scanline y of the image is row y % 8 of each tile in the row of
+    #     tiles y // 8, which are every eighth 16-bit row
+    scanlines = []
+    for tile_row in range(tiles // tiles_per_row):
+        first = tile_row * tiles_per_row * TILE_SIZE
+        last = first + tiles_per_row * TILE_SIZE
+        for y in range(TILE_SIZE):
+            # NB: Filter type 0 (none)
+            scanlines.append(b"\x00")
+            scanlines.append(rows[first + y : last : TILE_SIZE].tobytes())
+    header = struct.pack(
+        ">IIBBBBB",
+        tiles_per_row * TILE_SIZE,
+        tiles // tiles_per_row * TILE_SIZE,
+        PNG_BIT_DEPTH,
+        PNG_COLOR_TYPE_GRAYSCALE,
+        0,
+        0,
+        0,
+    )
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            png_chunk(b"IHDR", header),
+            png_chunk(b"IDAT", zlib.compress(b"".join(scanlines))),
+            png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+def png_chunk(type: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(data, zlib.crc32(type))
+    return struct.pack(">I", len(data)) + type + data + struct.pack(">I", crc)
@@ -53,28 +53,35 @@ class InsnName(enum.Enum):
 
 
 # TODO: More we can do here (addressing modes, etc)
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class Label:
     """Reference to a location or value"""
 
     value: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class U3:
     """3-bit unsigned integer"""
 
     value: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
+class I8:
+    """8-bit signed integer"""
+
+    value: int
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class U8:
     """8-bit unsigned integer"""
 
     value: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class U16:
     """16-bit unsigned integer"""
 
@@ -104,30 +111,47 @@ class R16(enum.Enum):
     SP = "SP"
 
 
-@dataclasses.dataclass
+class Cond(enum.Enum):
+    """Branch condition on CPU flags"""
+
+    NZ = "NZ"
+    Z = "Z"
+    NC = "NC"
+    C = "C"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class DirectU16:
     """Direct addressing mode via 16-bit integer"""
 
     offset: U16
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
+class SPRelative:
+    """Stack pointer plus a signed 8-bit offset"""
+
+    offset: I8
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class IndirectHramC:
     """Indirect addressing of HRAM through register C"""
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class IndirectR16:
     """Indirect addressing mode via 16-bit register"""
 
     reg: R16
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class IndirectHLIncr:
     """Indirect addressing mode via HL with increment"""
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True, slots=True)
 class IndirectHLDecr:
     """Indirect addressing mode via HL with decrement"""
 
@@ -136,23 +160,59 @@ InsnOperand = Union[
     Label,
     R8,
     R16,
+    Cond,
     U3,
+    I8,
     U8,
     U16,
     DirectU16,
+    SPRelative,
     IndirectHramC,
     IndirectR16,
     IndirectHLIncr,
     IndirectHLDecr,
 ]
 
+# Shared instances of operands with a small number of possible values. Operands
+# are immutable so decoded instructions can reference these instead of
+# allocating their own copies.
+U3_POOL = tuple(U3(value) for value in range(0x8))
+U8_POOL = tuple(U8(value) for value in range(0x100))
+I8_POOL = tuple(I8(value - 0x100 if value >= 0x80 else value) for value in range(0x100))
+DIRECT_HRAM_POOL = tuple(DirectU16(U16(0xFF00 + value)) for value in range(0x100))
+INDIRECT_HRAM_C = IndirectHramC()
+INDIRECT_BC = IndirectR16(R16.BC)
+INDIRECT_DE = IndirectR16(R16.DE)
+INDIRECT_HL_INCR = IndirectHLIncr()
+INDIRECT_HL_DECR = IndirectHLDecr()
 
-@dataclasses.dataclass
+
+def u3(value: int) -> U3:
+    """Interned 3-bit unsigned integer"""
+    return U3_POOL[value]
+
+
+def u8(value: int) -> U8:
+    """Interned 8-bit unsigned integer"""
+    return U8_POOL[value]
+
+
+def i8(byte: int) -> I8:
+    """Interned 8-bit signed integer, given its two's complement byte"""
+    return I8_POOL[byte]
+
+
+def direct_hram(offset: int) -> DirectU16:
+    """Interned direct address into the $FF00-$FFFF region"""
+    return DIRECT_HRAM_POOL[offset]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class Insn:
     """A single SM83 instruction"""
 
     name: InsnName
-    operands: list[InsnOperand] = dataclasses.field(default_factory=list)
+    operands: tuple[InsnOperand, ...] = ()
 
     def render(self) -> str:
         """Render to an RGBDS-compatible string representation"""
@@ -163,19 +223,30 @@ class Insn:
         return f"{name}{operands}"
 
 
+U8_TEXT = tuple(f"${value:x}" for value in range(0x100))
+DIRECT_HRAM_TEXT = tuple(f"[${0xFF00 + value:x}]" for value in range(0x100))
+
+
 def render_operand(operand: InsnOperand) -> str:
     s = ""
     match operand:
         case Label(value):
             s = value
-        case R8() | R16():
+        case R8() | R16() | Cond():
             s = operand.value.lower()
-        case U3(value):
+        case U3(value) | I8(value):
             s = str(value)
-        case U8(value) | U16(value):
+        case U8(value):
+            s = U8_TEXT[value]
+        case U16(value):
             s = f"${value:x}"
         case DirectU16(offset):
-            s = f"[${offset.value:x}]"
+            if offset.value >= 0xFF00:
+                s = DIRECT_HRAM_TEXT[offset.value - 0xFF00]
+            else:
+                s = f"[${offset.value:x}]"
+        case SPRelative(offset):
+            s = f"sp{offset.value:+d}"
         case IndirectHramC():
             s = "[c]"
         case IndirectR16(reg):
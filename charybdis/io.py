@@ -1,16 +1,29 @@
+import bisect
+import concurrent.futures
+import contextlib
 import dataclasses
+import functools
 import hashlib
 import logging
+import mmap
 import os.path
 import pathlib
+import queue
+import re
 import shutil
+import struct
+import threading
+import time
 import typing
-from typing import Any, TextIO, TypedDict
+from typing import Any, Optional, TypedDict
 
-import chevron
-
-from charybdis import disasm
-from charybdis.ann import ann_parser, types as ann_types
+from charybdis import disasm, gfx, insn, labels, manifest, prepass, timing, trace
+from charybdis.ann import (
+    ann_parser,
+    cache as ann_cache,
+    sym_parser,
+    types as ann_types,
+)
 
 OFFSET_CGB_FLAG = 0x0143
 OFFSET_ROM_SIZE = 0x0148
@@ -18,12 +31,28 @@ OFFSET_ROM_SIZE = 0x0148
 ROM_BANK_SIZE = 0x4000  # 16 KiB
 ROM0_BANK_START = 0
 ROMX_BANK_START = 0x4000
+ROMX_BANK_END = 0x8000
 
 EXTENSION_GB = ".gb"
 EXTENSION_GBC = ".gbc"
+EXTENSION_BIN = ".bin"
+EXTENSION_2BPP = ".2bpp"
+EXTENSION_PNG = ".png"
+EXTENSION_ANN = ".ann"
+EXTENSION_SYM = ".sym"
 
-FILE_CHUNK_SIZE = 1024  # 1 KB
+HASH_BLOCK_SIZE = 0x100000  # 1 MiB
+DEFAULT_BUFFER_SIZE = 0x10000  # 64 KiB
+DEFAULT_DB_WIDTH = 8
+DEFAULT_WRITE_QUEUE_DEPTH = 4
+DB_TEXT = tuple(f"${byte:02x}" for byte in range(0x100))
 MAKEFILE_TEMPLATE_PATH = pathlib.Path("templates/Makefile.mustache")
+RAM_INCLUDE_NAME = "ram.inc"
+# Files next to the ROM which annotate it, merged in this order
+ANN_FILE_PARSERS: dict[str, ann_cache.FileParser] = {
+    EXTENSION_ANN: ann_parser.parse_ann_file,
+    EXTENSION_SYM: sym_parser.parse_sym_file,
+}
 
 logger = logging.getLogger(__name__)
 
@@ -33,58 +62,201 @@ class DisassemblerOptions:
     output_directory_path: pathlib.Path
     rom_file_path: pathlib.Path
     overwrite: bool
+    jobs: int = 1
+    buffer_size: int = DEFAULT_BUFFER_SIZE
+    incremental: bool = False
+    trace: bool = False
+    db_width: int = DEFAULT_DB_WIDTH
+    # NB: Data runs of at least this many bytes are extracted, 0 disables
+    incbin_threshold: int = 0
+    ann_cache: bool = True
+    # NB: Banks rendered ahead of the writer thread, 0 writes them inline
+    write_queue_depth: int = DEFAULT_WRITE_QUEUE_DEPTH
+    auto_labels: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class DataRegion:
+    """Bytes of a bank covered by a typed data annotation"""
+
+    start: int
+    end: int
+    ann: ann_types.Ann
+
+
+class MakefileBankImages(TypedDict):
+    bank: str
+    # Space separated converted images which the bank INCBINs
+    images: str
 
 
 class MakefileData(TypedDict):
+    bank_images: list[MakefileBankImages]
     rom_md5: str
     rom_ext: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(kw_only=True)
 class DisassemblerState(DisassemblerOptions):
     anns: ann_types.AnnMapping
     rom_banks: int
-    rom_data: bytes
+    rom_data: disasm.RomData
     rom_md5: str
     is_gbc: bool
+    code_map: Optional[trace.CodeMap] = None
+    byte_classes: Optional[prepass.ByteClasses] = None
+    label_index: Optional[labels.LabelIndex] = None
+    # NB: Data regions of each bank keyed on offset, computed on first use
+    data_regions: dict[int, dict[int, DataRegion]] = dataclasses.field(
+        default_factory=dict
+    )
+    timings: timing.Timings = dataclasses.field(default_factory=timing.Timings)
 
 
-def disassemble(options: DisassemblerOptions) -> None:
-    state = initialize_state(options)
-    create_output_directory(state)
-    write_assembly(state)
+def disassemble(
+    options: DisassemblerOptions,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> timing.Timings:
+    state = initialize_state(options, executor)
+    if state.incremental:
+        write_assembly_incremental(state, executor)
+    else:
+        create_output_directory(state)
+        write_assembly(state, executor=executor)
+    write_ram_include(state)
     write_makefile(state)
+    return state.timings
+
+
+@dataclasses.dataclass
+class BatchResult:
+    """Outcome of disassembling one ROM of a batch"""
+
+    rom_file_path: pathlib.Path
+    seconds: float
+    error: Optional[str] = None
+    timings: Optional[timing.Timings] = None
+
+
+def disassemble_batch(
+    options: DisassemblerOptions, rom_file_paths: list[pathlib.Path]
+) -> list[BatchResult]:
+    """Disassembles ROMs into subdirectories of the output directory
+
+    Decode tables, the Makefile template and the worker pool, which also
+    parses annotations, are shared by every ROM. A ROM which fails doesn't
+    stop the rest of the batch.
+    """
+    with contextlib.ExitStack() as stack:
+        executor = None
+        if options.jobs > 1:
+            executor = stack.enter_context(
+                concurrent.futures.ProcessPoolExecutor(max_workers=options.jobs)
+            )
+        results = []
+        output_directory_paths: set[pathlib.Path] = set()
+        for rom_file_path in rom_file_paths:
+            start = time.perf_counter()
+            output_directory_path = options.output_directory_path / rom_file_path.stem
+            error = None
+            timings = None
+            try:
+                if output_directory_path in output_directory_paths:
+                    raise Exception(f"output directory {output_directory_path} reused")
+                output_directory_paths.add(output_directory_path)
+                rom_options = dataclasses.replace(
+                    options,
+                    rom_file_path=rom_file_path,
+                    output_directory_path=output_directory_path,
+                )
+                timings = disassemble(rom_options, executor)
+            except Exception as e:
+                logging.warning("failed to disassemble %s: %s", rom_file_path, e)
+                error = str(e) or type(e).__name__
+            results.append(
+                BatchResult(rom_file_path, time.perf_counter() - start, error, timings)
+            )
+    return results
 
 
-def initialize_state(options: DisassemblerOptions) -> DisassemblerState:
-    rom_data = bytearray()
-    rom_md5 = hashlib.md5()
-    with open(options.rom_file_path, "rb") as f:
-        done = False
-        while not done:
-            chunk = f.read(FILE_CHUNK_SIZE)
-            rom_data.extend(chunk)
-            rom_md5.update(chunk)
-            done = len(chunk) < FILE_CHUNK_SIZE
+def initialize_state(
+    options: DisassemblerOptions,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> DisassemblerState:
+    timings = timing.Timings()
+    with timings.stage("load_rom"):
+        rom_data = map_rom(options.rom_file_path)
+        rom_md5 = hashlib.md5()
+        for start in range(0, len(rom_data), HASH_BLOCK_SIZE):
+            rom_md5.update(rom_data[start : start + HASH_BLOCK_SIZE])
+    timings.count("rom_bytes", len(rom_data))
     # TODO: Inspect Nintendo header for basic integrity check
     rom_banks = 2 << rom_data[OFFSET_ROM_SIZE]
     assert len(rom_data) == rom_banks * ROM_BANK_SIZE
-    anns = ann_types.AnnMapping()
-    ann_file_path = options.rom_file_path.with_suffix(".ann")
-    if ann_file_path.exists() and ann_file_path.is_file():
-        logging.info("annotation file exists, parsing")
-        with open(ann_file_path, "r") as f:
-            anns = ann_parser.parse_ann_file(f)
+    with timings.stage("parse_anns"):
+        anns = load_anns(options, executor)
+    with timings.stage("index_anns"):
+        # NB: Build the lookup index once, before any worker processes start
+        anns.index()
+    with timings.stage("prepass"):
+        byte_classes = prepass.classify(rom_data)
+    code_map = None
+    if options.trace:
+        with timings.stage("trace"):
+            code_map = trace.trace(rom_data, rom_banks, anns, byte_classes)
     return DisassemblerState(
         **dataclasses.asdict(options),
         anns=anns,
+        byte_classes=byte_classes,
+        code_map=code_map,
         is_gbc=(rom_data[OFFSET_CGB_FLAG] & 0x80) > 0,
         rom_banks=rom_banks,
-        rom_data=bytes(rom_data),
+        rom_data=rom_data,
         rom_md5=rom_md5.hexdigest(),
+        timings=timings,
     )
 
 
+def load_anns(
+    options: DisassemblerOptions,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> ann_types.AnnMapping:
+    """Loads the annotation and symbol files next to the ROM, if present"""
+    anns = ann_types.AnnMapping()
+    for suffix, parse_file in ANN_FILE_PARSERS.items():
+        file_path = options.rom_file_path.with_suffix(suffix)
+        if not file_path.is_file():
+            continue
+        logging.info("%s file exists, parsing", suffix)
+        try:
+            if options.ann_cache:
+                file_anns = ann_cache.load_ann_file(
+                    file_path, options.jobs, executor, parse_file
+                )
+            else:
+                with open(file_path, "r") as f:
+                    file_anns = parse_file(f, options.jobs, executor)
+            if len(anns.anns_at_address) == 0:
+                anns = file_anns
+                continue
+            for addr_anns in file_anns.anns_at_address.values():
+                for ann in addr_anns:
+                    # NB: A symbol file may repeat labels from the annotation file
+                    if not anns.has(ann):
+                        anns.add(ann)
+        except Exception as e:
+            raise Exception(f"{file_path.name}: {e}") from e
+    return anns
+
+
+def map_rom(rom_file_path: pathlib.Path) -> memoryview:
+    """Maps a ROM file into memory as a read-only buffer"""
+    with open(rom_file_path, "rb") as f:
+        # NB: The mapping remains valid after the file is closed
+        rom_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(rom_map)
+
+
 def create_output_directory(state: DisassemblerState) -> bool:
     if os.path.exists(state.output_directory_path):
         if not state.overwrite:
@@ -95,10 +267,215 @@ def create_output_directory(state: DisassemblerState) -> bool:
     return True
 
 
-def write_assembly(state: DisassemblerState) -> None:
+def write_assembly(
+    state: DisassemblerState,
+    banks: Optional[list[int]] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> None:
+    if banks is None:
+        banks = list(range(state.rom_banks))
+    # NB: Labels cover every bank, so collect them once rather than per worker
+    with state.timings.stage("collect_labels"):
+        get_label_index(state)
+    with state.timings.stage("write_assembly"):
+        if state.jobs > 1 and len(banks) > 1:
+            write_assembly_parallel(state, banks, executor)
+        else:
+            write_banks(state, banks)
+
+
+def write_banks(state: DisassemblerState, banks: list[int]) -> None:
+    if state.write_queue_depth > 0:
+        write_banks_pipelined(state, banks)
+        return
+    for bank in banks:
+        write_bank_file(state, bank)
+
+
+def write_banks_pipelined(state: DisassemblerState, banks: list[int]) -> None:
+    """Renders banks on this thread while a writer thread saves them
+
+    Rendering blocks once write_queue_depth banks are waiting to be written,
+    bounding memory use when the output volume is slow.
+    """
+    pending: queue.Queue[Optional[tuple[int, RenderedBank]]] = queue.Queue(
+        maxsize=state.write_queue_depth
+    )
+    errors: list[BaseException] = []
+
+    def write_pending() -> None:
+        while (item := pending.get()) is not None:
+            # NB: Keep draining after an error so the renderer never blocks
+            if len(errors) > 0:
+                continue
+            try:
+                save_rendered_bank(state, *item)
+            except BaseException as e:
+                errors.append(e)
+
+    writer = threading.Thread(target=write_pending, name="charybdis-writer")
+    writer.start()
+    try:
+        for bank in banks:
+            if len(errors) > 0:
+                break
+            pending.put((bank, render_bank(state, bank)))
+    finally:
+        pending.put(None)
+        writer.join()
+    if len(errors) > 0:
+        raise errors[0]
+
+
+def get_bank_path(state: DisassemblerState, bank: int) -> pathlib.Path:
+    return state.output_directory_path / f"bank_{bank:03x}.asm"
+
+
+def write_bank_file(state: DisassemblerState, bank: int) -> None:
+    save_rendered_bank(state, bank, render_bank(state, bank))
+
+
+def save_rendered_bank(
+    state: DisassemblerState, bank: int, rendered: "RenderedBank"
+) -> None:
+    with state.timings.stage("write_bank"):
+        written = 0
+        for name, data in rendered.binaries.items():
+            written += (state.output_directory_path / name).write_bytes(data)
+        with open(get_bank_path(state, bank), "w", buffering=state.buffer_size) as f:
+            written += f.write(rendered.text)
+    state.timings.count("bytes_written", written)
+
+
+def write_assembly_incremental(
+    state: DisassemblerState, executor: Optional[concurrent.futures.Executor] = None
+) -> None:
+    """Only rewrites banks whose inputs changed since the previous run
+
+    Inputs of each bank are recorded in a manifest in the output directory.
+    Untouched bank files keep their modification times so that make doesn't
+    reassemble them.
+    """
+    state.output_directory_path.mkdir(parents=True, exist_ok=True)
+    settings = get_render_settings(state)
+    previous = manifest.read_manifest(state.output_directory_path, settings)
+    current = get_bank_inputs(state)
+    banks = [
+        bank
+        for bank, inputs in enumerate(current)
+        if previous.get(bank) != inputs or not get_bank_path(state, bank).exists()
+    ]
+    logging.info("rewriting %d of %d banks", len(banks), state.rom_banks)
+    for bank in previous.keys() - range(state.rom_banks):
+        bank_path = get_bank_path(state, bank)
+        for path in [bank_path, bank_path.with_suffix(".o")]:
+            path.unlink(missing_ok=True)
+        remove_binaries(state, bank)
+    for bank in banks:
+        remove_binaries(state, bank)
+    write_assembly(state, banks, executor)
+    manifest.write_manifest(state.output_directory_path, settings, current)
+
+
+def remove_binaries(state: DisassemblerState, bank: int) -> None:
+    """Removes binary files included by a previous version of a bank"""
+    for path in state.output_directory_path.glob(f"bank_{bank:03x}_*"):
+        path.unlink()
+
+
+def get_render_settings(state: DisassemblerOptions) -> dict[str, Any]:
+    """Options which affect the contents of bank files"""
+    return {
+        "db_width": state.db_width,
+        "incbin_threshold": state.incbin_threshold,
+        "trace": state.trace,
+        "auto_labels": state.auto_labels,
+    }
+
+
+def get_bank_inputs(state: DisassemblerState) -> list[manifest.BankInputs]:
+    """Hashes the ROM contents and relevant annotations of every bank
+
+    Annotations in ROM0 and outside of ROM can be referenced from any bank so
+    they are considered inputs of every bank. The same goes for labels
+    generated for branch targets in ROM0, which depend on how ROM0 decodes as
+    well as on what refers to them.
+    """
+    shared_anns: list[ann_types.Ann] = []
+    bank_anns: list[list[ann_types.Ann]] = [[] for _ in range(state.rom_banks)]
+    for addr, anns in state.anns.anns_at_address.items():
+        # NB: ROM0 can also reference ROMX if there's only one switchable bank
+        if addr.bank == 0 or addr.addr >= ROMX_BANK_END or state.rom_banks == 2:
+            shared_anns.extend(anns)
+        elif addr.bank < state.rom_banks:
+            bank_anns[addr.bank].extend(anns)
+    shared_hash = manifest.hash_anns(shared_anns)
+    bank_labels = []
+    if state.auto_labels:
+        label_index = get_label_index(state)
+        bank_labels = [
+            manifest.hash_labels(label_index, bank) for bank in range(state.rom_banks)
+        ]
+    shared_labels = hashlib.sha1()
+    for bank_hash in bank_labels[: 1 if state.rom_banks > 2 else state.rom_banks]:
+        shared_labels.update(bank_hash.encode())
+    inputs = []
     for bank in range(state.rom_banks):
-        with open(state.output_directory_path / f"bank_{bank:03x}.asm", "w") as f:
-            write_bank(state, f, bank)
+        start = bank * ROM_BANK_SIZE
+        rom_hash = hashlib.sha1(state.rom_data[start : start + ROM_BANK_SIZE])
+        # NB: Code found by tracing other banks changes how this bank renders
+        if state.code_map is not None:
+            rom_hash.update(state.code_map.insn_starts[bank])
+        if state.auto_labels:
+            rom_hash.update(shared_labels.digest())
+            rom_hash.update(bank_labels[bank].encode())
+        anns_hash = hashlib.sha1(shared_hash.encode())
+        anns_hash.update(manifest.hash_anns(bank_anns[bank]).encode())
+        inputs.append(
+            manifest.BankInputs(
+                rom_hash=rom_hash.hexdigest(), anns_hash=anns_hash.hexdigest()
+            )
+        )
+    return inputs
+
+
+def write_assembly_parallel(
+    state: DisassemblerState,
+    banks: list[int],
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> None:
+    """Writes banks from a pool of worker processes
+
+    Workers map the ROM file themselves so the ROM is never pickled. A pool
+    may be passed in to share it between ROMs.
+    """
+    if executor is None:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(state.jobs, len(banks))
+        ) as executor:
+            write_assembly_parallel(state, banks, executor)
+        return
+    # NB: Drop the ROM and anything the size of it so only the (small)
+    #     remaining state is sent to workers
+    shared_state = dataclasses.replace(
+        state, rom_data=bytes(), byte_classes=None, timings=timing.Timings()
+    )
+    # NB: Interleave banks so that each worker gets a similar share of the
+    #     work while the state is only pickled once per task
+    tasks = min(state.jobs, len(banks))
+    # NB: Consume results so that worker exceptions are raised here
+    for worker_timings in executor.map(
+        write_worker_banks,
+        [shared_state] * tasks,
+        [banks[i::tasks] for i in range(tasks)],
+    ):
+        state.timings.merge(worker_timings)
+
+
+def write_worker_banks(state: DisassemblerState, banks: list[int]) -> timing.Timings:
+    state = dataclasses.replace(state, rom_data=map_rom(state.rom_file_path))
+    write_banks(state, banks)
+    return state.timings
 
 
 def get_bank_header(bank: int) -> str:
@@ -112,36 +489,609 @@ def get_bank_header(bank: int) -> str:
     return f'SECTION "ROM Bank ${bank:03x}", {type}[${start:x}]{options}'
 
 
-def write_bank(state: DisassemblerState, f: TextIO, bank: int) -> None:
-    f.write(get_bank_header(bank))
-    f.write("\n\n")
-    offset = 0
-    while offset < ROM_BANK_SIZE:
-        index = ROM_BANK_SIZE * bank + offset
-        result = disasm.decode_insn(state.rom_data, index)
-        if result is not None:
-            size = result.size
-            line = result.insn.render()
-        else:
-            size = 1
-            line = f"DB ${state.rom_data[index]:02x}"
-        f.write(line)
-        f.write("\n")
-        # NB: Shouldn't write something that spans multiple banks
-        assert (offset % ROM_BANK_SIZE) < ((offset + size) % ROM_BANK_SIZE) or size == 1
-        offset += size
+@dataclasses.dataclass
+class RenderedBank:
+    """Assembly for a single bank and the binary files it includes"""
+
+    lines: list[str]
+    # Keyed on path relative to the output directory
+    binaries: dict[str, bytes] = dataclasses.field(default_factory=dict)
+    insns: int = 0
+    db_bytes: int = 0
+    incbin_bytes: int = 0
+    typed_bytes: int = 0
+    images: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_bank(state: DisassemblerState, bank: int) -> RenderedBank:
+    """Renders the assembly for a bank in memory"""
+    rendered = RenderedBank(lines=[get_bank_header(bank), ""])
+    if len(get_label_index(state).ram_labels()) > 0:
+        rendered.lines[:0] = [f'INCLUDE "{RAM_INCLUDE_NAME}"', ""]
+    with state.timings.stage("render_bank"):
+        offset = 0
+        for region in get_data_regions(state, bank).values():
+            if region.start > offset:
+                render_code(state, bank, offset, region.start, rendered)
+            render_typed_data(state, bank, region, rendered)
+            offset = region.end
+        if offset < ROM_BANK_SIZE:
+            render_code(state, bank, offset, ROM_BANK_SIZE, rendered)
+    state.timings.count("banks")
+    state.timings.count("insns", rendered.insns)
+    state.timings.count("db_bytes", rendered.db_bytes)
+    state.timings.count("incbin_bytes", rendered.incbin_bytes)
+    state.timings.count("typed_bytes", rendered.typed_bytes)
+    state.timings.count("images", rendered.images)
+    return rendered
+
+
+def render_code(
+    state: DisassemblerState, bank: int, start: int, end: int, rendered: RenderedBank
+) -> None:
+    """Renders bytes which aren't covered by typed data annotations
+
+    Runs are split at labels so that every label is defined, which means an
+    instruction with a label inside it is rendered as data.
+    """
+    label_index = get_label_index(state)
+    for offset in label_index.offsets_in(bank, start, end):
+        if offset > start:
+            render_code_run(state, bank, start, offset, rendered)
+        render_labels(label_index, bank, offset, rendered)
+        start = offset
+    if end > start:
+        render_code_run(state, bank, start, end, rendered)
+
+
+def render_code_run(
+    state: DisassemblerState, bank: int, start: int, end: int, rendered: RenderedBank
+) -> None:
+    # NB: A linear code map records the same instructions as decoding linearly,
+    #     which is faster than looking each of them up
+    if state.code_map is not None and not state.code_map.linear:
+        render_traced_bank(state, state.code_map, bank, start, end, rendered)
+    else:
+        render_linear_bank(state, bank, start, end, rendered)
+
+
+def get_label_index(state: DisassemblerState) -> labels.LabelIndex:
+    """Index of labels by address, built on first use
+
+    With automatic labels this is the first of two passes over the ROM.
+    """
+    if state.label_index is None:
+        label_index = labels.LabelIndex(state.anns.label_addresses, state.rom_banks)
+        if state.auto_labels:
+            label_index = labels.LabelIndex(
+                {**state.anns.label_addresses, **find_auto_labels(state, label_index)},
+                state.rom_banks,
+            )
+        state.label_index = label_index
+    return state.label_index
+
+
+def find_auto_labels(
+    state: DisassemblerState, label_index: labels.LabelIndex
+) -> dict[str, ann_types.BankAddr]:
+    """Names every jump, branch and call target which starts an instruction
+
+    Annotated addresses and typed data keep their own labels. Without tracing,
+    every bank is swept to find targets, and the instructions it finds are
+    kept so that rendering doesn't have to walk the ROM again. Targets inside
+    an instruction which is rendered are left unlabelled, so that labels never
+    change how a bank is decoded.
+    """
+    if state.code_map is None:
+        state.code_map = sweep(state, label_index)
+    auto_labels = {}
+    for bank in range(state.rom_banks):
+        base = ROM0_BANK_START if bank == 0 else ROMX_BANK_START
+        regions = get_data_regions(state, bank)
+        region_starts = list(regions)
+        # NB: Swept instructions never overlap, but traced ones can
+        rendered = None
+        if not state.code_map.linear:
+            rendered = find_rendered_insns(state, state.code_map, label_index, bank)
+        for offset, is_call in state.code_map.iter_targets(bank):
+            if len(label_index.at(bank, offset)) > 0:
+                continue
+            if rendered is not None and not rendered[offset]:
+                continue
+            i = bisect.bisect_right(region_starts, offset) - 1
+            if i >= 0 and offset < regions[region_starts[i]].end:
+                continue
+            kind = "Func" if is_call else "Label"
+            label = f"{kind}_{bank:02x}_{base + offset:04x}"
+            if label not in state.anns.label_addresses:
+                auto_labels[label] = ann_types.BankAddr(bank, base + offset)
+    return auto_labels
+
+
+def find_rendered_insns(
+    state: DisassemblerState,
+    code_map: trace.CodeMap,
+    label_index: labels.LabelIndex,
+    bank: int,
+) -> bytearray:
+    """Flags the traced instructions of a bank which rendering keeps
+
+    Walks each run the same way as render_traced_bank, but with the prepass
+    lengths rather than decoding, so an instruction which starts inside an
+    earlier one isn't flagged.
+    """
+    lengths = get_byte_classes(state).lengths
+    insn_starts = code_map.insn_starts[bank]
+    index = ROM_BANK_SIZE * bank
+    splits = {0, ROM_BANK_SIZE, *label_index.offsets_in(bank, 0, ROM_BANK_SIZE)}
+    for region in get_data_regions(state, bank).values():
+        splits.update((region.start, region.end))
+    bounds = sorted(splits)
+    rendered = bytearray(ROM_BANK_SIZE)
+    for start, end in zip(bounds, bounds[1:]):
+        offset = start
+        while offset < end:
+            if not (insn_starts[offset >> 3] >> (offset & 7)) & 1:
+                offset = min(code_map.next_insn_start(bank, offset), end)
+                continue
+            size = lengths[index + offset]
+            if offset + size > end:
+                break
+            rendered[offset] = 1
+            offset += size
+    return rendered
+
+
+def sweep(state: DisassemblerState, label_index: labels.LabelIndex) -> trace.CodeMap:
+    """Records the instructions that linear rendering decodes and their targets
+
+    Banks are split into the same runs as render_bank, so the instructions
+    recorded are exactly those that would be rendered. Nothing is decoded, as
+    instructions and their targets are found in bulk from the ROM bytes, so
+    this is much cheaper than rendering.
+    """
+    code_map = trace.CodeMap(state.rom_banks, linear=True)
+    for bank in range(state.rom_banks):
+        insn_starts = bytearray(ROM_BANK_SIZE)
+        offset = 0
+        for region in [*get_data_regions(state, bank).values(), None]:
+            end = ROM_BANK_SIZE if region is None else region.start
+            bounds = [offset, *label_index.offsets_in(bank, offset + 1, end), end]
+            for start, stop in zip(bounds, bounds[1:]):
+                insn_starts[start:stop] = sweep_run(state, code_map, bank, start, stop)
+            if region is not None:
+                offset = region.end
+        code_map.set_insn_starts(bank, insn_starts)
+    return code_map
+
+
+def sweep_run(
+    state: DisassemblerState, code_map: trace.CodeMap, bank: int, start: int, end: int
+) -> bytes:
+    """Marks the targets of instructions in a run, returning where they start"""
+    index = ROM_BANK_SIZE * bank + start
+    data = bytes(state.rom_data[index : index + end - start])
+    lengths = get_byte_classes(state).lengths[index : index + end - start]
+    kinds = int.from_bytes(data.translate(prepass.OPCODE_TARGET_KINDS), "big")
+    while True:
+        insn_starts = prepass.find_insn_starts(lengths)
+        # NB: Starts are 0 or 1 per byte, so scaling them to 0 or 0xFF and
+        #     ANDing them as integers keeps the target kind of each instruction
+        starts = int.from_bytes(insn_starts, "big") * 0xFF
+        insn_kinds = (starts & kinds).to_bytes(len(data), "big")
+        failed = sweep_targets(state, code_map, bank, start, data, insn_kinds)
+        if failed is None:
+            return insn_starts
+        # NB: Rendering treats an instruction which fails to decode as data and
+        #     carries on from the next byte, which can change every instruction
+        #     after it
+        lengths = lengths[:failed] + b"\x00" + lengths[failed + 1 :]
+
+
+def sweep_targets(
+    state: DisassemblerState,
+    code_map: trace.CodeMap,
+    bank: int,
+    start: int,
+    data: bytes,
+    insn_kinds: bytes,
+) -> Optional[int]:
+    """Marks the targets of the instructions in a run, computed in bulk by kind
+
+    Returns the offset in the run of a relative jump which fails to decode,
+    before marking anything, if there is one.
+    """
+
+    def find(kind: int) -> list[int]:
+        return list(
+            map(re.Match.start, prepass.TARGET_KIND_PATTERNS[kind].finditer(insn_kinds))
+        )
+
+    # NB: The same addresses decode_insn would find, without decoding
+    rom_address = disasm.rom_address
+    index = ROM_BANK_SIZE * bank + start
+    relative = find(prepass.TARGET_RELATIVE)
+    relative_targets = [
+        rom_address(index + offset + 2) + (data[offset + 1] ^ 0x80) - 0x80
+        for offset in relative
+    ]
+    if len(relative_targets) > 0 and min(relative_targets) < 0:
+        return next(
+            offset for offset, target in zip(relative, relative_targets) if target < 0
+        )
+    jumps = find(prepass.TARGET_JUMP)
+    calls = find(prepass.TARGET_CALL)
+    vectors = find(prepass.TARGET_VECTOR)
+    mark_targets = functools.partial(code_map.mark_targets, bank, state.rom_banks)
+    mark_targets(relative_targets, False)
+    mark_targets([data[offset + 1] | data[offset + 2] << 8 for offset in jumps], False)
+    mark_targets([data[offset + 1] | data[offset + 2] << 8 for offset in calls], True)
+    mark_targets(
+        bytes(map(data.__getitem__, vectors)).translate(prepass.OPCODE_VECTORS),
+        True,
+    )
+    return None
+
+
+def render_labels(
+    label_index: labels.LabelIndex, bank: int, offset: int, rendered: RenderedBank
+) -> None:
+    # NB: Exported so that other banks can refer to them
+    rendered.lines.extend([f"{label}::" for label in label_index.at(bank, offset)])
+
+
+def render_insn(
+    label_index: labels.LabelIndex, bank: int, result: disasm.DecodedInsn
+) -> str:
+    """Renders an instruction, replacing an address operand with its label"""
+    op = result.opcode
+    if op is None or op.decoded is not None:
+        return result.render()
+    imm = result.insn.operands[len(op.imm_prefix)]
+    # NB: Other 16-bit immediates are as likely to be constants as addresses
+    if type(imm) is insn.U16 and op.flow in disasm.FLOWS_WITH_TARGET:
+        label = label_index.resolve(bank, imm.value)
+        if label is not None:
+            return op.text + label + op.text_suffix
+    elif type(imm) is insn.DirectU16:
+        label = label_index.resolve(bank, imm.offset.value)
+        if label is not None:
+            return f"{op.text}[{label}]{op.text_suffix}"
+    return result.render()
+
+
+def get_byte_classes(state: DisassemblerState) -> prepass.ByteClasses:
+    """Byte classes of the ROM, computed on first use"""
+    if state.byte_classes is None:
+        state.byte_classes = prepass.classify(state.rom_data)
+    return state.byte_classes
+
+
+def render_linear_bank(
+    state: DisassemblerState, bank: int, start: int, end: int, rendered: RenderedBank
+) -> None:
+    """Renders every decodable byte as code, coalescing the rest into data"""
+    # NB: Hoisted out of the loop, which runs for every byte of the ROM
+    decode_insn = disasm.decode_insn
+    rom_data = state.rom_data
+    lengths = get_byte_classes(state).lengths
+    label_index = get_label_index(state)
+    # NB: Without labels there is nothing to resolve
+    symbolic = len(label_index) > 0
+    append = rendered.lines.append
+    index = ROM_BANK_SIZE * bank
+    data_start = None
+    insns = 0
+    offset = start
+    while offset < end:
+        # NB: Lengths are 0 for invalid opcodes and instructions which span
+        #     multiple banks, neither of which are worth decoding. Neither are
+        #     instructions which run into typed data.
+        result = None
+        size = lengths[index + offset]
+        if size > 0 and offset + size <= end:
+            result = decode_insn(rom_data, index + offset)
+        if result is None:
+            if data_start is None:
+                data_start = offset
+            offset += 1
+            continue
+        if data_start is not None:
+            render_data(state, bank, data_start, offset, rendered)
+            data_start = None
+        append(render_insn(label_index, bank, result) if symbolic else result.render())
+        insns += 1
+        offset += result.size
+    if data_start is not None:
+        render_data(state, bank, data_start, offset, rendered)
+    rendered.insns += insns
+
+
+def render_traced_bank(
+    state: DisassemblerState,
+    code_map: trace.CodeMap,
+    bank: int,
+    start: int,
+    end: int,
+    rendered: RenderedBank,
+) -> None:
+    """Renders traced instructions, treating everything else as data"""
+    decode_insn = disasm.decode_insn
+    rom_data = state.rom_data
+    insn_starts = code_map.insn_starts[bank]
+    label_index = get_label_index(state)
+    symbolic = len(label_index) > 0
+    append = rendered.lines.append
+    index = ROM_BANK_SIZE * bank
+    insns = 0
+    offset = start
+    while offset < end:
+        # NB: Instructions usually follow each other, so only search for the
+        #     next one after data
+        if not (insn_starts[offset >> 3] >> (offset & 7)) & 1:
+            insn_start = min(code_map.next_insn_start(bank, offset), end)
+            render_data(state, bank, offset, insn_start, rendered)
+            offset = insn_start
+            continue
+        result = decode_insn(rom_data, index + offset)
+        # NB: Tracing only records instructions that decode within the bank
+        assert result is not None
+        # NB: Typed data takes precedence over code that runs into it
+        if offset + result.size > end:
+            render_data(state, bank, offset, end, rendered)
+            break
+        append(render_insn(label_index, bank, result) if symbolic else result.render())
+        insns += 1
+        offset += result.size
+    rendered.insns += insns
+
+
+def render_data(
+    state: DisassemblerState, bank: int, start: int, end: int, rendered: RenderedBank
+) -> None:
+    """Renders a run of bytes within a bank as DB lines or an INCBIN"""
+    if state.incbin_threshold > 0 and end - start >= state.incbin_threshold:
+        render_incbin(state, bank, start, end, rendered)
+        return
+    index = ROM_BANK_SIZE * bank
+    data = state.rom_data[index + start : index + end]
+    rendered.db_bytes += len(data)
+    width = state.db_width
+    if len(data) <= width:
+        rendered.lines.append("DB " + ", ".join([DB_TEXT[byte] for byte in data]))
+        return
+    rendered.lines.extend(
+        [
+            "DB " + ", ".join([DB_TEXT[byte] for byte in data[i : i + width]])
+            for i in range(0, len(data), width)
+        ]
+    )
+
+
+def get_data_regions(state: DisassemblerState, bank: int) -> dict[int, DataRegion]:
+    """Regions of a bank covered by typed data annotations, keyed on offset
+
+    Annotations which start inside an earlier region are ignored, as are
+    addresses which are also annotated as code.
+    """
+    regions = state.data_regions.get(bank)
+    if regions is not None:
+        return regions
+    regions = {}
+    index = state.anns.index()
+    base = ROM0_BANK_START if bank == 0 else ROMX_BANK_START
+    end = 0
+    for addr in index.addresses_in(bank, base, base + ROM_BANK_SIZE):
+        offset = addr - base
+        if offset < end:
+            continue
+        anns = index.at(bank, addr)
+        if any(isinstance(ann.type, ann_types.CodeType) for ann in anns):
+            continue
+        for ann in anns:
+            if ann.type is None:
+                continue
+            size = ann_types.get_type_size(ann.type)
+            if size == 0:
+                continue
+            end = min(offset + size, ROM_BANK_SIZE)
+            regions[offset] = DataRegion(start=offset, end=end, ann=ann)
+            break
+    state.data_regions[bank] = regions
+    return regions
+
+
+def render_typed_data(
+    state: DisassemblerState, bank: int, region: DataRegion, rendered: RenderedBank
+) -> None:
+    """Renders a region in bulk according to the type of its annotation"""
+    assert region.ann.type is not None
+    label_index = get_label_index(state)
+    render_labels(label_index, bank, region.start, rendered)
+    # NB: Labels inside the region end the typed value early, leaving the rest
+    #     of the region as data so that the labels can be defined
+    inner = label_index.offsets_in(bank, region.start + 1, region.end)
+    ends = [*inner, region.end]
+    render_value(state, bank, region.start, ends[0], region.ann.type, rendered)
+    for start, end in zip(inner, ends[1:]):
+        render_labels(label_index, bank, start, rendered)
+        render_data(state, bank, start, end, rendered)
+    rendered.typed_bytes += region.end - region.start
+
+
+def render_value(
+    state: DisassemblerState,
+    bank: int,
+    start: int,
+    end: int,
+    type: ann_types.AnnType,
+    rendered: RenderedBank,
+) -> None:
+    """Renders a value of a type at start, falling back to DB past end"""
+    size = ann_types.get_type_size(type)
+    if start + size > end and not isinstance(type, ann_types.ArrayType):
+        render_data(state, bank, start, end, rendered)
+        return
+    if isinstance(type, ann_types.ArrayType):
+        element_size = ann_types.get_type_size(type.type)
+        count = min(type.size, (end - start) // max(element_size, 1))
+        render_array(state, bank, start, count, type.type, rendered)
+        tail = start + count * element_size
+        if tail < min(start + size, end):
+            render_data(state, bank, tail, min(start + size, end), rendered)
+    elif isinstance(type, ann_types.ImageType):
+        render_image(state, bank, start, type, rendered)
+    elif isinstance(type, ann_types.PointerType) or type == ann_types.PrimitiveType.U16:
+        render_array(state, bank, start, 1, type, rendered)
+    else:
+        render_data(state, bank, start, start + size, rendered)
+
+
+def render_array(
+    state: DisassemblerState,
+    bank: int,
+    start: int,
+    count: int,
+    type: ann_types.AnnType,
+    rendered: RenderedBank,
+) -> None:
+    """Renders count consecutive values of a type starting at start"""
+    if type == ann_types.PrimitiveType.U8 or isinstance(type, ann_types.CodeType):
+        render_data(
+            state, bank, start, start + count * ann_types.get_type_size(type), rendered
+        )
+        return
+    if type == ann_types.PrimitiveType.U16 or isinstance(type, ann_types.PointerType):
+        words = struct.unpack_from(
+            f"<{count}H", state.rom_data, ROM_BANK_SIZE * bank + start
+        )
+        if isinstance(type, ann_types.PointerType):
+            rendered.lines.extend(
+                [f"DW {get_pointer_text(state, bank, word)}" for word in words]
+            )
+            return
+        width = max(state.db_width // 2, 1)
+        rendered.lines.extend(
+            [
+                "DW " + ", ".join([f"${word:04x}" for word in words[i : i + width]])
+                for i in range(0, len(words), width)
+            ]
+        )
+        return
+    size = ann_types.get_type_size(type)
+    for i in range(count):
+        offset = start + i * size
+        render_value(state, bank, offset, offset + size, type, rendered)
+
+
+def render_image(
+    state: DisassemblerState,
+    bank: int,
+    start: int,
+    type: ann_types.ImageType,
+    rendered: RenderedBank,
+) -> None:
+    """Extracts whole tiles to a PNG which make converts back to 2bpp"""
+    if type.size == 0 or type.size % gfx.TILE_BYTES != 0:
+        render_incbin(state, bank, start, start + type.size, rendered, EXTENSION_2BPP)
+        return
+    index = ROM_BANK_SIZE * bank
+    data = bytes(state.rom_data[index + start : index + start + type.size])
+    width = type.width or gfx.DEFAULT_IMAGE_WIDTH
+    name = get_binary_name(bank, start, EXTENSION_PNG)
+    rendered.binaries[name] = gfx.tiles_to_png(data, width)
+    rendered.lines.append(f'INCBIN "{get_binary_name(bank, start, EXTENSION_2BPP)}"')
+    rendered.incbin_bytes += type.size
+    rendered.images += 1
+
+
+def get_pointer_text(state: DisassemblerState, bank: int, addr: int) -> str:
+    """Label a pointer refers to, or the address itself"""
+    label = get_label_index(state).resolve(bank, addr)
+    return label if label is not None else f"${addr:04x}"
+
+
+def render_incbin(
+    state: DisassemblerState,
+    bank: int,
+    start: int,
+    end: int,
+    rendered: RenderedBank,
+    extension: str = EXTENSION_BIN,
+) -> None:
+    """Extracts a run of bytes within a bank to a file and INCBINs it"""
+    index = ROM_BANK_SIZE * bank
+    name = get_binary_name(bank, start, extension)
+    rendered.binaries[name] = bytes(state.rom_data[index + start : index + end])
+    rendered.lines.append(f'INCBIN "{name}"')
+    rendered.incbin_bytes += end - start
+
+
+def get_binary_name(bank: int, offset: int, extension: str = EXTENSION_BIN) -> str:
+    addr = offset if bank == 0 else ROMX_BANK_START + offset
+    return f"bank_{bank:03x}_{addr:04x}{extension}"
+
+
+@functools.cache
+def get_makefile_template() -> list[tuple[str, str]]:
+    """Tokenized Makefile template, shared by every ROM in a process"""
+    # NB: Imported here to keep it off the startup path
+    import chevron.tokenizer
+
+    return list(chevron.tokenizer.tokenize(MAKEFILE_TEMPLATE_PATH.read_text()))
+
+
+def write_ram_include(state: DisassemblerState) -> None:
+    """Defines RAM labels as constants for banks to include"""
+    ram_include_path = state.output_directory_path / RAM_INCLUDE_NAME
+    ram_labels = get_label_index(state).ram_labels()
+    if len(ram_labels) == 0:
+        ram_include_path.unlink(missing_ok=True)
+        return
+    text = "".join(f"DEF {label} EQU ${addr:04x}\n" for label, addr in ram_labels)
+    # NB: Leave an unchanged file alone so that make doesn't reassemble banks
+    if ram_include_path.exists() and ram_include_path.read_text() == text:
+        return
+    ram_include_path.write_text(text)
 
 
 def write_makefile(state: DisassemblerState) -> None:
-    makefile_path = state.output_directory_path / "Makefile"
-    with open(MAKEFILE_TEMPLATE_PATH, "r") as f:
-        # NB: TypedDict is not a subtype of dict[str, Any] so cast
-        #     https://github.com/python/mypy/issues/4976
-        makefile_data = {
-            "rom_ext": EXTENSION_GBC if state.is_gbc else EXTENSION_GB,
-            "rom_md5": state.rom_md5,
-        }
-        data = typing.cast(dict[str, Any], makefile_data)
-        makefile = chevron.render(f, data)
-    with open(makefile_path, "w") as f:
-        f.write(makefile)
+    with state.timings.stage("write_makefile"):
+        makefile = render_makefile(state)
+        makefile_path = state.output_directory_path / "Makefile"
+        # NB: Leave an unchanged Makefile alone for incremental runs
+        if makefile_path.exists() and makefile_path.read_text() == makefile:
+            return
+        with open(makefile_path, "w") as f:
+            f.write(makefile)
+
+
+def render_makefile(state: DisassemblerState) -> str:
+    import chevron
+
+    # NB: TypedDict is not a subtype of dict[str, Any] so cast
+    #     https://github.com/python/mypy/issues/4976
+    makefile_data: MakefileData = {
+        "bank_images": [
+            {"bank": f"bank_{bank:03x}", "images": " ".join(images)}
+            for bank, images in sorted(get_bank_images(state).items())
+        ],
+        "rom_ext": EXTENSION_GBC if state.is_gbc else EXTENSION_GB,
+        "rom_md5": state.rom_md5,
+    }
+    data = typing.cast(dict[str, Any], makefile_data)
+    return chevron.render(get_makefile_template(), data)
+
+
+def get_bank_images(state: DisassemblerState) -> dict[int, list[str]]:
+    """Converted images INCBINed by each bank, found from the extracted PNGs"""
+    bank_images: dict[int, list[str]] = {}
+    for path in sorted(state.output_directory_path.glob(f"bank_*_*{EXTENSION_PNG}")):
+        bank = int(path.name.split("_")[1], 16)
+        name = path.with_suffix(EXTENSION_2BPP).name
+        bank_images.setdefault(bank, []).append(name)
+    return bank_images
@@ -0,0 +1,99 @@
+import array
+import bisect
+from typing import Mapping, Optional, Sequence
+
+from charybdis import disasm, trace
+from charybdis.ann import types as ann_types
+
+
+class LabelIndex:
+    """Labels keyed on the addresses at which code can refer to them
+
+    ROM labels are kept per bank so that an address used by code in one bank
+    resolves to the label visible from that bank. Code can't know which bank
+    of banked RAM is mapped, so RAM addresses labelled in more than one bank
+    are never resolved, although each label is still defined.
+    """
+
+    rom_banks: int
+    _rom: dict[int, dict[int, tuple[str, ...]]]
+    _rom_offsets: dict[int, "array.array[int]"]
+    _ram: dict[int, str]
+    _ram_labels: list[tuple[str, int]]
+
+    def __init__(
+        self, label_addresses: Mapping[str, ann_types.BankAddr], rom_banks: int
+    ) -> None:
+        self.rom_banks = rom_banks
+        rom: dict[int, dict[int, list[str]]] = {}
+        ram: dict[int, dict[int, list[str]]] = {}
+        for label, addr in label_addresses.items():
+            if addr.addr >= disasm.ROMX_END:
+                ram.setdefault(addr.addr, {}).setdefault(addr.bank, []).append(label)
+                continue
+            offset = get_bank_offset(addr, rom_banks)
+            if offset is not None:
+                rom.setdefault(addr.bank, {}).setdefault(offset, []).append(label)
+        self._rom = {
+            bank: {offset: tuple(sorted(labels)) for offset, labels in offsets.items()}
+            for bank, offsets in rom.items()
+        }
+        self._rom_offsets = {
+            bank: array.array("H", sorted(offsets))
+            for bank, offsets in self._rom.items()
+        }
+        self._ram = {
+            addr: min(labels)
+            for addr, banks in ram.items()
+            if len(banks) == 1
+            for labels in banks.values()
+        }
+        self._ram_labels = sorted(
+            (label, addr)
+            for addr, banks in ram.items()
+            for labels in banks.values()
+            for label in labels
+        )
+
+    def __len__(self) -> int:
+        """Number of addresses which resolve to a label"""
+        return len(self._ram) + sum(len(offsets) for offsets in self._rom.values())
+
+    def at(self, bank: int, offset: int) -> tuple[str, ...]:
+        """Labels defined at an offset within a ROM bank"""
+        bank_labels = self._rom.get(bank)
+        if bank_labels is None:
+            return ()
+        return bank_labels.get(offset, ())
+
+    def offsets_in(self, bank: int, start: int, end: int) -> Sequence[int]:
+        """Labelled offsets in a ROM bank from start up to but excluding end"""
+        offsets = self._rom_offsets.get(bank)
+        if offsets is None:
+            return ()
+        return offsets[
+            bisect.bisect_left(offsets, start) : bisect.bisect_left(offsets, end)
+        ]
+
+    def ram_labels(self) -> Sequence[tuple[str, int]]:
+        """Every RAM label and its address, ordered by label"""
+        return self._ram_labels
+
+    def resolve(self, bank: int, addr: int) -> Optional[str]:
+        """Label for an address referenced by code or data in a ROM bank"""
+        if addr >= disasm.ROMX_END:
+            return self._ram.get(addr)
+        location = trace.get_rom_location(bank, addr, self.rom_banks)
+        if location is None:
+            return None
+        labels = self.at(*location)
+        return labels[0] if len(labels) > 0 else None
+
+
+def get_bank_offset(addr: ann_types.BankAddr, rom_banks: int) -> Optional[int]:
+    """Offset of a ROM address within its bank, if it is in the ROM"""
+    if addr.bank == 0 and addr.addr < disasm.ROMX_START:
+        return addr.addr
+    if 0 < addr.bank < rom_banks and disasm.ROMX_START <= addr.addr:
+        return addr.addr - disasm.ROMX_START
+    return None
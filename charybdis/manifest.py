@@ -0,0 +1,84 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import pathlib
+from typing import Any, Iterable
+
+from charybdis import disasm, files, labels
+from charybdis.ann import types as ann_types
+
+MANIFEST_FILE_NAME = ".charybdis-manifest.json"
+# NB: Bump whenever the generated assembly changes for the same inputs
+MANIFEST_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class BankInputs:
+    """Hashes of everything that determines the contents of a bank file"""
+
+    rom_hash: str
+    anns_hash: str
+
+
+def hash_anns(anns: Iterable[ann_types.Ann]) -> str:
+    """Order-independent hash of a collection of annotations"""
+    lines = sorted(repr(ann) for ann in anns)
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+
+def hash_labels(label_index: labels.LabelIndex, bank: int) -> str:
+    """Hash of the labels defined in a ROM bank and their offsets"""
+    lines = [
+        f"{offset:04x} {' '.join(label_index.at(bank, offset))}"
+        for offset in label_index.offsets_in(bank, 0, disasm.ROMX_START)
+    ]
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+
+def read_manifest(
+    output_directory_path: pathlib.Path, settings: dict[str, Any]
+) -> dict[int, BankInputs]:
+    """Reads the bank inputs recorded by a previous run
+
+    Nothing is returned if the manifest is missing, unreadable or was written
+    by a different version or with different settings.
+    """
+    manifest_path = output_directory_path / MANIFEST_FILE_NAME
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest["version"] != MANIFEST_VERSION:
+            return {}
+        if manifest["settings"] != settings:
+            return {}
+        return {
+            int(bank, 16): BankInputs(**inputs)
+            for bank, inputs in manifest["banks"].items()
+        }
+    except FileNotFoundError:
+        return {}
+    except (KeyError, TypeError, ValueError):
+        logger.warning("ignoring invalid manifest %s", manifest_path)
+        return {}
+
+
+def write_manifest(
+    output_directory_path: pathlib.Path,
+    settings: dict[str, Any],
+    inputs: list[BankInputs],
+) -> None:
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "settings": settings,
+        "banks": {
+            f"{bank:03x}": dataclasses.asdict(bank_inputs)
+            for bank, bank_inputs in enumerate(inputs)
+        },
+    }
+    files.write_text_atomic(
+        output_directory_path / MANIFEST_FILE_NAME,
+        json.dumps(manifest, indent=2, sort_keys=True),
+    )
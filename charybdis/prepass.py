@@ -0,0 +1,133 @@
+import dataclasses
+import itertools
+import re
+from typing import Optional
+
+from charybdis import disasm, insn
+
+
+def get_opcode_length(byte: int) -> int:
+    """Length of the instruction starting with a byte, or 0 if it is invalid"""
+    if byte == disasm.PREFIX_CB:
+        # NB: Every prefixed opcode is valid and two bytes long
+        return 2
+    op = disasm.OPCODES[byte]
+    return 0 if op is None else op.size
+
+
+OPCODE_LENGTHS = bytes(get_opcode_length(byte) for byte in range(0x100))
+# Per opcode byte: 1 if the instruction it starts may transfer control
+OPCODE_BRANCHES = bytes(
+    op is not None and op.flow != disasm.Flow.NEXT for op in disasm.OPCODES
+)
+
+# How to find the target of an instruction, by where its address comes from
+TARGET_NONE = 0
+TARGET_JUMP = 1
+TARGET_CALL = 2
+TARGET_RELATIVE = 3
+TARGET_VECTOR = 4
+
+
+def get_target_kind(op: Optional[disasm.Opcode]) -> int:
+    """Where the jump, branch or call target of an instruction comes from"""
+    if op is None or op.flow not in disasm.FLOWS_WITH_TARGET:
+        return TARGET_NONE
+    if op.decoded is not None:
+        # NB: RST is the only instruction with a target but no immediate
+        return TARGET_VECTOR
+    if op.name == insn.InsnName.JR:
+        return TARGET_RELATIVE
+    return TARGET_CALL if op.flow == disasm.Flow.CALL else TARGET_JUMP
+
+
+OPCODE_TARGET_KINDS = bytes(get_target_kind(op) for op in disasm.OPCODES)
+# Matches instructions of each kind, given their target kinds
+TARGET_KIND_PATTERNS = [
+    re.compile(re.escape(bytes([kind]))) for kind in range(TARGET_VECTOR + 1)
+]
+
+
+def get_vector(op: Optional[disasm.Opcode]) -> int:
+    if get_target_kind(op) != TARGET_VECTOR:
+        return 0
+    assert op is not None and op.decoded is not None
+    target = op.decoded.insn.operands[0]
+    assert isinstance(target, insn.U8)
+    return target.value
+
+
+# Per opcode byte: the address that RST calls
+OPCODE_VECTORS = bytes(get_vector(op) for op in disasm.OPCODES)
+
+UNPADDED_STOP = re.compile(re.escape(bytes([disasm.OPCODE_STOP])) + b"(?!\\x00)")
+# Matches a single instruction in instruction lengths, or failing that a byte
+# which can't start one
+INSN_LENGTHS = re.compile(b"\x01|\x02.|\x03..|.", re.DOTALL)
+# Flag for each byte of a match, 1 if it starts an instruction. Single bytes
+# other than 0x01 are those which can't start one.
+INSN_STARTS = {
+    **{bytes([length]): bytes([length == 1]) for length in range(4)},
+    **{
+        bytes([length, *tail]): b"\x01" + bytes(len(tail))
+        for length in [2, 3]
+        for tail in itertools.product(range(4), repeat=length - 1)
+    },
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class ByteClasses:
+    """Properties of the instruction which would start at each ROM offset
+
+    Computed for the whole ROM up front with table lookups so that callers can
+    rule out offsets without decoding them. Only branches with a nonzero length
+    may still fail to decode, e.g. a relative jump before the start of the ROM.
+    """
+
+    # Instruction length, 0 if invalid or if it would span a bank boundary
+    lengths: bytes
+    # 1 if the instruction may transfer control
+    branches: bytes
+
+
+def classify(rom_data: disasm.RomData) -> ByteClasses:
+    # NB: bytes.translate does the per-byte lookup in C, which measured faster
+    #     than an equivalent NumPy gather, so no optional dependency is needed.
+    #     It only works on bytes, so the ROM is copied a bank at a time rather
+    #     than all at once.
+    lengths_banks = []
+    branches_banks = []
+    for bank_start in range(0, len(rom_data), disasm.ROM_BANK_SIZE):
+        bank = bytes(rom_data[bank_start : bank_start + disasm.ROM_BANK_SIZE])
+        lengths_banks.append(classify_lengths(bank))
+        branches_banks.append(bank.translate(OPCODE_BRANCHES))
+    lengths = b"".join(lengths_banks)
+    del lengths_banks
+    return ByteClasses(lengths=lengths, branches=b"".join(branches_banks))
+
+
+def classify_lengths(bank: bytes) -> bytearray:
+    """Instruction lengths at each offset of a single bank"""
+    lengths = bytearray(bank.translate(OPCODE_LENGTHS))
+    # NB: STOP only decodes when followed by its zero padding byte, which it
+    #     can't be at the end of a bank
+    for match in UNPADDED_STOP.finditer(bank):
+        lengths[match.start()] = 0
+    # NB: Only the last couple of bytes of a bank can start an instruction
+    #     which crosses into the next one
+    if len(bank) == disasm.ROM_BANK_SIZE:
+        for index in range(len(bank) - 2, len(bank)):
+            if index + lengths[index] > len(bank):
+                lengths[index] = 0
+    return lengths
+
+
+def find_insn_starts(lengths: bytes) -> bytes:
+    """1 at each offset where decoding a run linearly starts an instruction
+
+    Matching instruction lengths with a regular expression walks the run in C.
+    Like linear rendering, it skips bytes which can't start an instruction
+    one at a time, including ones whose instruction runs past the end.
+    """
+    return b"".join(map(INSN_STARTS.__getitem__, INSN_LENGTHS.findall(lengths)))
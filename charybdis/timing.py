@@ -0,0 +1,95 @@
+import collections
+import contextlib
+import dataclasses
+import threading
+import time
+from typing import Any, Iterator
+
+
+@dataclasses.dataclass
+class StageTiming:
+    """Accumulated time spent in one stage of disassembly"""
+
+    calls: int = 0
+    wall: float = 0.0
+    # NB: CPU time of the thread running the stage, so that stages overlapping
+    #     on different threads aren't charged for each other
+    cpu: float = 0.0
+
+
+class Timings:
+    """Per-stage timers and counters for a disassembly run
+
+    Stages and counters are summed over every thread and worker process, so
+    the wall time of a parallel stage can exceed the run's elapsed time.
+    """
+
+    stages: dict[str, StageTiming]
+    counters: collections.Counter[str]
+
+    def __init__(self) -> None:
+        self.stages = {}
+        self.counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    # NB: Locks can't be pickled, so leave it out when returning from workers
+    def __getstate__(self) -> dict[str, Any]:
+        return {"stages": self.stages, "counters": self.counters}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_stage(
+                name,
+                StageTiming(
+                    calls=1,
+                    wall=time.perf_counter() - wall,
+                    cpu=time.thread_time() - cpu,
+                ),
+            )
+
+    def add_stage(self, name: str, timing: StageTiming) -> None:
+        with self._lock:
+            total = self.stages.setdefault(name, StageTiming())
+            total.calls += timing.calls
+            total.wall += timing.wall
+            total.cpu += timing.cpu
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def merge(self, other: "Timings") -> None:
+        for name, timing in other.stages.items():
+            self.add_stage(name, timing)
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "stages": {
+                name: dataclasses.asdict(timing) for name, timing in self.stages.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def format_table(self) -> str:
+        lines = [f"{'stage':<16} {'calls':>8} {'wall (s)':>10} {'cpu (s)':>10}"]
+        for name, timing in self.stages.items():
+            lines.append(
+                f"{name:<16} {timing.calls:>8} {timing.wall:>10.3f} {timing.cpu:>10.3f}"
+            )
+        if len(self.counters) > 0:
+            lines.append("")
+            lines.append(f"{'counter':<16} {'value':>30}")
+            for name, n in sorted(self.counters.items()):
+                lines.append(f"{name:<16} {n:>30,}")
+        return "\n".join(lines)
@@ -0,0 +1,205 @@
+import re
+from typing import Iterable, Iterator, Optional, Union
+
+from charybdis import disasm, prepass
+from charybdis.ann import types as ann_types
+
+RST_VECTORS = range(0x00, 0x40, 0x08)
+INTERRUPT_VECTORS = range(0x40, 0x68, 0x08)
+ENTRY_POINT = 0x0100
+
+# NB: Matches any bitmap byte with at least one bit set
+NONZERO_BYTE = re.compile(b"[^\x00]")
+# Binary digit for each flag byte, which must be 0 or 1
+FLAG_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+class CodeMap:
+    """Per-bank bitmaps of the ROM bytes known to contain code
+
+    Alongside every byte covered by an instruction, the offset of the first
+    byte of each instruction is recorded so that code can be decoded again
+    without re-tracing. So are the targets of jumps, branches and calls.
+    """
+
+    code: list[bytearray]
+    insn_starts: list[bytearray]
+    targets: list[bytearray]
+    call_targets: list[bytearray]
+    # True if instructions were found by decoding every bank linearly rather
+    # than by tracing, in which case code isn't recorded
+    linear: bool
+
+    def __init__(self, rom_banks: int, linear: bool = False) -> None:
+        self.linear = linear
+        bitmap_size = disasm.ROM_BANK_SIZE // 8
+        self.code = [bytearray(bitmap_size) for _ in range(rom_banks)]
+        self.insn_starts = [bytearray(bitmap_size) for _ in range(rom_banks)]
+        self.targets = [bytearray(bitmap_size) for _ in range(rom_banks)]
+        self.call_targets = [bytearray(bitmap_size) for _ in range(rom_banks)]
+
+    def is_code(self, bank: int, offset: int) -> bool:
+        return (self.code[bank][offset >> 3] >> (offset & 7)) & 1 == 1
+
+    def is_insn_start(self, bank: int, offset: int) -> bool:
+        return (self.insn_starts[bank][offset >> 3] >> (offset & 7)) & 1 == 1
+
+    def next_insn_start(self, bank: int, offset: int) -> int:
+        """Offset of the first instruction at or after offset
+
+        Returns the bank size if there are no more instructions in the bank.
+        """
+        bitmap = self.insn_starts[bank]
+        index = offset >> 3
+        bits = bitmap[index] >> (offset & 7) if index < len(bitmap) else 0
+        if bits != 0:
+            return offset + (bits & -bits).bit_length() - 1
+        match = NONZERO_BYTE.search(bitmap, index + 1)
+        if match is None:
+            return disasm.ROM_BANK_SIZE
+        index = match.start()
+        bits = bitmap[index]
+        return 8 * index + (bits & -bits).bit_length() - 1
+
+    def mark_insn(self, bank: int, offset: int, size: int) -> None:
+        self.insn_starts[bank][offset >> 3] |= 1 << (offset & 7)
+        code = self.code[bank]
+        for i in range(offset, offset + size):
+            code[i >> 3] |= 1 << (i & 7)
+
+    def set_insn_starts(self, bank: int, flags: Union[bytes, bytearray]) -> None:
+        """Records instruction starts from a flag byte per offset of a bank"""
+        # NB: Reversed so that the flag for offset 0 is the least significant
+        bits = int(flags.translate(FLAG_DIGITS)[::-1], 2)
+        self.insn_starts[bank][:] = bits.to_bytes(len(flags) // 8, "little")
+
+    def mark_target(self, bank: int, offset: int, is_call: bool) -> None:
+        self.targets[bank][offset >> 3] |= 1 << (offset & 7)
+        if is_call:
+            self.call_targets[bank][offset >> 3] |= 1 << (offset & 7)
+
+    def mark_targets(
+        self, bank: int, rom_banks: int, addrs: Iterable[int], is_call: bool
+    ) -> None:
+        """Marks the targets of instructions in a bank, given their addresses
+
+        Equivalent to mark_target for the location of each address.
+        """
+        # NB: Most targets are reached many times, RST vectors especially
+        unique_addrs = set(addrs)
+        romx_location = get_rom_location(bank, disasm.ROMX_START, rom_banks)
+        bitmaps = [self.targets, self.call_targets] if is_call else [self.targets]
+        for targets in bitmaps:
+            rom0 = targets[0]
+            romx = None if romx_location is None else targets[romx_location[0]]
+            for addr in unique_addrs:
+                if addr < disasm.ROMX_START:
+                    rom0[addr >> 3] |= 1 << (addr & 7)
+                elif addr < disasm.ROMX_END and romx is not None:
+                    offset = addr - disasm.ROMX_START
+                    romx[offset >> 3] |= 1 << (offset & 7)
+
+    def iter_targets(self, bank: int) -> Iterator[tuple[int, bool]]:
+        """Targets which start an instruction and whether they are called"""
+        bits = int.from_bytes(self.targets[bank], "little") & int.from_bytes(
+            self.insn_starts[bank], "little"
+        )
+        calls = int.from_bytes(self.call_targets[bank], "little")
+        while bits != 0:
+            low = bits & -bits
+            yield low.bit_length() - 1, calls & low != 0
+            bits ^= low
+
+
+def trace(
+    rom_data: disasm.RomData,
+    rom_banks: int,
+    anns: Optional[ann_types.AnnMapping] = None,
+    byte_classes: Optional[prepass.ByteClasses] = None,
+) -> CodeMap:
+    """Finds code reachable from the ROM's entry points
+
+    Decoding starts at the RST and interrupt vectors, the entry point and any
+    addresses annotated as code. Jumps, branches and calls are followed when
+    their target bank is known.
+    """
+    if byte_classes is None:
+        byte_classes = prepass.classify(rom_data)
+    code_map = CodeMap(rom_banks)
+    worklist = [(0, addr) for addr in [*RST_VECTORS, *INTERRUPT_VECTORS]]
+    worklist.append((0, ENTRY_POINT))
+    if anns is not None:
+        worklist.extend(get_code_anns(anns, rom_banks))
+    while len(worklist) > 0:
+        bank, offset = worklist.pop()
+        trace_from(rom_data, rom_banks, byte_classes, code_map, worklist, bank, offset)
+    return code_map
+
+
+def trace_from(
+    rom_data: disasm.RomData,
+    rom_banks: int,
+    byte_classes: prepass.ByteClasses,
+    code_map: CodeMap,
+    worklist: list[tuple[int, int]],
+    bank: int,
+    offset: int,
+) -> None:
+    """Decodes instructions until control flow leaves the current run"""
+    base = bank * disasm.ROM_BANK_SIZE
+    lengths = byte_classes.lengths
+    branches = byte_classes.branches
+    while offset < disasm.ROM_BANK_SIZE and not code_map.is_insn_start(bank, offset):
+        size = lengths[base + offset]
+        if size == 0:
+            return
+        # NB: Anything else falls through, so there is nothing to decode
+        if not branches[base + offset]:
+            code_map.mark_insn(bank, offset, size)
+            offset += size
+            continue
+        result = disasm.decode_insn(rom_data, base + offset)
+        if result is None:
+            return
+        code_map.mark_insn(bank, offset, size)
+        assert result.opcode is not None
+        flow = result.opcode.flow
+        if flow in disasm.FLOWS_WITH_TARGET:
+            target = disasm.get_target(result)
+            assert target is not None
+            location = get_rom_location(bank, target, rom_banks)
+            if location is not None:
+                code_map.mark_target(*location, flow == disasm.Flow.CALL)
+                worklist.append(location)
+        if flow not in disasm.FLOWS_WITH_FALLTHROUGH:
+            return
+        offset += size
+
+
+def get_rom_location(bank: int, addr: int, rom_banks: int) -> Optional[tuple[int, int]]:
+    """Bank and offset of an address as seen from code in the given bank
+
+    ROMX addresses referenced from ROM0 are ambiguous unless the ROM only has
+    one switchable bank.
+    """
+    if addr < disasm.ROMX_START:
+        return (0, addr)
+    if addr >= disasm.ROMX_END:
+        return None
+    if bank == 0:
+        if rom_banks != 2:
+            return None
+        bank = 1
+    return (bank, addr - disasm.ROMX_START)
+
+
+def get_code_anns(
+    anns: ann_types.AnnMapping, rom_banks: int
+) -> Iterable[tuple[int, int]]:
+    for addr, anns_at_address in anns.anns_at_address.items():
+        if not any(isinstance(ann.type, ann_types.CodeType) for ann in anns_at_address):
+            continue
+        if addr.addr < disasm.ROMX_START:
+            yield (0, addr.addr)
+        elif disasm.ROMX_START <= addr.addr < disasm.ROMX_END and addr.bank < rom_banks:
+            yield (addr.bank, addr.addr - disasm.ROMX_START)
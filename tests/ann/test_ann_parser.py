@@ -1,6 +1,9 @@
 import os
+import random
 import tempfile
+from typing import Optional
 
+import pyparsing as pp
 import pytest
 
 from charybdis.ann import ann_parser, types
@@ -45,3 +48,61 @@ def test_parse_ann_file() -> None:
             0xFF, 0xBEEF, "Beef", types.ArrayType(type=types.PrimitiveType.U16, size=5)
         )
     )
+
+
+def _parse_ann_grammar(line: str) -> Optional[types.Ann]:
+    try:
+        return ann_parser.get_grammar().parse_string(line, parse_all=True)[0]  # type: ignore
+    except pp.ParseException:
+        return None
+
+
+def _random_type(rng: random.Random, depth: int = 0) -> str:
+    choice = rng.randrange(6 if depth < 3 else 3)
+    if choice == 0:
+        return "u8"
+    if choice == 1:
+        return "u16"
+    if choice == 2:
+        return rng.choice(["u9", "u", "U8", "", "u8 ", "u16x"])
+    if choice == 3:
+        return "*" + _random_type(rng, depth + 1)
+    size = rng.choice(["5", "0x10", "0b101", "0123", "0x", "0b", "0b12", "", "-1"])
+    close = rng.choice(["]", "]", "]", ""])
+    return f"[{size}{close}" + _random_type(rng, depth + 1)
+
+
+def _random_line(rng: random.Random) -> str:
+    bank = rng.choice(["01", "ff", "FF", "1a", "01", "ff", "1", "001", "0g"])
+    addr = rng.choice(["1234", "beef", "BEEF", "4000", "123", "12345"])
+    label = rng.choice(["Test", "_t", "a1_b", "Test", "µs", "Aµ", "1a", "", "a.b"])
+    sep = rng.choice([":", ":", ":", " "])
+    space = rng.choice([" ", " ", " ", "  ", "\t"])
+    line = f"{bank}{sep}{addr}{space}{label}"
+    if rng.random() < 0.7:
+        comma = rng.choice([",", ", ", ",  ", ",\t", " ,", ", \t"])
+        line += comma + _random_type(rng)
+    if rng.random() < 0.3:
+        line += rng.choice([";", "; comment", " ; comment", ";;"])
+    return line
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_parse_ann_fast__matches_grammar(seed: int) -> None:
+    rng = random.Random(seed)
+    for _ in range(500):
+        line = _random_line(rng)
+        fast = ann_parser.parse_ann_fast(line)
+        if fast is not None:
+            assert _parse_ann_grammar(line) == fast, line
+
+
+@pytest.mark.parametrize("type,type_str", TYPE_TEST_CASES)
+def test_parse_ann_fast__typed(type: types.AnnType, type_str: str) -> None:
+    line = f"01:1234 A, {type_str}; comment"
+    assert types.ann(0x01, 0x1234, "A", type) == ann_parser.parse_ann_fast(line)
+
+
+@pytest.mark.parametrize("line", ["01:1234 Aµ", "01:1234 A,\ru8", "01:1234 A, u8 "])
+def test_parse_ann_fast__fallback(line: str) -> None:
+    assert None is ann_parser.parse_ann_fast(line)
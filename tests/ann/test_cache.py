@@ -0,0 +1,106 @@
+import os
+import pathlib
+import pickle
+import tempfile
+from typing import Any
+
+from charybdis.ann import ann_parser, cache, types
+
+import pytest
+
+
+ANN_FILE = """
+01:4000 Test, u8
+01:4001 Other, u16
+""".lstrip()
+
+
+def _write_ann_file(directory: str, contents: str = ANN_FILE) -> pathlib.Path:
+    ann_file_path = pathlib.Path(directory) / "rom.ann"
+    with open(ann_file_path, "w") as f:
+        f.write(contents)
+    return ann_file_path
+
+
+def _fail_parse(*args: Any) -> types.AnnMapping:
+    raise Exception("annotations parsed")
+
+
+def test_load_ann_file(monkeypatch: pytest.MonkeyPatch) -> None:
+    with tempfile.TemporaryDirectory() as d:
+        ann_file_path = _write_ann_file(d)
+        anns = cache.load_ann_file(ann_file_path)
+        assert cache.get_cache_path(ann_file_path).is_file()
+        monkeypatch.setattr(ann_parser, "parse_ann_file", _fail_parse)
+        cached = cache.load_ann_file(ann_file_path)
+    assert anns.anns_at_address == cached.anns_at_address
+    assert anns.label_addresses == cached.label_addresses
+    assert cached.get_label_address("Other") == types.BankAddr(0x01, 0x4001)
+
+
+def test_load_ann_file__changed() -> None:
+    with tempfile.TemporaryDirectory() as d:
+        ann_file_path = _write_ann_file(d)
+        cache.load_ann_file(ann_file_path)
+        stat = ann_file_path.stat()
+        _write_ann_file(d, ANN_FILE.replace("Other", "Otter"))
+        # NB: Restore the mtime, and the size is unchanged, so only the hash
+        #     differs
+        os.utime(ann_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        changed = ann_file_path.stat()
+        assert (stat.st_size, stat.st_mtime_ns) == (
+            changed.st_size,
+            changed.st_mtime_ns,
+        )
+        anns = cache.load_ann_file(ann_file_path)
+    assert anns.get_label_address("Other") is None
+    assert anns.get_label_address("Otter") == types.BankAddr(0x01, 0x4001)
+
+
+def test_load_ann_file__invalid_cache() -> None:
+    with tempfile.TemporaryDirectory() as d:
+        ann_file_path = _write_ann_file(d)
+        with open(cache.get_cache_path(ann_file_path), "wb") as f:
+            f.write(b"garbage")
+        anns = cache.load_ann_file(ann_file_path)
+        cached = cache.read_cache(
+            cache.get_cache_path(ann_file_path), cache.get_source_key(ann_file_path)
+        )
+    assert anns.get_label_address("Test") == types.BankAddr(0x01, 0x4000)
+    assert cached is not None
+
+
+class _Payload:
+    def __reduce__(self) -> Any:
+        return print, ("unpickled",)
+
+
+def test_load_ann_file__pickled_cache(capsys: pytest.CaptureFixture[str]) -> None:
+    with tempfile.TemporaryDirectory() as d:
+        ann_file_path = _write_ann_file(d)
+        with open(cache.get_cache_path(ann_file_path), "wb") as f:
+            pickle.dump(_Payload(), f)
+        anns = cache.load_ann_file(ann_file_path)
+    assert "unpickled" not in capsys.readouterr().out
+    assert anns.get_label_address("Test") == types.BankAddr(0x01, 0x4000)
+
+
+@pytest.mark.parametrize(
+    "type",
+    [
+        types.PrimitiveType.U8,
+        types.PrimitiveType.U16,
+        types.ArrayType(types.PointerType(types.PrimitiveType.U16), 4),
+        types.CodeType(3),
+        types.ImageType(0x40, 16),
+        types.ImageType(0x40, None),
+    ],
+)
+def test_encode_type(type: types.AnnType) -> None:
+    assert type == cache.decode_type(cache.encode_type(type))
+
+
+@pytest.mark.parametrize("data", [["u32"], ["array", ["u8"]], ["code", "3"], None])
+def test_decode_type__invalid(data: Any) -> None:
+    with pytest.raises(ValueError):
+        cache.decode_type(data)
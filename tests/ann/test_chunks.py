@@ -0,0 +1,113 @@
+import concurrent.futures
+import io
+from typing import Any, Callable, TypeVar
+
+from charybdis.ann import ann_parser, chunks, sym_parser, types
+
+import pytest
+
+T = TypeVar("T")
+
+
+ANN_LINES = [f"01:{0x4000 + i:04x} Label_{i}, u8" for i in range(10)]
+
+
+class DeferredExecutor(concurrent.futures.Executor):
+    """Runs each task when its result is requested, counting those waiting"""
+
+    def __init__(self) -> None:
+        self.waiting = 0
+        self.max_waiting = 0
+
+    def submit(
+        self, fn: Callable[..., T], /, *args: Any, **kwargs: Any
+    ) -> "concurrent.futures.Future[T]":
+        executor = self
+        executor.waiting += 1
+        executor.max_waiting = max(executor.max_waiting, executor.waiting)
+
+        class DeferredFuture(concurrent.futures.Future[T]):
+            def result(self, timeout: Any = None) -> T:
+                executor.waiting -= 1
+                return fn(*args, **kwargs)
+
+        return DeferredFuture()
+
+
+@pytest.fixture(autouse=True)
+def parallel(monkeypatch: pytest.MonkeyPatch) -> None:
+    # NB: Let tests run in parallel however many CPUs are available
+    monkeypatch.setattr(chunks, "get_cpu_count", lambda: 2)
+    monkeypatch.setattr(chunks, "PARALLEL_MIN_CHUNKS", 2)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_parse_file(monkeypatch: pytest.MonkeyPatch, jobs: int) -> None:
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 3)
+    anns = ann_parser.parse_ann_file(io.StringIO("\n".join(ANN_LINES)), jobs)
+    for i in range(10):
+        assert anns.get_label_address(f"Label_{i}") == types.BankAddr(1, 0x4000 + i)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_parse_file__sym(monkeypatch: pytest.MonkeyPatch, jobs: int) -> None:
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 2)
+    lines = ["; comment", "", "00:0000 .code:0003", "00:0307 .data:0012", ""]
+    anns = sym_parser.parse_sym_file(io.StringIO("\n".join(lines)), jobs)
+    assert anns.has(types.ann(0x00, 0x0000, "", types.CodeType(size=0x03)))
+    assert anns.index().banks() == [0]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_parse_file__duplicate_label(
+    monkeypatch: pytest.MonkeyPatch, jobs: int
+) -> None:
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 3)
+    lines = ANN_LINES + ["02:4000 Label_4"]
+    with pytest.raises(Exception, match="^line 11: label 'Label_4' defined twice"):
+        ann_parser.parse_ann_file(io.StringIO("\n".join(lines)), jobs)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_parse_file__invalid(monkeypatch: pytest.MonkeyPatch, jobs: int) -> None:
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 3)
+    lines = ANN_LINES[:7] + ["nonsense"] + ANN_LINES[7:]
+    with pytest.raises(Exception, match="^line 8: "):
+        ann_parser.parse_ann_file(io.StringIO("\n".join(lines)), jobs)
+
+
+def test_iter_chunks() -> None:
+    f = io.StringIO("a\nb\nc\nd\ne\n")
+    assert list(chunks.iter_chunks(f, 2)) == [
+        (1, ["a\n", "b\n"]),
+        (3, ["c\n", "d\n"]),
+        (5, ["e\n"]),
+    ]
+
+
+def test_parse_file__single_cpu(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 3)
+    monkeypatch.setattr(chunks, "get_cpu_count", lambda: 1)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", None)
+    anns = ann_parser.parse_ann_file(io.StringIO("\n".join(ANN_LINES)), jobs=2)
+    assert 10 == len(anns.label_addresses)
+
+
+def test_parse_file__small(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 6)
+    monkeypatch.setattr(chunks, "PARALLEL_MIN_CHUNKS", 3)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", None)
+    anns = ann_parser.parse_ann_file(io.StringIO("\n".join(ANN_LINES)), jobs=2)
+    assert 10 == len(anns.label_addresses)
+
+
+def test_parse_file__executor(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 1)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", None)
+    executor = DeferredExecutor()
+    anns = ann_parser.parse_ann_file(
+        io.StringIO("\n".join(ANN_LINES)), jobs=2, executor=executor
+    )
+    assert 10 == len(anns.label_addresses)
+    # NB: Chunks are only read ahead of the merge by a bounded amount
+    assert chunks.CHUNKS_IN_FLIGHT * 2 == executor.max_waiting
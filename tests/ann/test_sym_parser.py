@@ -1,3 +1,4 @@
+import io
 import os
 import tempfile
 
@@ -43,6 +44,10 @@ def test_parse_sym_line__empty(line: str) -> None:
             "01:2345 .image:00a0:w16",
             types.ann(0x01, 0x2345, "", types.ImageType(size=0xA0, width=16)),
         ),
+        ("00:0150 Main", types.ann(0x00, 0x0150, "Main")),
+        ("00:0153 Main.loop", types.ann(0x00, 0x0153, "Main.loop")),
+        ("00:c000 wCount", types.ann(0x00, 0xC000, "wCount")),
+        ("1ff:4000 Far", types.ann(0x1FF, 0x4000, "Far")),
     ],
 )
 def test_parse_sym_line(line: str, ann: types.Ann) -> None:
@@ -76,3 +81,41 @@ def test_parse_sym_file() -> None:
             type=types.ArrayType(type=types.PrimitiveType.U8, size=0x12),
         )
     )
+
+
+RGBLINK_SYM_FILE = """
+; File generated by rgblink
+00:0150 Main
+00:0153 Main.loop
+01:4000 Func
+00:ff80 hFlag
+""".strip()
+
+
+def test_parse_sym_file__labels() -> None:
+    anns = sym_parser.parse_sym_file(io.StringIO(RGBLINK_SYM_FILE))
+    assert types.BankAddr(0x01, 0x4000) == anns.get_label_address("Func")
+    assert types.BankAddr(0x00, 0xFF80) == anns.get_label_address("hFlag")
+    assert anns.has(types.ann(0x00, 0x0153, "Main.loop"))
+
+
+def test_parse_sym_file__duplicate_label() -> None:
+    f = io.StringIO(RGBLINK_SYM_FILE + "\n01:4010 Main\n")
+    with pytest.raises(Exception, match="line 6: label 'Main' defined twice"):
+        sym_parser.parse_sym_file(f)
+
+
+def test_iter_sym_file() -> None:
+    f = io.StringIO(SYM_FILE + "\n")
+    it = sym_parser.iter_sym_file(f)
+    assert next(it) == types.ann(0x00, 0x0000, "", types.CodeType(size=0x03))
+    # NB: Lines are consumed lazily rather than read up front
+    assert f.tell() < len(SYM_FILE)
+    assert list(it) == [
+        types.ann(
+            0x00,
+            0x0307,
+            "",
+            types.ArrayType(type=types.PrimitiveType.U8, size=0x12),
+        )
+    ]
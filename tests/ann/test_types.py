@@ -0,0 +1,60 @@
+from charybdis.ann import types
+
+ANNS = [
+    types.ann(0x01, 0x4000, "A"),
+    types.ann(0x01, 0x4010, "B", types.PrimitiveType.U8),
+    types.ann(0x01, 0x4010, "", types.CodeType(size=4)),
+    types.ann(0x02, 0x4000, "C"),
+]
+
+
+def test_ann_mapping__has() -> None:
+    anns = types.AnnMapping(ANNS)
+    assert anns.has(ANNS[0])
+    assert not anns.has(types.ann(0x03, 0x4000, "D"))
+    assert types.BankAddr(0x03, 0x4000) not in anns.anns_at_address
+
+
+def test_ann_mapping__index() -> None:
+    anns = types.AnnMapping(ANNS)
+    index = anns.index()
+    assert index is anns.index()
+    anns.add(types.ann(0x03, 0x4000, "D"))
+    assert index is not anns.index()
+    assert [0x01, 0x02, 0x03] == anns.index().banks()
+
+
+def test_ann_index__at() -> None:
+    index = types.AnnMapping(ANNS).index()
+    assert (ANNS[0],) == index.at(0x01, 0x4000)
+    assert {ANNS[1], ANNS[2]} == set(index.at(0x01, 0x4010))
+    assert () == index.at(0x01, 0x4001)
+    assert () == index.at(0x05, 0x4000)
+
+
+def test_ann_index__next_at_or_after() -> None:
+    index = types.AnnMapping(ANNS).index()
+    assert 0x4000 == index.next_at_or_after(0x01, 0x0000)
+    assert 0x4000 == index.next_at_or_after(0x01, 0x4000)
+    assert 0x4010 == index.next_at_or_after(0x01, 0x4001)
+    assert None is index.next_at_or_after(0x01, 0x4011)
+    assert None is index.next_at_or_after(0x05, 0x0000)
+
+
+def test_ann_index__addresses_in() -> None:
+    index = types.AnnMapping(ANNS).index()
+    assert [0x4000, 0x4010] == list(index.addresses_in(0x01, 0x4000, 0x8000))
+    assert [0x4000] == list(index.addresses_in(0x01, 0x4000, 0x4010))
+    assert [] == list(index.addresses_in(0x01, 0x4011, 0x8000))
+    assert [] == list(index.addresses_in(0x05, 0x4000, 0x8000))
+
+
+def test_get_type_size() -> None:
+    assert 1 == types.get_type_size(types.PrimitiveType.U8)
+    assert 2 == types.get_type_size(types.PrimitiveType.U16)
+    assert 2 == types.get_type_size(types.PointerType(types.PrimitiveType.U8))
+    assert 0x10 == types.get_type_size(types.CodeType(size=0x10))
+    assert 0x80 == types.get_type_size(types.ImageType(size=0x80))
+    assert 24 == types.get_type_size(
+        types.ArrayType(types.ArrayType(types.PrimitiveType.U16, 3), 4)
+    )
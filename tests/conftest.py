@@ -0,0 +1,71 @@
+import dataclasses
+import pathlib
+import random
+from typing import Any, Callable
+
+from charybdis import io, timing
+
+import pytest
+
+
+@dataclasses.dataclass
+class Output:
+    """Files written by disassembling a ROM with one set of options"""
+
+    files: dict[str, str]
+    timings: timing.Timings
+
+
+WriteRom = Callable[..., pathlib.Path]
+DisassembleEach = Callable[..., dict[str, Output]]
+
+
+def read_tree(dir: pathlib.Path) -> dict[str, str]:
+    """Contents of every file under a directory, keyed on relative path"""
+    return {
+        path.relative_to(dir).as_posix(): path.read_text()
+        for path in sorted(dir.rglob("*"))
+        if path.is_file()
+    }
+
+
+@pytest.fixture
+def write_rom(tmp_path: pathlib.Path) -> WriteRom:
+    """Writes a ROM of random bytes with a matching size in its header"""
+
+    def write(banks: int, name: str = "rom.gb") -> pathlib.Path:
+        rom_data = bytearray(random.Random(0).randbytes(banks * io.ROM_BANK_SIZE))
+        rom_data[io.OFFSET_ROM_SIZE] = banks.bit_length() - 2
+        rom_file_path = tmp_path / name
+        rom_file_path.write_bytes(rom_data)
+        return rom_file_path
+
+    return write
+
+
+@pytest.fixture
+def disassemble_each(tmp_path: pathlib.Path, write_rom: WriteRom) -> DisassembleEach:
+    """Disassembles a random ROM once for each named set of options
+
+    Each run writes to its own directory so that their outputs can be compared.
+    """
+
+    def disassemble(banks: int, **options: dict[str, Any]) -> dict[str, Output]:
+        rom_file_path = write_rom(banks)
+        outputs = {}
+        for name, overrides in options.items():
+            output_directory_path = tmp_path / name
+            timings = io.disassemble(
+                io.DisassemblerOptions(
+                    **{
+                        "output_directory_path": output_directory_path,
+                        "overwrite": False,
+                        "rom_file_path": rom_file_path,
+                        **overrides,
+                    }
+                )
+            )
+            outputs[name] = Output(read_tree(output_directory_path), timings)
+        return outputs
+
+    return disassemble
@@ -1,4 +1,10 @@
-from charybdis import cli
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+from charybdis import cli, gfx, io
+from tests.conftest import WriteRom
 
 ROM_FILE_PATH = "rom.gbc"
 
@@ -22,6 +28,183 @@ def test_get_parser__overwrite() -> None:
     args = parser.parse_args(["--overwrite", ROM_FILE_PATH])
     assert args.overwrite
     args = parser.parse_args([ROM_FILE_PATH])
-    assert not args.overwrite
+    assert args.overwrite is False
     args = parser.parse_args(["--no-overwrite", ROM_FILE_PATH])
-    assert not args.overwrite
+    assert args.overwrite is False
+
+
+def test_get_parser__jobs() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert 1 == args.jobs
+    args = parser.parse_args(["--jobs", "4", ROM_FILE_PATH])
+    assert 4 == args.jobs
+
+
+def test_get_parser__buffer_size() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert io.DEFAULT_BUFFER_SIZE == args.buffer_size
+    args = parser.parse_args(["--buffer-size", "1024", ROM_FILE_PATH])
+    assert 1024 == args.buffer_size
+
+
+def test_get_parser__incremental() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args(["--incremental", ROM_FILE_PATH])
+    assert args.incremental
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert args.incremental is False
+
+
+def test_get_parser__trace() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args(["--trace", ROM_FILE_PATH])
+    assert args.trace
+    # NB: Settings recorded for incremental runs must match whether or not the
+    #     flag is given
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert args.trace is False
+    args = parser.parse_args(["--no-trace", ROM_FILE_PATH])
+    assert io.get_render_settings(cli.get_options(args)) == io.get_render_settings(
+        cli.get_options(parser.parse_args([ROM_FILE_PATH]))
+    )
+
+
+def test_get_parser__auto_labels() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert args.auto_labels is False
+    args = parser.parse_args(["--auto-labels", ROM_FILE_PATH])
+    assert cli.get_options(args, ROM_FILE_PATH).auto_labels
+
+
+def test_get_parser__data() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert io.DEFAULT_DB_WIDTH == args.db_width
+    assert 0 == args.incbin_threshold
+    args = parser.parse_args(
+        ["--db-width", "16", "--incbin-threshold", "256", ROM_FILE_PATH]
+    )
+    assert 16 == args.db_width
+    assert 256 == args.incbin_threshold
+
+
+def test_get_parser__ann_cache() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert args.ann_cache
+    args = parser.parse_args(["--no-ann-cache", ROM_FILE_PATH])
+    assert not args.ann_cache
+
+
+def _imported_modules(code: str) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        cwd=pathlib.Path(__file__).parent.parent,
+        text=True,
+    )
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+
+
+def test_import__lazy() -> None:
+    modules = _imported_modules("import charybdis.cli; charybdis.cli.get_parser()")
+    assert "charybdis.io" in modules
+    assert "pyparsing" not in modules
+    assert "chevron" not in modules
+
+
+def test_import__lazy_grammar() -> None:
+    code = (
+        "from charybdis.ann import ann_parser; ann_parser.parse_ann('01:4000 Test, u8')"
+    )
+    assert "pyparsing" not in _imported_modules(code)
+
+
+def test_get_batch_parser() -> None:
+    parser = cli.get_batch_parser()
+    args = parser.parse_args(["--jobs", "4", "-o", "out", "a.gb", "roms"])
+    assert ["a.gb", "roms"] == args.rom_paths
+    assert "out" == args.output_directory_path
+    assert 4 == args.jobs
+    args = parser.parse_args(["a.gb"])
+    assert "output" == args.output_directory_path
+
+
+def test_find_roms() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        roms = pathlib.Path(dir) / "roms"
+        roms.mkdir()
+        for name in ["b.gbc", "a.gb", "notes.txt"]:
+            (roms / name).touch()
+        assert [roms / "a.gb", roms / "b.gbc"] == cli.find_roms([str(roms)])
+        assert [roms / "b.gbc"] == cli.find_roms([str(roms / "*.gbc")])
+        assert [roms / "c.gb"] == cli.find_roms([str(roms / "c.gb")])
+
+
+def test_get_parser__write_queue_depth() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert io.DEFAULT_WRITE_QUEUE_DEPTH == args.write_queue_depth
+    args = parser.parse_args(["--write-queue-depth", "0", ROM_FILE_PATH])
+    assert 0 == args.write_queue_depth
+
+
+def test_get_parser__timings() -> None:
+    parser = cli.get_parser()
+    args = parser.parse_args([ROM_FILE_PATH])
+    assert not args.timings
+    assert args.timings_json is None
+    assert args.profile is None
+    args = parser.parse_args(
+        ["--timings", "--timings-json", "t.json", "--profile", "p.out", ROM_FILE_PATH]
+    )
+    assert args.timings
+    assert "t.json" == args.timings_json
+    assert "p.out" == args.profile
+
+
+def test_main__sym_image(tmp_path: pathlib.Path, write_rom: WriteRom) -> None:
+    rom_file_path = write_rom(banks=4)
+    rom_file_path.with_suffix(".sym").write_text(
+        "01:4000 .image:0040:w16\n02:4000 .data:0010\n"
+    )
+    output_directory_path = tmp_path / "output"
+    cli.main([str(rom_file_path), str(output_directory_path)])
+    rom_data = rom_file_path.read_bytes()
+    png = (output_directory_path / "bank_001_4000.png").read_bytes()
+    assert gfx.tiles_to_png(rom_data[0x4000:0x4040], 16) == png
+    bank_text = (output_directory_path / "bank_001.asm").read_text()
+    assert 'INCBIN "bank_001_4000.2bpp"' in bank_text
+    assert not (output_directory_path / "bank_001_4000.2bpp").exists()
+    makefile_text = (output_directory_path / "Makefile").read_text()
+    assert "%.2bpp : %.png" in makefile_text
+    assert "\nbank_001.o : bank_001_4000.2bpp\n" in makefile_text
+    assert "bank_002.o" not in makefile_text
+    assert rom_file_path.with_name("rom.sym.cache").is_file()
+
+
+def test_main__rgblink_sym(tmp_path: pathlib.Path, write_rom: WriteRom) -> None:
+    rom_file_path = write_rom(banks=4)
+    rom_file_path.with_suffix(".sym").write_text(
+        "; File generated by rgblink\n"
+        "00:0150 Main\n"
+        "00:0153 Main.loop\n"
+        "01:4000 Func\n"
+        "00:c000 wCount\n"
+    )
+    output_directory_path = tmp_path / "output"
+    cli.main([str(rom_file_path), str(output_directory_path)])
+    bank_text = (output_directory_path / "bank_000.asm").read_text()
+    assert "\nMain::\n" in bank_text
+    assert "\nMain.loop::\n" in bank_text
+    assert "\nFunc::\n" in (output_directory_path / "bank_001.asm").read_text()
+    ram_text = (output_directory_path / io.RAM_INCLUDE_NAME).read_text()
+    assert "DEF wCount EQU $c000\n" == ram_text
@@ -1,7 +1,11 @@
-from typing import Iterable
+import pathlib
+import re
+import shutil
+import subprocess
+import tempfile
+from typing import Iterable, Optional
 
 import pytest
-import subprocess
 
 from charybdis import disasm, insn
 
@@ -82,6 +86,21 @@ LD_R8_R8_CASES = [
 
 R8_R8_CASES = LD_R8_R8_CASES
 
+INVALID_OPCODES = {
+    0xCB,
+    0xD3,
+    0xDB,
+    0xDD,
+    0xE3,
+    0xE4,
+    0xEB,
+    0xEC,
+    0xED,
+    0xF4,
+    0xFC,
+    0xFD,
+}
+
 U3_R8_CASES = [
     (name, bit, r, [0xCB, 0x40 * y + 0x40 + 8 * bit + x])
     for x, r in enumerate(R8_ORDER)
@@ -107,28 +126,314 @@ def test_decode_insn__nullary(name: insn.InsnName, data: Iterable[int]) -> None:
 def test_decode_insn__r8_r8(
     name: insn.InsnName, r1: insn.R8, r2: insn.R8, byte: int
 ) -> None:
-    _assert_decode([byte], insn.Insn(name=name, operands=[r1, r2]))
-
-
-# TODO: Merge these two parameterized tests after 0xCB opcodes are implemented
-@pytest.mark.parametrize("name,r,data", ALU_R8_CASES)
-def test_decode_insn__alu_r8(
-    name: insn.InsnName, r: insn.R8, data: Iterable[int]
-) -> None:
-    _assert_decode(data, insn.Insn(name=name, operands=[r]))
+    _assert_decode([byte], insn.Insn(name=name, operands=(r1, r2)))
 
 
-@pytest.mark.parametrize("name,r,data", CB_R8_CASES)
-@pytest.mark.skip(reason="not implemented")
-def test_decode_insn__cb_r8(
-    name: insn.InsnName, r: insn.R8, data: Iterable[int]
-) -> None:
-    _assert_decode(data, insn.Insn(name=name, operands=[r]))
+@pytest.mark.parametrize("name,r,data", R8_CASES)
+def test_decode_insn__r8(name: insn.InsnName, r: insn.R8, data: Iterable[int]) -> None:
+    _assert_decode(data, insn.Insn(name=name, operands=(r,)))
 
 
 @pytest.mark.parametrize("name,bit,r,data", U3_R8_CASES)
-@pytest.mark.skip(reason="not implemented")
 def test_decode_insn__u3_r8(
     name: insn.InsnName, bit: int, r: insn.R8, data: Iterable[int]
 ) -> None:
-    _assert_decode(data, insn.Insn(name=name, operands=[insn.U3(bit), r]))
+    _assert_decode(data, insn.Insn(name=name, operands=(insn.U3(bit), r)))
+
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        (
+            [0x01, 0x34, 0x12],
+            insn.Insn(insn.InsnName.LD, (insn.R16.BC, insn.U16(0x1234))),
+        ),
+        ([0x3E, 0xF7], insn.Insn(insn.InsnName.LD, (insn.R8.A, insn.U8(0xF7)))),
+        (
+            [0xEA, 0xA1, 0xF0],
+            insn.Insn(insn.InsnName.LD, (insn.DirectU16(insn.U16(0xF0A1)), insn.R8.A)),
+        ),
+        (
+            [0xF0, 0x44],
+            insn.Insn(insn.InsnName.LDH, (insn.R8.A, insn.DirectU16(insn.U16(0xFF44)))),
+        ),
+        ([0xC6, 0x12], insn.Insn(insn.InsnName.ADD, (insn.U8(0x12),))),
+        ([0xFE, 0x90], insn.Insn(insn.InsnName.CP, (insn.U8(0x90),))),
+        ([0xE8, 0xFB], insn.Insn(insn.InsnName.ADD, (insn.R16.SP, insn.I8(-5)))),
+        (
+            [0xF8, 0x05],
+            insn.Insn(insn.InsnName.LD, (insn.R16.HL, insn.SPRelative(insn.I8(5)))),
+        ),
+    ],
+)
+def test_decode_insn__immediate(data: Iterable[int], expected: insn.Insn) -> None:
+    _assert_decode(data, expected)
+
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        ([0x03], insn.Insn(insn.InsnName.INC, (insn.R16.BC,))),
+        ([0x3B], insn.Insn(insn.InsnName.DEC, (insn.R16.SP,))),
+        ([0x34], insn.Insn(insn.InsnName.INC, (insn.R8.HL,))),
+        ([0x3D], insn.Insn(insn.InsnName.DEC, (insn.R8.A,))),
+        ([0x29], insn.Insn(insn.InsnName.ADD, (insn.R16.HL, insn.R16.HL))),
+        ([0xD1], insn.Insn(insn.InsnName.POP, (insn.R16.DE,))),
+        ([0xF5], insn.Insn(insn.InsnName.PUSH, (insn.R16.AF,))),
+        ([0x10, 0x00], insn.Insn(insn.InsnName.STOP)),
+    ],
+)
+def test_decode_insn__fixed(data: Iterable[int], expected: insn.Insn) -> None:
+    _assert_decode(data, expected)
+
+
+@pytest.mark.parametrize(
+    "data", [[0xD3], [0x01, 0x34], [0x3E], [0xCB], [0x10], [0x10, 0x01]]
+)
+def test_decode_insn__undecodable(data: Iterable[int]) -> None:
+    assert None is disasm.decode_insn(bytes(data), 0)
+
+
+def test_opcodes__sizes() -> None:
+    assert 0x100 == len(disasm.OPCODES) == len(disasm.CB_OPCODES)
+    for op in disasm.CB_OPCODES:
+        assert op is not None and 2 == op.size
+    assert 3 == disasm.OPCODES[0x01].size  # type: ignore
+
+
+def test_opcodes__coverage() -> None:
+    invalid = {byte for byte, op in enumerate(disasm.OPCODES) if op is None}
+    assert INVALID_OPCODES == invalid
+    assert None not in disasm.CB_OPCODES
+
+
+def test_opcodes__cycles() -> None:
+    for op in disasm.OPCODES + disasm.CB_OPCODES:
+        if op is None:
+            continue
+        assert 0 < op.cycles, op
+        # NB: Only conditional instructions take longer when their condition holds
+        conditional = any(isinstance(operand, insn.Cond) for operand in op.operands)
+        if conditional:
+            assert op.cycles_taken is not None and op.cycles < op.cycles_taken, op
+        else:
+            assert op.cycles_taken is None, op
+    assert 1 == disasm.OPCODES[0x00].cycles  # type: ignore
+    assert 6 == disasm.OPCODES[0xCD].cycles  # type: ignore
+    assert 3 == disasm.CB_OPCODES[0x46].cycles  # type: ignore
+    assert 4 == disasm.CB_OPCODES[0xC6].cycles  # type: ignore
+
+
+def _every_opcode() -> bytes:
+    """Every valid opcode in turn, each followed by the bytes it takes"""
+    rom_data = bytearray()
+    for byte, op in enumerate(disasm.OPCODES):
+        if op is None:
+            continue
+        if op.padded:
+            rom_data += bytes([byte, 0x00])
+        else:
+            # NB: Immediates are chosen so that relative jumps go backwards and
+            #     signed offsets are negative
+            rom_data += bytes([byte, 0xF6, 0x12][: op.size])
+    for byte in range(0x100):
+        rom_data += bytes([disasm.PREFIX_CB, byte])
+    return bytes(rom_data)
+
+
+def _render_every_opcode(rom_data: bytes) -> list[str]:
+    lines = []
+    index = 0
+    while index < len(rom_data):
+        result = disasm.decode_insn(rom_data, index)
+        assert result is not None, f"{index:#x}"
+        lines.append(result.render())
+        index += result.size
+    return lines
+
+
+def test_decode_insn__every_opcode() -> None:
+    lines = _render_every_opcode(_every_opcode())
+    assert 0x100 - len(INVALID_OPCODES) + 0x100 == len(lines)
+
+
+ASM_R8 = ["b", "c", "d", "e", "h", "l", "[hl]", "a"]
+ASM_R16 = ["bc", "de", "hl", "sp"]
+ASM_R16_STACK = ["bc", "de", "hl", "af"]
+ASM_R16_MEMORY = ["[bc]", "[de]", "[hl+]", "[hl-]"]
+ASM_COND = ["nz", "z", "nc", "c"]
+ASM_ALU = ["add", "adc", "sub", "sbc", "and", "xor", "or", "cp"]
+ASM_ROTATE = ["rlc", "rrc", "rl", "rr", "sla", "sra", "swap", "srl"]
+ASM_BIT = ["bit", "res", "set"]
+ASM_ACCUMULATOR = ["rlca", "rrca", "rla", "rra", "daa", "cpl", "scf", "ccf"]
+
+# NB: Written out from the opcode table layout rather than derived from
+#     disasm, so that a wrong entry there can't also make these agree. Maps each
+#     instruction, with any immediate replaced by n or e, to its encoding and the
+#     size of the immediate which follows it.
+ASM_ENCODINGS: dict[str, tuple[bytes, int]] = {
+    "nop": (b"\x00", 0),
+    "ld [n], sp": (b"\x08", 2),
+    "stop": (b"\x10\x00", 0),
+    "jr e": (b"\x18", 1),
+    **{f"jr {cc}, e": (bytes([0x20 + 8 * y]), 1) for y, cc in enumerate(ASM_COND)},
+    **{f"ld {r}, n": (bytes([0x01 + 16 * p]), 2) for p, r in enumerate(ASM_R16)},
+    **{f"add hl, {r}": (bytes([0x09 + 16 * p]), 0) for p, r in enumerate(ASM_R16)},
+    **{f"inc {r}": (bytes([0x03 + 16 * p]), 0) for p, r in enumerate(ASM_R16)},
+    **{f"dec {r}": (bytes([0x0B + 16 * p]), 0) for p, r in enumerate(ASM_R16)},
+    **{f"ld {r}, a": (bytes([0x02 + 16 * p]), 0) for p, r in enumerate(ASM_R16_MEMORY)},
+    **{f"ld a, {r}": (bytes([0x0A + 16 * p]), 0) for p, r in enumerate(ASM_R16_MEMORY)},
+    **{f"inc {r}": (bytes([0x04 + 8 * y]), 0) for y, r in enumerate(ASM_R8)},
+    **{f"dec {r}": (bytes([0x05 + 8 * y]), 0) for y, r in enumerate(ASM_R8)},
+    **{f"ld {r}, n": (bytes([0x06 + 8 * y]), 1) for y, r in enumerate(ASM_R8)},
+    **{name: (bytes([0x07 + 8 * y]), 0) for y, name in enumerate(ASM_ACCUMULATOR)},
+    **{
+        f"ld {r1}, {r2}": (bytes([0x40 + 8 * y + z]), 0)
+        for y, r1 in enumerate(ASM_R8)
+        for z, r2 in enumerate(ASM_R8)
+    },
+    "halt": (b"\x76", 0),
+    **{
+        f"{name} {r}": (bytes([0x80 + 8 * y + z]), 0)
+        for y, name in enumerate(ASM_ALU)
+        for z, r in enumerate(ASM_R8)
+    },
+    **{f"{name} n": (bytes([0xC6 + 8 * y]), 1) for y, name in enumerate(ASM_ALU)},
+    **{f"ret {cc}": (bytes([0xC0 + 8 * y]), 0) for y, cc in enumerate(ASM_COND)},
+    **{f"jp {cc}, n": (bytes([0xC2 + 8 * y]), 2) for y, cc in enumerate(ASM_COND)},
+    **{f"call {cc}, n": (bytes([0xC4 + 8 * y]), 2) for y, cc in enumerate(ASM_COND)},
+    **{f"pop {r}": (bytes([0xC1 + 16 * p]), 0) for p, r in enumerate(ASM_R16_STACK)},
+    **{f"push {r}": (bytes([0xC5 + 16 * p]), 0) for p, r in enumerate(ASM_R16_STACK)},
+    **{f"rst ${8 * y:x}": (bytes([0xC7 + 8 * y]), 0) for y in range(8)},
+    "jp n": (b"\xc3", 2),
+    "ret": (b"\xc9", 0),
+    "call n": (b"\xcd", 2),
+    "reti": (b"\xd9", 0),
+    "ldh [n], a": (b"\xe0", 1),
+    "ldh [c], a": (b"\xe2", 0),
+    "add sp, e": (b"\xe8", 1),
+    "jp hl": (b"\xe9", 0),
+    "ld [n], a": (b"\xea", 2),
+    "ldh a, [n]": (b"\xf0", 1),
+    "ldh a, [c]": (b"\xf2", 0),
+    "di": (b"\xf3", 0),
+    "ld hl, sp+e": (b"\xf8", 1),
+    "ld sp, hl": (b"\xf9", 0),
+    "ld a, [n]": (b"\xfa", 2),
+    "ei": (b"\xfb", 0),
+    **{
+        f"{name} {r}": (bytes([0xCB, 8 * y + z]), 0)
+        for y, name in enumerate(ASM_ROTATE)
+        for z, r in enumerate(ASM_R8)
+    },
+    **{
+        f"{name} {bit}, {r}": (bytes([0xCB, 0x40 * (x + 1) + 8 * bit + z]), 0)
+        for x, name in enumerate(ASM_BIT)
+        for bit in range(8)
+        for z, r in enumerate(ASM_R8)
+    },
+}
+ASM_SP_OFFSET = re.compile(r"sp([+-]\d+)$")
+ASM_SIGNED = re.compile(r"(-\d+)$")
+ASM_UNSIGNED = re.compile(r"\$([0-9a-f]+)")
+
+
+def _assemble(line: str, address: int) -> bytes:
+    """Encodes an instruction as rendered, placed at the given address"""
+    if line in ASM_ENCODINGS:
+        encoding, size = ASM_ENCODINGS[line]
+        assert 0 == size, line
+        return encoding
+    relative = line.startswith("jr ")
+    if match := ASM_SP_OFFSET.search(line):
+        template, value = line[: match.start()] + "sp+e", int(match[1])
+    elif match := ASM_SIGNED.search(line):
+        template, value = line[: match.start()] + "e", int(match[1])
+    else:
+        match = ASM_UNSIGNED.search(line)
+        assert match is not None, line
+        immediate = "e" if relative else "n"
+        template = line[: match.start()] + immediate + line[match.end() :]
+        value = int(match[1], 16)
+    encoding, size = ASM_ENCODINGS[template]
+    if relative:
+        value -= address + len(encoding) + size
+    return encoding + (value & (1 << 8 * size) - 1).to_bytes(size, "little")
+
+
+def test_decode_insn__every_opcode_reassembles() -> None:
+    rom_data = _every_opcode()
+    assembled = bytearray()
+    for line in _render_every_opcode(rom_data):
+        assembled += _assemble(line, len(assembled))
+    assert rom_data == assembled
+
+
+@pytest.mark.skipif(
+    shutil.which("rgbasm") is None or shutil.which("rgblink") is None,
+    reason="requires RGBDS",
+)
+def test_decode_insn__every_opcode_assembles() -> None:
+    rom_data = _every_opcode()
+    lines = _render_every_opcode(rom_data)
+    with tempfile.TemporaryDirectory() as dir:
+        path = pathlib.Path(dir)
+        source = ['SECTION "Opcodes", ROM0[$0]'] + [f"    {line}" for line in lines]
+        (path / "opcodes.asm").write_text("\n".join(source) + "\n")
+        subprocess.run(
+            ["rgbasm", "-o", "opcodes.o", "opcodes.asm"], cwd=path, check=True
+        )
+        subprocess.run(
+            ["rgblink", "-x", "-o", "opcodes.gb", "opcodes.o"], cwd=path, check=True
+        )
+        assert rom_data == (path / "opcodes.gb").read_bytes()
+
+
+def test_decode_insn__shared() -> None:
+    first = disasm.decode_insn(bytes([0x78]), 0)
+    second = disasm.decode_insn(bytes([0x00, 0x78]), 1)
+    assert first is not None and first is second
+
+
+@pytest.mark.parametrize("byte", range(0x100))
+def test_decoded_insn__render(byte: int) -> None:
+    for data in [[byte, 0x34, 0xFF], [byte, 0xCB, 0x12], [0xCB, byte]]:
+        result = disasm.decode_insn(bytes(data), 0)
+        if result is not None:
+            assert result.insn.render() == result.render()
+
+
+@pytest.mark.parametrize(
+    "data,index,expected,target",
+    [
+        ([0x00, 0x18, 0xFE], 1, "jr $1", 0x0001),
+        ([0x20, 0x05], 0, "jr nz, $7", 0x0007),
+        ([0xC3, 0x50, 0x01], 0, "jp $150", 0x0150),
+        ([0xDA, 0x34, 0x12], 0, "jp c, $1234", 0x1234),
+        ([0xCD, 0x00, 0x40], 0, "call $4000", 0x4000),
+        ([0xC4, 0x00, 0x40], 0, "call nz, $4000", 0x4000),
+        ([0xFF], 0, "rst $38", 0x0038),
+        ([0xC9], 0, "ret", None),
+        ([0xD8], 0, "ret c", None),
+        ([0xD9], 0, "reti", None),
+        ([0xE9], 0, "jp hl", None),
+    ],
+)
+def test_decode_insn__control_flow(
+    data: Iterable[int], index: int, expected: str, target: Optional[int]
+) -> None:
+    result = disasm.decode_insn(bytes(data), index)
+    assert result is not None
+    assert expected == result.render()
+    assert target == disasm.get_target(result)
+
+
+def test_decode_insn__relative_romx() -> None:
+    rom = bytes(0x4000) + bytes([0x18, 0x10])
+    result = disasm.decode_insn(rom, 0x4000)
+    assert result is not None
+    assert "jr $4012" == result.render()
+
+
+def test_decode_insn__relative_out_of_range() -> None:
+    assert None is disasm.decode_insn(bytes([0x18, 0xF0]), 0)
@@ -0,0 +1,24 @@
+import pathlib
+import tempfile
+
+from charybdis import files
+
+import pytest
+
+
+def test_write_text_atomic() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        path = pathlib.Path(dir) / "file.json"
+        path.write_text("old")
+        files.write_text_atomic(path, "new")
+        assert "new" == path.read_text()
+        assert [path] == list(pathlib.Path(dir).iterdir())
+
+
+def test_write_text_atomic__error() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        path = pathlib.Path(dir) / "file.json"
+        path.mkdir()
+        with pytest.raises(OSError):
+            files.write_text_atomic(path, "new")
+        assert [path] == list(pathlib.Path(dir).iterdir())
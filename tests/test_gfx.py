@@ -0,0 +1,61 @@
+import random
+import struct
+import zlib
+
+from charybdis import gfx
+
+
+def test_get_tiles_per_row() -> None:
+    assert 16 == gfx.get_tiles_per_row(32, 128)
+    assert 10 == gfx.get_tiles_per_row(10, 128)
+    assert 4 == gfx.get_tiles_per_row(12, 40)
+    assert 1 == gfx.get_tiles_per_row(7, 4)
+
+
+def test_decode_2bpp() -> None:
+    # NB: Colours 0, 1, 2 and 3 followed by colour 3 in the first tile row
+    data = bytes([0b01011111, 0b00111111])
+    assert bytes([0b11100100, 0b00000000]) == gfx.decode_2bpp(data)
+
+
+def test_tiles_to_png() -> None:
+    data = random.Random(0).randbytes(12 * gfx.TILE_BYTES)
+    png = gfx.tiles_to_png(data, width=32)
+    assert png.startswith(gfx.PNG_SIGNATURE)
+    chunks = _read_chunks(png)
+    assert [b"IHDR", b"IDAT", b"IEND"] == [type for type, _ in chunks]
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[0][1][:10])
+    assert (32, 24, 2, 0) == (width, height, depth, color_type)
+    assert data == _encode_2bpp(zlib.decompress(chunks[1][1]), width, height)
+
+
+def _read_chunks(png: bytes) -> list[tuple[bytes, bytes]]:
+    chunks = []
+    offset = len(gfx.PNG_SIGNATURE)
+    while offset < len(png):
+        (size,) = struct.unpack_from(">I", png, offset)
+        type = png[offset + 4 : offset + 8]
+        data = png[offset + 8 : offset + 8 + size]
+        (crc,) = struct.unpack_from(">I", png, offset + 8 + size)
+        assert zlib.crc32(type + data) == crc
+        chunks.append((type, data))
+        offset += 12 + size
+    return chunks
+
+
+def _encode_2bpp(scanlines: bytes, width: int, height: int) -> bytes:
+    """Converts unfiltered 2-bit grayscale scanlines back to tiles, per pixel"""
+    stride = 1 + width // 4
+
+    def color(x: int, y: int) -> int:
+        byte = scanlines[y * stride + 1 + x // 4]
+        return 3 - ((byte >> (6 - 2 * (x % 4))) & 3)
+
+    data = bytearray()
+    for tile_y in range(0, height, 8):
+        for tile_x in range(0, width, 8):
+            for y in range(tile_y, tile_y + 8):
+                colors = [color(x, y) for x in range(tile_x, tile_x + 8)]
+                data.append(sum((c & 1) << (7 - i) for i, c in enumerate(colors)))
+                data.append(sum((c >> 1) << (7 - i) for i, c in enumerate(colors)))
+    return bytes(data)
@@ -1,10 +1,12 @@
+import dataclasses
+
 from charybdis import insn
 
 import pytest
 
 
 def test_insn__render() -> None:
-    ld = insn.Insn(name=insn.InsnName.LD, operands=[insn.R8.A, insn.R8.B])
+    ld = insn.Insn(name=insn.InsnName.LD, operands=(insn.R8.A, insn.R8.B))
     assert "ld a, b" == ld.render()
 
 
@@ -21,9 +23,12 @@ def test_insn__render__no_operands() -> None:
         ("[hl]", insn.R8.HL),
         ("hl", insn.R16.HL),
         ("5", insn.U3(0x5)),
+        ("-5", insn.I8(-5)),
         ("$ff", insn.U8(0xFF)),
         ("$abcd", insn.U16(0xABCD)),
         ("[$abcd]", insn.DirectU16(insn.U16(0xABCD))),
+        ("sp+5", insn.SPRelative(insn.I8(5))),
+        ("sp-128", insn.SPRelative(insn.I8(-128))),
         ("[c]", insn.IndirectHramC()),
         ("[bc]", insn.IndirectR16(insn.R16.BC)),
         ("[hl+]", insn.IndirectHLIncr()),
@@ -37,3 +42,18 @@ def test_render_operand(operand_str: str, operand: insn.InsnOperand) -> None:
 def test_render_operand__unsupported() -> None:
     with pytest.raises(Exception):
         insn.render_operand("Unsupported raw string")  # type: ignore
+
+
+def test_u8__interned() -> None:
+    assert insn.u8(0xFF) is insn.u8(0xFF)
+    assert insn.U8(0xFF) == insn.u8(0xFF)
+
+
+def test_direct_hram__interned() -> None:
+    assert insn.direct_hram(0x44) is insn.direct_hram(0x44)
+    assert insn.DirectU16(insn.U16(0xFF44)) == insn.direct_hram(0x44)
+
+
+def test_operand__frozen() -> None:
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        insn.u8(0).value = 1  # type: ignore
@@ -1,10 +1,14 @@
+import dataclasses
 import hashlib
-import io as python_io
 import pathlib
+import random
 import tempfile
 
-from charybdis import io
+from charybdis import disasm, gfx, io, trace
 from charybdis.ann import types as ann_types
+from tests.conftest import DisassembleEach, WriteRom, read_tree
+
+import pytest
 
 
 def test_create_output_directory() -> None:
@@ -34,6 +38,60 @@ def test_write_makefile() -> None:
         assert makefile_path.is_file()
 
 
+def test_render_makefile__bank_images() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        for name in [
+            "bank_001_4000.png",
+            "bank_001_4100.png",
+            "bank_001_4200.bin",
+            "bank_003_4000.png",
+        ]:
+            (pathlib.Path(dir) / name).touch()
+        makefile = io.render_makefile(_create_state(dir))
+    assert "\n%.o : %.asm $(INCFILES)\n" in makefile
+    assert "\nbank_001.o : bank_001_4000.2bpp bank_001_4100.2bpp\n" in makefile
+    assert "\nbank_003.o : bank_003_4000.2bpp\n" in makefile
+    assert "bank_000.o" not in makefile
+
+
+def test_initialize_state(tmp_path: pathlib.Path, write_rom: WriteRom) -> None:
+    rom_file_path = write_rom(banks=2)
+    rom_bytes = rom_file_path.read_bytes()
+    state = io.initialize_state(
+        io.DisassemblerOptions(
+            output_directory_path=tmp_path / "output",
+            overwrite=False,
+            rom_file_path=rom_file_path,
+        )
+    )
+    assert 2 == state.rom_banks
+    assert isinstance(state.rom_data, memoryview)
+    assert state.rom_data.readonly
+    assert rom_bytes == state.rom_data
+    assert hashlib.md5(rom_bytes).hexdigest() == state.rom_md5
+    state.rom_data.release()
+
+
+def test_load_anns(tmp_path: pathlib.Path) -> None:
+    rom_file_path = tmp_path / "rom.gb"
+    rom_file_path.with_suffix(".ann").write_text("01:4000 Test\n")
+    rom_file_path.with_suffix(".sym").write_text("01:4000 .code:0010\n01:4000 Test\n")
+    options = io.DisassemblerOptions(
+        output_directory_path=tmp_path / "output",
+        overwrite=False,
+        rom_file_path=rom_file_path,
+        ann_cache=False,
+    )
+    anns = io.load_anns(options)
+    assert {
+        ann_types.ann(1, 0x4000, "Test"),
+        ann_types.ann(1, 0x4000, "", ann_types.CodeType(0x10)),
+    } == anns.anns_at_address[ann_types.BankAddr(1, 0x4000)]
+    rom_file_path.with_suffix(".sym").write_text("01:4000 .code\n")
+    with pytest.raises(Exception, match="rom.sym: line 1"):
+        io.load_anns(options)
+
+
 def test_get_bank_header() -> None:
     assert 'SECTION "ROM Bank $000", ROM0[$0]' == io.get_bank_header(0)
     assert 'SECTION "ROM Bank $101", ROMX[$4000], BANK[$101]' == io.get_bank_header(
@@ -50,9 +108,388 @@ BANK_ASM = f"""SECTION "ROM Bank $000", ROM0[$0]
 def test_write_bank() -> None:
     state = _create_state(".")
     state.rom_data = bytes([0x00 for _ in range(io.ROM_BANK_SIZE)])
-    buffer = python_io.StringIO()
-    io.write_bank(state, buffer, 0)
-    assert BANK_ASM == buffer.getvalue()
+    assert BANK_ASM == io.render_bank(state, 0).text
+
+
+def test_write_bank__traced() -> None:
+    state = _create_state(".")
+    rom_data = bytearray([0xD3] * 2 * io.ROM_BANK_SIZE)
+    rom_data[0x100:0x103] = bytes([0x00, 0x18, 0xFE])
+    state.rom_data = bytes(rom_data)
+    state.code_map = trace.trace(state.rom_data, 2)
+    lines = io.render_bank(state, 0).lines
+    assert "DB $d3, $d3, $d3, $d3, $d3, $d3, $d3, $d3" == lines[2]
+    assert ["nop", "jr $101"] == lines[34:36]
+    assert lines[2] == lines[36]
+    assert 36 + (io.ROM_BANK_SIZE - 0x103 + 7) // 8 == len(lines)
+
+
+def test_write_bank__data() -> None:
+    state = _create_state(".")
+    state.db_width = 4
+    state.rom_data = bytes(8) + bytes([0xD3] * 9) + bytes(io.ROM_BANK_SIZE - 17)
+    lines = io.render_bank(state, 0).lines
+    assert ["nop"] * 8 == lines[2:10]
+    assert "DB $d3, $d3, $d3, $d3" == lines[10] == lines[11]
+    assert ["DB $d3", "nop"] == lines[12:14]
+
+
+def test_write_bank__incbin() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        state = _create_state(dir)
+        state.incbin_threshold = 4
+        state.rom_data = bytes(2 * io.ROM_BANK_SIZE - 4) + bytes([0xD3] * 4)
+        io.save_rendered_bank(state, 1, io.render_bank(state, 1))
+        binary = (pathlib.Path(dir) / "bank_001_7ffc.bin").read_bytes()
+        text = io.get_bank_path(state, 1).read_text()
+    assert bytes([0xD3] * 4) == binary
+    assert text.endswith('nop\nINCBIN "bank_001_7ffc.bin"\n')
+
+
+def test_write_bank__spans_banks() -> None:
+    state = _create_state(".")
+    # NB: LD BC, nn at the last byte of bank 0 would read into bank 1
+    state.rom_data = bytes(io.ROM_BANK_SIZE - 1) + bytes([0x01, 0x34, 0x12])
+    assert io.render_bank(state, 0).text.endswith("nop\nDB $01\n")
+
+
+def test_write_bank__typed_data() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        state = _create_state(dir)
+        rom_data = bytearray(2 * io.ROM_BANK_SIZE)
+        rom_data[0x4000:0x401E] = (
+            bytes.fromhex("3412 7856 bc9a")
+            + bytes.fromhex("0040 0001")
+            + bytes.fromhex("0102 0304")
+            + bytes([0xFF] * 16)
+        )
+        state.rom_data = bytes(rom_data)
+        u8, u16 = ann_types.PrimitiveType.U8, ann_types.PrimitiveType.U16
+        state.anns = ann_types.AnnMapping(
+            [
+                ann_types.ann(1, 0x4000, "Table", ann_types.ArrayType(u16, 3)),
+                ann_types.ann(
+                    1,
+                    0x4006,
+                    "Pointers",
+                    ann_types.ArrayType(ann_types.PointerType(u8), 2),
+                ),
+                ann_types.ann(
+                    1,
+                    0x400A,
+                    "Grid",
+                    ann_types.ArrayType(ann_types.ArrayType(u8, 2), 2),
+                ),
+                ann_types.ann(1, 0x400E, "Tiles", ann_types.ImageType(size=16)),
+            ]
+        )
+        rendered = io.render_bank(state, 1)
+        io.save_rendered_bank(state, 1, rendered)
+        png = (pathlib.Path(dir) / "bank_001_400e.png").read_bytes()
+    lines = rendered.lines
+    assert [
+        "Table::",
+        "DW $1234, $5678, $9abc",
+        "Pointers::",
+        "DW Table",
+        "DW $0100",
+        "Grid::",
+        "DB $01, $02",
+        "DB $03, $04",
+        "Tiles::",
+        'INCBIN "bank_001_400e.2bpp"',
+        "nop",
+    ] == lines[2:13]
+    assert gfx.tiles_to_png(bytes([0xFF] * 16)) == png
+    assert 2 + 10 + io.ROM_BANK_SIZE - 0x1E == len(lines)
+
+
+def test_write_bank__typed_data_after_code() -> None:
+    state = _create_state(".")
+    # NB: LD BC, nn would run into the annotated byte
+    state.rom_data = bytes([0x00, 0x01, 0xD3, 0x12]) + bytes(io.ROM_BANK_SIZE - 4)
+    state.anns = ann_types.AnnMapping(
+        [ann_types.ann(0, 0x0003, "Byte", ann_types.PrimitiveType.U8)]
+    )
+    lines = io.render_bank(state, 0).lines
+    assert ["nop", "DB $01, $d3", "Byte::", "DB $12", "nop"] == lines[2:7]
+
+
+def test_write_bank__labels() -> None:
+    state = _create_state(".")
+    rom_data = bytearray(2 * io.ROM_BANK_SIZE)
+    # NB: CALL Func, LD A, [wCount], LDH [hFlag], A then LD BC, nn with a
+    #     label inside it
+    rom_data[0x4000:0x400B] = bytes.fromhex("cd0840 fa00c0 e080 01d312")
+    state.rom_data = bytes(rom_data)
+    state.anns = ann_types.AnnMapping(
+        [
+            ann_types.ann(1, 0x4008, "Func"),
+            ann_types.ann(1, 0x400A, "Inside"),
+            ann_types.ann(0, 0xC000, "wCount"),
+            ann_types.ann(0, 0xFF80, "hFlag"),
+        ]
+    )
+    lines = io.render_bank(state, 1).lines
+    assert 'INCLUDE "ram.inc"' == lines[0]
+    assert [
+        "call Func",
+        "ld a, [wCount]",
+        "ldh [hFlag], a",
+        "Func::",
+        "DB $01, $d3",
+        "Inside::",
+        "ld [de], a",
+        "nop",
+    ] == lines[4:12]
+
+
+def test_write_bank__auto_labels() -> None:
+    state = _create_state(".")
+    state.auto_labels = True
+    rom_data = bytearray(2 * io.ROM_BANK_SIZE)
+    # NB: CALL $0007, JR $0000, JR $000a then RET, with the last jump landing
+    #     inside LD BC, nn
+    rom_data[0x0000:0x000B] = bytes.fromhex("cd0700 18fb 1803 c9 010000")
+    state.rom_data = bytes(rom_data)
+    lines = io.render_bank(state, 0).lines
+    assert [
+        "Label_00_0000::",
+        "call Func_00_0007",
+        "jr Label_00_0000",
+        "jr $a",
+        "Func_00_0007::",
+        "ret",
+        "ld bc, $0",
+        "nop",
+    ] == lines[2:10]
+    # NB: Labels don't change how the bank is decoded
+    plain = _create_state(".")
+    plain.rom_data = state.rom_data
+    assert len(io.render_bank(plain, 0).lines) == len(lines) - 2
+
+
+def test_write_bank__auto_labels_annotated() -> None:
+    state = _create_state(".")
+    state.auto_labels = True
+    state.trace = True
+    rom_data = bytearray(2 * io.ROM_BANK_SIZE)
+    rom_data[0x0100:0x0103] = bytes.fromhex("c35001")
+    rom_data[0x0150:0x0155] = bytes.fromhex("cd0040 18fb")
+    state.rom_data = bytes(rom_data)
+    state.anns = ann_types.AnnMapping([ann_types.ann(0, 0x0150, "Main")])
+    state.code_map = trace.trace(state.rom_data, 2, state.anns)
+    lines = io.render_bank(state, 0).lines
+    i = lines.index("Main::")
+    assert ["jp Main", "call Func_01_4000", "jr Main"] == [
+        lines[i - 11],
+        *lines[i + 1 : i + 3],
+    ]
+    assert "Func_01_4000::" == io.render_bank(state, 1).lines[2]
+
+
+def test_write_bank__auto_labels_overlapping() -> None:
+    state = _create_state(".")
+    state.auto_labels = True
+    state.trace = True
+    rom_data = bytearray(2 * io.ROM_BANK_SIZE)
+    rom_data[0x0100:0x0106] = bytes.fromhex("cd5201 c35001")
+    # NB: JR $0153 lands on the operand of LD A, $c9, which is also traced
+    rom_data[0x0150:0x0155] = bytes.fromhex("1801 3ec9 c9")
+    state.rom_data = bytes(rom_data)
+    state.code_map = trace.trace(state.rom_data, 2)
+    lines = io.render_bank(state, 0).lines
+    i = lines.index("Label_00_0150::")
+    assert [
+        "Label_00_0150::",
+        "jr $153",
+        "Func_00_0152::",
+        "ld a, $c9",
+        "ret",
+    ] == lines[i : i + 5]
+    plain = _create_state(".")
+    plain.rom_data = state.rom_data
+    plain.code_map = state.code_map
+    assert len(io.render_bank(plain, 0).lines) == len(lines) - 2
+
+
+@pytest.mark.parametrize("banks", [2, 4])
+def test_sweep(banks: int) -> None:
+    state = _create_state(".")
+    state.rom_banks = banks
+    rom_data = bytearray(random.Random(0).randbytes(banks * io.ROM_BANK_SIZE))
+    # NB: JR before the start of the ROM, which doesn't decode
+    rom_data[0x0000:0x0002] = bytes.fromhex("18f0")
+    state.rom_data = bytes(rom_data)
+    code_map = io.sweep(state, io.get_label_index(state))
+    expected = _sweep_by_decoding(state.rom_data, banks)
+    assert expected.insn_starts == code_map.insn_starts
+    assert expected.targets == code_map.targets
+    assert expected.call_targets == code_map.call_targets
+
+
+def test_write_ram_include() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        state = _create_state(dir)
+        state.anns = ann_types.AnnMapping(
+            [
+                ann_types.ann(0, 0xC000, "wCount"),
+                ann_types.ann(0, 0xFF80, "hFlag"),
+            ]
+        )
+        io.write_ram_include(state)
+        text = (pathlib.Path(dir) / io.RAM_INCLUDE_NAME).read_text()
+    assert "DEF hFlag EQU $ff80\nDEF wCount EQU $c000\n" == text
+
+
+def test_disassemble__parallel(disassemble_each: DisassembleEach) -> None:
+    outputs = disassemble_each(banks=4, serial={"jobs": 1}, parallel={"jobs": 2})
+    assert 5 == len(outputs["serial"].files)
+    assert outputs["serial"].files == outputs["parallel"].files
+
+
+def test_disassemble__timings(
+    tmp_path: pathlib.Path, disassemble_each: DisassembleEach
+) -> None:
+    outputs = disassemble_each(banks=4, serial={"jobs": 1}, parallel={"jobs": 2})
+    for name, output in outputs.items():
+        bank_sizes = sum(
+            path.stat().st_size for path in (tmp_path / name).glob("bank_*.asm")
+        )
+        assert bank_sizes == output.timings.counters["bytes_written"]
+        assert 4 == output.timings.stages["render_bank"].calls
+        assert 1 == output.timings.stages["write_makefile"].calls
+    counters = outputs["serial"].timings.counters
+    assert 4 == counters["banks"]
+    assert 4 * io.ROM_BANK_SIZE == counters["rom_bytes"]
+    assert counters == outputs["parallel"].timings.counters
+
+
+def test_disassemble__incremental(tmp_path: pathlib.Path, write_rom: WriteRom) -> None:
+    rom_file_path = write_rom(banks=4)
+    output_directory_path = tmp_path / "output"
+    options = io.DisassemblerOptions(
+        output_directory_path=output_directory_path,
+        overwrite=False,
+        rom_file_path=rom_file_path,
+        incremental=True,
+    )
+    io.disassemble(options)
+    for bank in range(4):
+        (output_directory_path / f"bank_{bank:03x}.asm").write_text("stale")
+    # NB: Change ROM data in bank 1 and annotate bank 2
+    rom_data = bytearray(rom_file_path.read_bytes())
+    rom_data[io.ROM_BANK_SIZE + 0x10] ^= 0xFF
+    rom_file_path.write_bytes(rom_data)
+    rom_file_path.with_suffix(".ann").write_text("02:4010 Test")
+    io.disassemble(options)
+    tree = read_tree(output_directory_path)
+    assert "stale" == tree["bank_000.asm"]
+    assert "stale" != tree["bank_001.asm"]
+    assert "stale" != tree["bank_002.asm"]
+    assert "stale" == tree["bank_003.asm"]
+
+
+def test_disassemble__incremental_auto_labels(tmp_path: pathlib.Path) -> None:
+    rom_data = bytearray(4 * io.ROM_BANK_SIZE)
+    rom_data[io.OFFSET_ROM_SIZE] = 1
+    rom_data[2 * io.ROM_BANK_SIZE : 2 * io.ROM_BANK_SIZE + 3] = bytes(
+        [0xCD, 0x00, 0x10]
+    )
+    rom_file_path = tmp_path / "rom.gb"
+    rom_file_path.write_bytes(rom_data)
+    options = io.DisassemblerOptions(
+        output_directory_path=tmp_path / "output",
+        overwrite=False,
+        rom_file_path=rom_file_path,
+        incremental=True,
+        auto_labels=True,
+    )
+    io.disassemble(options)
+    assert "call Func_00_1000" in read_tree(tmp_path / "output")["bank_002.asm"]
+    # NB: Only ROM0 changes, so that $1000 no longer starts an instruction
+    rom_data[0x0FFF:0x1002] = bytes([0x01, 0x34, 0x12])
+    rom_file_path.write_bytes(rom_data)
+    io.disassemble(options)
+    io.disassemble(
+        dataclasses.replace(
+            options, output_directory_path=tmp_path / "full", incremental=False
+        )
+    )
+    incremental = read_tree(tmp_path / "output")
+    full = read_tree(tmp_path / "full")
+    assert "call $1000" in incremental["bank_002.asm"]
+    for bank in range(4):
+        name = f"bank_{bank:03x}.asm"
+        assert full[name] == incremental[name]
+
+
+def test_write_assembly__pipelined(disassemble_each: DisassembleEach) -> None:
+    outputs = disassemble_each(
+        banks=4, inline={"write_queue_depth": 0}, pipelined={"write_queue_depth": 1}
+    )
+    assert outputs["inline"].files == outputs["pipelined"].files
+
+
+def test_write_assembly__pipelined_error() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        state = _create_state(dir)
+        state.output_directory_path = pathlib.Path(dir) / "missing"
+        state.rom_banks = 4
+        state.rom_data = bytes(4 * io.ROM_BANK_SIZE)
+        state.write_queue_depth = 1
+        with pytest.raises(FileNotFoundError):
+            io.write_assembly(state)
+
+
+def test_disassemble_batch(tmp_path: pathlib.Path, write_rom: WriteRom) -> None:
+    other_rom_file_path = write_rom(banks=4, name="other.gb")
+    rom_file_path = write_rom(banks=2)
+    missing_rom_file_path = tmp_path / "missing.gb"
+    output_directory_path = tmp_path / "output"
+    for jobs in [1, 2]:
+        results = io.disassemble_batch(
+            io.DisassemblerOptions(
+                output_directory_path=output_directory_path / f"jobs_{jobs}",
+                overwrite=False,
+                rom_file_path=pathlib.Path(),
+                jobs=jobs,
+            ),
+            [rom_file_path, missing_rom_file_path, other_rom_file_path],
+        )
+        assert [result.rom_file_path for result in results] == [
+            rom_file_path,
+            missing_rom_file_path,
+            other_rom_file_path,
+        ]
+        assert [result.error is None for result in results] == [True, False, True]
+    serial = read_tree(output_directory_path / "jobs_1" / "other")
+    parallel = read_tree(output_directory_path / "jobs_2" / "other")
+    rom = read_tree(output_directory_path / "jobs_2" / "rom")
+    assert 5 == len(serial)
+    assert serial == parallel
+    assert 3 == len(rom)
+
+
+def _sweep_by_decoding(rom_data: bytes, rom_banks: int) -> trace.CodeMap:
+    code_map = trace.CodeMap(rom_banks)
+    for bank in range(rom_banks):
+        offset = 0
+        while offset < io.ROM_BANK_SIZE:
+            result = disasm.decode_insn(rom_data, bank * io.ROM_BANK_SIZE + offset)
+            if result is None or offset + result.size > io.ROM_BANK_SIZE:
+                offset += 1
+                continue
+            code_map.insn_starts[bank][offset >> 3] |= 1 << (offset & 7)
+            target = disasm.get_target(result)
+            location = None
+            if target is not None:
+                location = trace.get_rom_location(bank, target, rom_banks)
+            if location is not None:
+                assert result.opcode is not None
+                code_map.mark_target(*location, result.opcode.flow == disasm.Flow.CALL)
+            offset += result.size
+    return code_map
 
 
 def _create_state(
@@ -0,0 +1,52 @@
+from charybdis import labels
+from charybdis.ann import types as ann_types
+
+LABEL_ADDRESSES = {
+    "Start": ann_types.BankAddr(0x00, 0x0150),
+    "Entry": ann_types.BankAddr(0x00, 0x0150),
+    "Func1": ann_types.BankAddr(0x01, 0x4000),
+    "Func2": ann_types.BankAddr(0x02, 0x4000),
+    "Missing": ann_types.BankAddr(0x10, 0x4000),
+    "wCount": ann_types.BankAddr(0x00, 0xC000),
+    "wBank1": ann_types.BankAddr(0x01, 0xD000),
+    "wBank2": ann_types.BankAddr(0x02, 0xD000),
+    "hFlag": ann_types.BankAddr(0x00, 0xFF80),
+}
+
+
+def test_label_index__at() -> None:
+    index = labels.LabelIndex(LABEL_ADDRESSES, 4)
+    assert ("Entry", "Start") == index.at(0x00, 0x0150)
+    assert ("Func2",) == index.at(0x02, 0x0000)
+    assert () == index.at(0x03, 0x0000)
+
+
+def test_label_index__offsets_in() -> None:
+    index = labels.LabelIndex(LABEL_ADDRESSES, 4)
+    assert [0x0150] == list(index.offsets_in(0x00, 0x0000, 0x4000))
+    assert [] == list(index.offsets_in(0x00, 0x0151, 0x4000))
+    assert [] == list(index.offsets_in(0x10, 0x0000, 0x4000))
+
+
+def test_label_index__resolve_rom() -> None:
+    index = labels.LabelIndex(LABEL_ADDRESSES, 4)
+    assert "Entry" == index.resolve(0x02, 0x0150)
+    assert "Func1" == index.resolve(0x01, 0x4000)
+    assert "Func2" == index.resolve(0x02, 0x4000)
+    assert index.resolve(0x03, 0x4000) is None
+    # NB: Ambiguous unless there is only one switchable bank
+    assert index.resolve(0x00, 0x4000) is None
+    assert "Func1" == labels.LabelIndex(LABEL_ADDRESSES, 2).resolve(0x00, 0x4000)
+
+
+def test_label_index__resolve_ram() -> None:
+    index = labels.LabelIndex(LABEL_ADDRESSES, 4)
+    assert "wCount" == index.resolve(0x01, 0xC000)
+    assert "hFlag" == index.resolve(0x00, 0xFF80)
+    assert index.resolve(0x00, 0xD000) is None
+    assert [
+        ("hFlag", 0xFF80),
+        ("wBank1", 0xD000),
+        ("wBank2", 0xD000),
+        ("wCount", 0xC000),
+    ] == index.ram_labels()
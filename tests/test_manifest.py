@@ -0,0 +1,36 @@
+import pathlib
+import tempfile
+
+from charybdis import manifest
+from charybdis.ann import types as ann_types
+
+INPUTS = [
+    manifest.BankInputs(rom_hash="a", anns_hash="b"),
+    manifest.BankInputs(rom_hash="c", anns_hash="d"),
+]
+
+
+def test_read_manifest__missing() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        assert {} == manifest.read_manifest(pathlib.Path(dir), {})
+
+
+def test_read_manifest__invalid() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        (pathlib.Path(dir) / manifest.MANIFEST_FILE_NAME).write_text("{}")
+        assert {} == manifest.read_manifest(pathlib.Path(dir), {})
+
+
+def test_write_manifest() -> None:
+    with tempfile.TemporaryDirectory() as dir:
+        manifest.write_manifest(pathlib.Path(dir), {"a": 1}, INPUTS)
+        assert {0: INPUTS[0], 1: INPUTS[1]} == manifest.read_manifest(
+            pathlib.Path(dir), {"a": 1}
+        )
+        assert {} == manifest.read_manifest(pathlib.Path(dir), {"a": 2})
+
+
+def test_hash_anns__order_independent() -> None:
+    anns = [ann_types.ann(0x01, 0x4000, "A"), ann_types.ann(0x01, 0x4001, "B")]
+    assert manifest.hash_anns(anns) == manifest.hash_anns(reversed(anns))
+    assert manifest.hash_anns(anns) != manifest.hash_anns(anns[:1])
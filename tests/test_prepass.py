@@ -0,0 +1,33 @@
+from charybdis import disasm, prepass
+
+
+def test_classify__lengths() -> None:
+    for byte in range(0x100):
+        # NB: Pad so that any immediate is in range
+        rom_data = bytes([byte, 0x00, 0x00])
+        result = disasm.decode_insn(rom_data, 0)
+        expected = 0 if result is None else result.size
+        assert expected == prepass.classify(rom_data).lengths[0], f"{byte:#04x}"
+
+
+def test_classify__branches() -> None:
+    byte_classes = prepass.classify(bytes([0x00, 0xC3, 0x18, 0xCD, 0xC9, 0xE9]))
+    assert b"\x00\x01\x01\x01\x01\x01" == byte_classes.branches
+
+
+def test_classify__spans_banks() -> None:
+    rom_data = bytearray(2 * disasm.ROM_BANK_SIZE)
+    # NB: LD BC, n16 and LD B, n8 at the end of the first bank
+    rom_data[disasm.ROM_BANK_SIZE - 3] = 0x01
+    rom_data[disasm.ROM_BANK_SIZE - 2] = 0x01
+    rom_data[disasm.ROM_BANK_SIZE - 1] = 0x06
+    lengths = prepass.classify(memoryview(rom_data)).lengths
+    assert 3 == lengths[disasm.ROM_BANK_SIZE - 3]
+    assert 0 == lengths[disasm.ROM_BANK_SIZE - 2]
+    assert 0 == lengths[disasm.ROM_BANK_SIZE - 1]
+    assert 1 == lengths[disasm.ROM_BANK_SIZE]
+
+
+def test_classify__stop() -> None:
+    lengths = prepass.classify(bytes([0x10, 0x00, 0x10, 0x01, 0x10])).lengths
+    assert b"\x02\x01\x00\x03\x00" == lengths
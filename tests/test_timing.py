@@ -0,0 +1,42 @@
+import pickle
+
+from charybdis import timing
+
+
+def test_stage() -> None:
+    timings = timing.Timings()
+    for _ in range(2):
+        with timings.stage("test"):
+            pass
+    assert 2 == timings.stages["test"].calls
+    assert timings.stages["test"].wall >= 0
+
+
+def test_merge() -> None:
+    timings = timing.Timings()
+    timings.add_stage("test", timing.StageTiming(calls=1, wall=1.0, cpu=0.5))
+    timings.count("insns", 3)
+    other = pickle.loads(pickle.dumps(timings))
+    other.count("insns", 2)
+    timings.merge(other)
+    assert timing.StageTiming(calls=2, wall=2.0, cpu=1.0) == timings.stages["test"]
+    assert 8 == timings.counters["insns"]
+
+
+def test_to_json() -> None:
+    timings = timing.Timings()
+    timings.add_stage("test", timing.StageTiming(calls=1, wall=1.0, cpu=0.5))
+    timings.count("insns")
+    assert {
+        "stages": {"test": {"calls": 1, "wall": 1.0, "cpu": 0.5}},
+        "counters": {"insns": 1},
+    } == timings.to_json()
+
+
+def test_format_table() -> None:
+    timings = timing.Timings()
+    timings.add_stage("test", timing.StageTiming(calls=1, wall=1.0, cpu=0.5))
+    timings.count("insns", 1234)
+    lines = timings.format_table().splitlines()
+    assert lines[1].split() == ["test", "1", "1.000", "0.500"]
+    assert lines[-1].split() == ["insns", "1,234"]
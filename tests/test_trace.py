@@ -0,0 +1,85 @@
+from charybdis import trace
+from charybdis.ann import types as ann_types
+
+BANK_SIZE = 0x4000
+INVALID = 0xD3
+
+
+def _create_rom() -> bytes:
+    rom = bytearray([INVALID] * 2 * BANK_SIZE)
+    # 0100: nop / jp $0150
+    rom[0x100:0x104] = bytes([0x00, 0xC3, 0x50, 0x01])
+    # 0150: call $4000 / jr $0150
+    rom[0x150:0x155] = bytes([0xCD, 0x00, 0x40, 0x18, 0xFB])
+    # 01:4000: ret
+    rom[BANK_SIZE] = 0xC9
+    # 01:4010: nop / ret
+    rom[BANK_SIZE + 0x10 : BANK_SIZE + 0x12] = bytes([0x00, 0xC9])
+    return bytes(rom)
+
+
+def _insn_starts(code_map: trace.CodeMap, bank: int) -> list[int]:
+    return [o for o in range(BANK_SIZE) if code_map.is_insn_start(bank, o)]
+
+
+def test_code_map() -> None:
+    code_map = trace.CodeMap(2)
+    code_map.mark_insn(1, 0x0FFF, 3)
+    assert not code_map.is_code(1, 0x0FFE)
+    assert code_map.is_code(1, 0x0FFF)
+    assert code_map.is_code(1, 0x1001)
+    assert not code_map.is_code(1, 0x1002)
+    assert code_map.is_insn_start(1, 0x0FFF)
+    assert not code_map.is_insn_start(1, 0x1000)
+    assert not code_map.is_code(0, 0x0FFF)
+
+
+def test_code_map__next_insn_start() -> None:
+    code_map = trace.CodeMap(1)
+    assert BANK_SIZE == code_map.next_insn_start(0, 0)
+    code_map.mark_insn(0, 0x0003, 1)
+    code_map.mark_insn(0, 0x1234, 1)
+    assert 0x0003 == code_map.next_insn_start(0, 0)
+    assert 0x0003 == code_map.next_insn_start(0, 3)
+    assert 0x1234 == code_map.next_insn_start(0, 4)
+    assert BANK_SIZE == code_map.next_insn_start(0, 0x1235)
+
+
+def test_trace() -> None:
+    code_map = trace.trace(_create_rom(), 2)
+    assert [0x100, 0x101, 0x150, 0x153] == _insn_starts(code_map, 0)
+    assert [0x0000] == _insn_starts(code_map, 1)
+    assert code_map.is_code(0, 0x0154)
+    assert not code_map.is_code(0, 0x0155)
+
+
+def test_trace__targets() -> None:
+    code_map = trace.trace(_create_rom(), 2)
+    assert [(0x150, False)] == list(code_map.iter_targets(0))
+    assert [(0x0000, True)] == list(code_map.iter_targets(1))
+
+
+def test_code_map__iter_targets() -> None:
+    code_map = trace.CodeMap(1)
+    code_map.mark_insn(0, 0x0010, 3)
+    code_map.mark_target(0, 0x0010, False)
+    code_map.mark_target(0, 0x0011, True)
+    code_map.mark_insn(0, 0x2000, 1)
+    code_map.mark_target(0, 0x2000, True)
+    assert [(0x0010, False), (0x2000, True)] == list(code_map.iter_targets(0))
+
+
+def test_trace__code_anns() -> None:
+    anns = ann_types.AnnMapping(
+        [ann_types.ann(0x01, 0x4010, "Func", ann_types.CodeType(size=2))]
+    )
+    code_map = trace.trace(_create_rom(), 2, anns)
+    assert [0x0000, 0x0010, 0x0011] == _insn_starts(code_map, 1)
+
+
+def test_get_rom_location() -> None:
+    assert (0, 0x0150) == trace.get_rom_location(3, 0x0150, 4)
+    assert (3, 0x0150) == trace.get_rom_location(3, 0x4150, 4)
+    assert None is trace.get_rom_location(0, 0x4150, 4)
+    assert (1, 0x0150) == trace.get_rom_location(0, 0x4150, 2)
+    assert None is trace.get_rom_location(1, 0xC000, 2)